@@ -1,24 +1,27 @@
-from flask import Flask, jsonify, send_file, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 import subprocess
 import os
-import requests
 from dotenv import load_dotenv
 import json
-import asyncio
+import base64
+from urllib.parse import urlencode
 import re
-from datetime import datetime, timedelta, date
-from supabase import create_client
-from playwright.async_api import async_playwright
-import threading
-import time
+from datetime import datetime, date
 from apscheduler.schedulers.background import BackgroundScheduler
 
 # Load environment variables
 load_dotenv()
 
+from python_scripts.config import JOBS_CONFIG, PAGINATION_CONFIG
+from python_scripts.scrape_jobs import ScrapeJobManager, JobQueueFull
+from python_scripts.worker_loop import run_coroutine
+from python_scripts.supabase_rest import SupabaseError, get_supabase_rest
+from python_scripts.response_cache import ResponseCache
+from python_scripts.price_utils import PRICE_COLUMNS, add_price_columns, price_columns_available
+
 app = Flask(__name__)
-CORS(app, origins=["http://localhost:5173", "http://127.0.0.1:5173", "http://localhost:3000", "http://127.0.0.1:3000"], methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
+CORS(app, origins=["http://localhost:5173", "http://127.0.0.1:5173", "http://localhost:3000", "http://127.0.0.1:3000"], methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"], expose_headers=["X-Next-Cursor", "Link"])
 
 
 # Supabase configuration (server-side only)
@@ -28,7 +31,21 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")  # Debe ser la service key
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("Faltan variables SUPABASE_URL o SUPABASE_SERVICE_KEY")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Cliente REST con la service key sobre la sesión keep-alive compartida
+db = get_supabase_rest("SUPABASE_KEY")
+
+def supabase_error_response(error: SupabaseError, message: str = None, status: int = None):
+    """Respuesta JSON para un error de Supabase (502 si no hubo respuesta)"""
+    return jsonify({
+        'error': message or f'Supabase error: {error.status}',
+        'details': error.details
+    }), status or error.status or 502
+
+# Trabajos de scraping en segundo plano (/run-all-scrapings)
+scrape_jobs = ScrapeJobManager()
+
+# Respuestas del dashboard por usuario (hoteles, eventos y precios); se invalidan al escribir
+response_cache = ResponseCache()
 
 @app.route('/run-scrape-hotels', methods=['POST'])
 def run_scrape_hotels():
@@ -47,44 +64,30 @@ def run_scrape_hotels():
 
 @app.route('/run-scrapeo-geo', methods=['POST'])
 def run_scrapeo_geo():
+    from python_scripts import scrape_eventos
     try:
         data = request.get_json()
         hotel_name = data.get('hotel_name', 'Grand Hotel Tijuana')
-        radius = str(data.get('radius', 10))
+        radius = int(data.get('radius', 10))
         user_id = data.get('user_id', '')
         hotel_metadata = data.get('hotel_metadata', {})
         geo = hotel_metadata.get('geoCode') if hotel_metadata else None
         if geo and 'latitude' in geo and 'longitude' in geo:
-            args = [
-                'python', 'python_scripts/scrape_eventos.py',
-                str(geo['latitude']), str(geo['longitude']), str(radius), user_id
-            ]
+            lat, lon = float(geo['latitude']), float(geo['longitude'])
+            hotel_name = 'Hotel'
         else:
-            args = [
-                'python', 'python_scripts/scrape_eventos.py',
-                hotel_name, str(radius), user_id
-            ]
-        print("Args to subprocess:", args)
+            lat, lon = scrape_eventos.get_hotel_coordinates(hotel_name)
+        print("Eventos para:", hotel_name, lat, lon, radius, user_id)
         user_jwt = request.headers.get('x-user-jwt')
-        env = os.environ.copy()
-        if user_jwt:
-            env['USER_JWT'] = user_jwt
-        result = subprocess.run(
-            args,
-            capture_output=True,
-            text=True,
-            check=True,
-            encoding='utf-8',
-            errors='replace',
-            env=env
+        eventos = run_coroutine(
+            scrape_eventos.fetch_nearby_events(lat, lon, radius, user_id, hotel_name, user_jwt=user_jwt),
+            timeout=JOBS_CONFIG['timeouts']['scrape_eventos']
         )
-        print("STDOUT:", result.stdout)
-        print("STDERR:", result.stderr)
-        return jsonify({'output': result.stdout}), 200
-    except subprocess.CalledProcessError as e:
-        print("STDOUT:", e.stdout)
-        print("STDERR:", e.stderr)
-        return jsonify({'error': e.stderr}), 500
+        response_cache.invalidate(user_id, ['events'])
+        return jsonify({'output': eventos}), 200
+    except Exception as e:
+        print("Error en /run-scrapeo-geo:", e)
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/hoteles-tijuana-json', methods=['GET'])
 def hoteles_tijuana_json():
@@ -96,27 +99,149 @@ def hoteles_tijuana_json():
     except Exception as e:
         return {'error': str(e)}, 500
 
+# ─── Consultas paginadas de hotel_usuario (/api/hotels y /api/hotel-prices) ───
+HOTEL_USUARIO_COLUMNS = ('id', 'user_id', 'hotel_name', 'scrape_date', 'checkin_date', 'room_type',
+                         'price', 'price_amount', 'price_currency', 'created_at')
+# Orden de paginación (columna, descendente); id desempata filas con el mismo valor
+HOTELS_KEYSET = (('created_at', True), ('id', True))
+PRICES_KEYSET = (('checkin_date', False), ('id', False))
+# Campos de /api/hotel-prices -> columna de hotel_usuario
+PRICE_FIELDS = {
+    'id': 'id',
+    'checkin_date': 'checkin_date',
+    'room_type': 'room_type',
+    'price': 'price_amount',
+    'currency': 'price_currency',
+    'price_text': 'price',
+    'scrape_date': 'scrape_date'
+}
+DEFAULT_PRICE_FIELDS = ('id', 'checkin_date', 'room_type', 'price', 'currency', 'scrape_date')
+
+class QueryError(ValueError):
+    """Parámetro de consulta inválido (respuesta 400)"""
+
+def encode_cursor(after):
+    if after is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(after).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str, keyset) -> list:
+    try:
+        after = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        raise QueryError('cursor inválido')
+    if not isinstance(after, list) or len(after) != len(keyset):
+        raise QueryError('cursor inválido')
+    return after
+
+def parse_hotel_usuario_query(args, user_id: str, allowed_fields, keyset) -> dict:
+    """
+    Filtros, campos, tamaño de página y cursor de una consulta a hotel_usuario:
+    checkin_from/checkin_to y scrape_from/scrape_to (YYYY-MM-DD, inclusivos),
+    room_type, fields (separados por comas), limit, cursor y format=ndjson.
+    """
+    filters = {'user_id': f'eq.{user_id}'}
+    for param, column, op in (('checkin_from', 'checkin_date', 'gte'), ('checkin_to', 'checkin_date', 'lte'),
+                              ('scrape_from', 'scrape_date', 'gte'), ('scrape_to', 'scrape_date', 'lte')):
+        value = args.get(param)
+        if not value:
+            continue
+        try:
+            date.fromisoformat(value)
+        except ValueError:
+            raise QueryError(f'{param} debe ser una fecha YYYY-MM-DD')
+        filters.setdefault(column, []).append(f'{op}.{value}')
+    if args.get('room_type'):
+        filters['room_type'] = f"eq.{args['room_type']}"
+    fields = [f.strip() for f in args.get('fields', '').split(',') if f.strip()] or None
+    unknown = [f for f in fields or [] if f not in allowed_fields]
+    if unknown:
+        raise QueryError(f"Campos desconocidos: {', '.join(unknown)} (válidos: {', '.join(allowed_fields)})")
+    try:
+        limit = int(args.get('limit', PAGINATION_CONFIG['default_limit']))
+    except ValueError:
+        raise QueryError('limit debe ser un entero')
+    if not 1 <= limit <= PAGINATION_CONFIG['max_limit']:
+        raise QueryError(f"limit debe estar entre 1 y {PAGINATION_CONFIG['max_limit']}")
+    return {
+        'filters': filters,
+        'fields': fields,
+        'limit': limit,
+        'after': decode_cursor(args['cursor'], keyset) if args.get('cursor') else None,
+        'stream': args.get('format') == 'ndjson',
+        # Clave de caché: todos los parámetros salvo el usuario
+        'cache_key': tuple(sorted((k, v) for k, v in args.items(multi=True) if k != 'user_id'))
+    }
+
+def ndjson_response(fetch_page, project):
+    """
+    Todas las filas como NDJSON, pidiendo una página de stream_page_size a la
+    vez; si Supabase falla a mitad se emite una línea {"error": ...} y se corta.
+    """
+    def generate():
+        after = None
+        while True:
+            try:
+                rows, after = fetch_page(after, PAGINATION_CONFIG['stream_page_size'])
+            except SupabaseError as e:
+                yield json.dumps({'error': f'Supabase error: {e.status}', 'details': e.details}) + '\n'
+                return
+            for row in project(rows):
+                yield json.dumps(row, ensure_ascii=False, default=str) + '\n'
+            if after is None:
+                return
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def with_next_page(response, next_cursor):
+    """
+    Marca una respuesta truncada por limit: el cursor en X-Next-Cursor y la
+    URL de la página siguiente en Link (rel="next"), para que los clientes
+    que no piden cursor vean que faltan filas.
+    """
+    if next_cursor:
+        args = request.args.to_dict(flat=False)
+        args['cursor'] = [next_cursor]
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(args, doseq=True)}>; rel="next"'
+    return response
+
 @app.route('/api/hotels', methods=['GET'])
 def get_hotels():
+    """
+    Filas de hotel_usuario del usuario, de la más reciente a la más antigua,
+    en páginas de `limit` (ver parse_hotel_usuario_query). El cursor de la
+    página siguiente llega en el encabezado X-Next-Cursor.
+    """
     user_id = request.args.get('user_id')
     print('[DEBUG] /api/hotels user_id recibido:', user_id)
     if not user_id:
         return jsonify({'error': 'user_id requerido'}), 400
-    url = f'{SUPABASE_URL}/rest/v1/hotel_usuario?user_id=eq.{user_id}&order=created_at.desc'
-    print('[DEBUG] URL consulta Supabase:', url)
-    response = requests.get(
-        url,
-        headers={
-            'apikey': SUPABASE_KEY,
-            'Authorization': f'Bearer {SUPABASE_KEY}'
-        }
-    )
-    print('[DEBUG] Respuesta Supabase status:', response.status_code)
-    print('[DEBUG] Respuesta Supabase body:', response.text)
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({'error': f'Supabase error: {response.status_code}', 'details': response.text}), response.status_code
+    try:
+        query = parse_hotel_usuario_query(request.args, user_id, HOTEL_USUARIO_COLUMNS, HOTELS_KEYSET)
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    fields = query['fields']
+    keyset_columns = [column for column, _ in HOTELS_KEYSET]
+    columns = ','.join(dict.fromkeys(fields + keyset_columns)) if fields else '*'
+
+    def fetch_page(after, limit):
+        return db.select_page('hotel_usuario', query['filters'], HOTELS_KEYSET, after, limit, columns)
+
+    def project(rows):
+        return [{f: row.get(f) for f in fields} for row in rows] if fields else rows
+
+    if query['stream']:
+        return ndjson_response(fetch_page, project)
+
+    def load():
+        rows, after = fetch_page(query['after'], query['limit'])
+        return project(rows), encode_cursor(after)
+    try:
+        rows, next_cursor = response_cache.get_or_load('hotels', user_id, load, params=query['cache_key'])
+    except SupabaseError as e:
+        return supabase_error_response(e)
+    print('[DEBUG] Filas de hotel_usuario:', len(rows))
+    return with_next_page(jsonify(rows), next_cursor)
 
 @app.route('/api/hotels', methods=['POST'])
 def create_hotel():
@@ -132,24 +257,19 @@ def create_hotel():
     # Obtener JWT del header o del body
     user_jwt = request.headers.get('x-user-jwt') or data.get('jwt')
     # Guardar en Supabase
-    response = requests.post(
-        f'{SUPABASE_URL}/rest/v1/hotels',
-        headers={
-            'apikey': SUPABASE_KEY,
-            'Authorization': f'Bearer {user_jwt if user_jwt else SUPABASE_KEY}',
-            'Content-Type': 'application/json'
-        },
-        json={
+    try:
+        rows = db.insert('hotels', {
             'nombre': nombre,
             'estrellas': estrellas,
             'precio_promedio': precio_promedio,
             'noches_contadas': noches_contadas,
             'user_id': user_id,
             'created_by': user_id
-
-        }
-    )
-    return jsonify(response.json()), response.status_code
+        }, jwt=user_jwt)
+    except SupabaseError as e:
+        return supabase_error_response(e)
+    response_cache.invalidate(user_id, ['hotels'])
+    return jsonify(rows), 201
 
 @app.route('/api/events', methods=['GET'])
 def get_events():
@@ -157,21 +277,15 @@ def get_events():
     print('[DEBUG] /api/events user_id recibido:', user_id)
     if not user_id:
         return jsonify({'error': 'user_id requerido'}), 400
-    url = f'{SUPABASE_URL}/rest/v1/events?created_by=eq.{user_id}&order=created_at.desc'
-    print('[DEBUG] URL consulta Supabase:', url)
-    response = requests.get(
-        url,
-        headers={
-            'apikey': SUPABASE_KEY,
-            'Authorization': f'Bearer {SUPABASE_KEY}'
-        }
-    )
-    print('[DEBUG] Respuesta Supabase status:', response.status_code)
-    print('[DEBUG] Respuesta Supabase body:', response.text)
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
-        return jsonify({'error': f'Supabase error: {response.status_code}', 'details': response.text}), response.status_code
+    try:
+        rows = response_cache.get_or_load(
+            'events', user_id,
+            lambda: db.select('events', {'created_by': f'eq.{user_id}'}, order='created_at.desc')
+        )
+    except SupabaseError as e:
+        return supabase_error_response(e)
+    print('[DEBUG] Eventos:', len(rows))
+    return jsonify(rows)
 
 @app.route('/api/events', methods=['POST'])
 def create_event():
@@ -185,22 +299,18 @@ def create_event():
     lugar = data.get('lugar')
     # ...agrega los campos que uses...
     # Guardar en Supabase
-    response = requests.post(
-        f'{SUPABASE_URL}/rest/v1/events',
-        headers={
-            'apikey': SUPABASE_KEY,
-            'Authorization': f'Bearer {SUPABASE_KEY}',
-            'Content-Type': 'application/json'
-        },
-        json={
+    try:
+        rows = db.insert('events', {
             'nombre': nombre,
             'fecha': fecha,
             'lugar': lugar,
             'created_by': user_id
             # ...agrega los campos que uses...
-        }
-    )
-    return jsonify(response.json()), response.status_code
+        })
+    except SupabaseError as e:
+        return supabase_error_response(e)
+    response_cache.invalidate(user_id, ['events'])
+    return jsonify(rows), 201
 
 @app.route('/api/auth-signup', methods=['POST'])
 def auth_signup():
@@ -227,7 +337,6 @@ def auth_signup():
             user_metadata['hotel_metadata'] = hotel_metadata
 
         # Crear usuario usando la API REST
-        create_user_url = f"{SUPABASE_URL}/auth/v1/admin/users"
         create_user_data = {
             'email': email,
             'password': password,
@@ -236,48 +345,28 @@ def auth_signup():
             'phone_confirm': True
         }
         
-        headers = {
-            'apikey': SUPABASE_KEY,
-            'Authorization': f'Bearer {SUPABASE_KEY}',
-            'Content-Type': 'application/json'
-        }
-        
-        print("[DEBUG] Creando usuario con URL:", create_user_url)
-        print("[DEBUG] Headers:", headers)
-        print("[DEBUG] Data:", create_user_data)
-        
-        response = requests.post(create_user_url, headers=headers, json=create_user_data)
-        print("[DEBUG] Respuesta de creación:", response.status_code, response.text)
-        
-        if response.status_code != 200:
-            return jsonify({'error': f'Error creando usuario: {response.text}'}), response.status_code
-        
-        user_data = response.json()
-        user_id = user_data.get('id')
+        print("[DEBUG] Creando usuario:", email)
+        try:
+            user_data = db.create_user(create_user_data)
+        except SupabaseError as e:
+            print("[DEBUG] Error de creación:", e.status, e.details)
+            return jsonify({'error': f'Error creando usuario: {e.details}'}), e.status or 502
         
         # Iniciar sesión automáticamente
-        signin_url = f"{SUPABASE_URL}/auth/v1/token?grant_type=password"
-        signin_data = {
-            'email': email,
-            'password': password
-        }
-        
-        signin_response = requests.post(signin_url, headers=headers, json=signin_data)
-        print("[DEBUG] Respuesta de login:", signin_response.status_code, signin_response.text)
-        
-        if signin_response.status_code == 200:
-            session_data = signin_response.json()
-            return jsonify({
-                'success': True,
-                'session': session_data,
-                'user': user_data
-            }), 200
-        else:
+        try:
+            session_data = db.sign_in(email, password)
+        except SupabaseError as e:
+            print("[DEBUG] Error de login:", e.status, e.details)
             return jsonify({
                 'success': True,
                 'user': user_data,
                 'message': 'Usuario creado pero no se pudo iniciar sesión automáticamente'
             }), 200
+        return jsonify({
+            'success': True,
+            'session': session_data,
+            'user': user_data
+        }), 200
             
     except Exception as ex:
         print("[DEBUG] Excepción en /api/auth-signup:", ex)
@@ -290,7 +379,8 @@ def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'supabase_configured': bool(SUPABASE_URL and SUPABASE_KEY)
+        'supabase_configured': bool(SUPABASE_URL and SUPABASE_KEY),
+        'response_cache': response_cache.stats()
     })
 
 @app.route('/api/events-local', methods=['GET'])
@@ -330,289 +420,88 @@ def get_events_local():
         print(f'[DEBUG] Exception in get_events_local: {e}')
         return jsonify({'mx': [], 'us': [], 'error': str(e)}), 500
 
+def project_prices(rows: list, fields) -> tuple:
+    """
+    Filas de hotel_usuario -> (precios, importes) con importe numérico (ya
+    normalizado al insertar). Las filas anteriores a la normalización se
+    interpretan aquí sin modificarlas y las que no tienen un importe válido
+    se descartan.
+    """
+    # Copias con price_amount/price_currency para las filas sin normalizar
+    normalized = add_price_columns([{**row} for row in rows if row.get('price_amount') is None])
+    pending = iter(normalized)
+    prices, amounts = [], []
+    for row in rows:
+        values = row if row.get('price_amount') is not None else next(pending)
+        if values['price_amount'] is None:
+            continue
+        amount = float(values['price_amount'])
+        prices.append({field: amount if field == 'price' else values.get(PRICE_FIELDS[field]) for field in fields})
+        amounts.append(amount)
+    return prices, amounts
+
 @app.route('/api/hotel-prices', methods=['GET'])
 def get_hotel_prices():
+    """
+    Precios del hotel del usuario por fecha de check-in, en páginas de
+    `limit` (ver parse_hotel_usuario_query, por defecto
+    PAGINATION_CONFIG['default_limit']). page_average_price y page_records
+    describen solo la página; sustituyen a average_price y total_records, que
+    cubrían todo el historial. has_more indica que faltan filas y next_cursor
+    (también en X-Next-Cursor y Link) pide la siguiente página.
+    """
     user_id = request.args.get('user_id')
     if not user_id:
         return jsonify({'error': 'user_id requerido'}), 400
     
     # Validar formato de UUID
-    import re
     uuid_pattern = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
     if not uuid_pattern.match(user_id):
         return jsonify({'error': 'user_id debe ser un UUID válido'}), 400
     
     try:
-        # Obtener precios del hotel del usuario
-        url = f'{SUPABASE_URL}/rest/v1/hotel_usuario?user_id=eq.{user_id}&order=checkin_date.asc'
-        print(f'[DEBUG] Consultando URL: {url}')
-        response = requests.get(
-            url,
-            headers={
-                'apikey': SUPABASE_KEY,
-                'Authorization': f'Bearer {SUPABASE_KEY}'
-            }
-        )
-        
-        print(f'[DEBUG] Status code: {response.status_code}')
-        print(f'[DEBUG] Response: {response.text[:500]}')
-        
-        if response.status_code == 200:
-            prices = response.json()
-            print(f'[DEBUG] Precios obtenidos: {len(prices)} registros')
-            
-            # Calcular precio promedio
-            if prices:
-                # Convertir precios de string a float, removiendo "MXN " y comas
-                price_values = []
-                processed_prices = []
-                
-                for price in prices:
-                    try:
-                        price_str = str(price.get('price', '0'))
-                        print(f'[DEBUG] Precio original: "{price_str}"')
-                        
-                        # Limpiar el precio de varios formatos
-                        price_clean = price_str
-                        
-                        # Remover prefijos de moneda
-                        price_clean = price_clean.replace('MXN ', '').replace('USD ', '').replace('$', '')
-                        
-                        # Remover comas y espacios
-                        price_clean = price_clean.replace(',', '').replace(' ', '').strip()
-                        
-                        # Remover caracteres no numéricos excepto punto decimal
-                        import re
-                        price_clean = re.sub(r'[^\d.]', '', price_clean)
-                        
-                        # Asegurar que solo hay un punto decimal
-                        if price_clean.count('.') > 1:
-                            parts = price_clean.split('.')
-                            price_clean = parts[0] + '.' + ''.join(parts[1:])
-                        
-                        print(f'[DEBUG] Precio limpio: "{price_clean}"')
-                        
-                        if not price_clean or price_clean == '.':
-                            print(f'[DEBUG] Precio vacío después de limpieza: {price_str}')
-                            continue
-                            
-                        price_float = float(price_clean)
-                        
-                        if price_float <= 0:
-                            print(f'[DEBUG] Precio inválido (<= 0): {price_float}')
-                            continue
-                            
-                        price_values.append(price_float)
-                        
-                        # Crear objeto procesado con precio numérico
-                        processed_price = {
-                            'id': price.get('id'),
-                            'checkin_date': price.get('checkin_date'),
-                            'room_type': price.get('room_type'),
-                            'price': price_float,  # Usar precio numérico
-                            'scrape_date': price.get('scrape_date')
-                        }
-                        processed_prices.append(processed_price)
-                        print(f'[DEBUG] Precio procesado exitosamente: {price_float}')
-                        
-                    except (ValueError, TypeError) as e:
-                        print(f'[DEBUG] Error parsing price: "{price.get("price")}" - Error: {e}')
-                        continue
-                
-                if price_values:
-                    average_price = sum(price_values) / len(price_values)
-                    print(f'[DEBUG] Precio promedio calculado: {average_price}')
-                else:
-                    average_price = 0
-                    print('[DEBUG] No se pudieron procesar precios válidos')
-            else:
-                average_price = 0
-                processed_prices = []
-                print('[DEBUG] No hay precios disponibles')
-            
-            return jsonify({
-                'prices': processed_prices,  # Usar precios procesados
-                'average_price': average_price,
-                'total_records': len(processed_prices)
-            })
-        else:
-            return jsonify({'error': f'Supabase error: {response.status_code}', 'details': response.text}), response.status_code
-            
+        query = parse_hotel_usuario_query(request.args, user_id, tuple(PRICE_FIELDS), PRICES_KEYSET)
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    fields = query['fields'] or list(DEFAULT_PRICE_FIELDS)
+    # Siempre el importe (y el texto para las filas sin normalizar) y las columnas del keyset;
+    # sin la migración de precios se pide solo el texto y se interpreta aquí
+    needed = [PRICE_FIELDS[f] for f in fields] + ['price_amount', 'price', 'price_currency'] + \
+        [column for column, _ in PRICES_KEYSET]
+    if not price_columns_available(db):
+        needed = [column for column in needed if column not in PRICE_COLUMNS]
+    columns = ','.join(dict.fromkeys(needed))
+
+    def fetch_page(after, limit):
+        return db.select_page('hotel_usuario', query['filters'], PRICES_KEYSET, after, limit, columns)
+
+    if query['stream']:
+        return ndjson_response(fetch_page, lambda rows: project_prices(rows, fields)[0])
+
+    def load():
+        rows, after = fetch_page(query['after'], query['limit'])
+        prices, amounts = project_prices(rows, fields)
+        print(f'[DEBUG] Precios: {len(rows)} registros, {len(prices)} válidos')
+        return {
+            'prices': prices,
+            'page_average_price': sum(amounts) / len(amounts) if amounts else 0,
+            'page_records': len(prices),
+            'has_more': after is not None,
+            'next_cursor': encode_cursor(after)
+        }
+    try:
+        # Desde la caché si los datos del usuario no han cambiado
+        result = response_cache.get_or_load('hotel_prices', user_id, load, params=query['cache_key'])
+    except SupabaseError as e:
+        return supabase_error_response(e)
     except Exception as e:
         print(f'Error getting hotel prices: {e}')
         return jsonify({'error': str(e)}), 500
-
-async def scrape_booking_prices(hotel_name: str, locale="en-us", currency="USD"):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)
-        page = await browser.new_page()
-        today = datetime.today()
-        tomorrow = today + timedelta(days=1)
-        checkin = today.strftime("%Y-%m-%d")
-        checkout = tomorrow.strftime("%Y-%m-%d")
-        url = (
-            f"https://www.booking.com/searchresults.html?lang={locale}&selected_currency={currency}"
-            f"&checkin={checkin}&checkout={checkout}"
-        )
-        await page.goto(url)
-        await page.wait_for_timeout(2000)
-        await page.fill("input[name='ss']", hotel_name)
-        await page.wait_for_timeout(1000)
-        suggestion_selectors = [
-            "li[data-testid='autocomplete-result']",
-            "li[data-i='0']",
-            "ul[role='listbox'] li",
-            "li.sb-autocomplete__item"
-        ]
-        suggestions = []
-        clicked = False
-        for sel in suggestion_selectors:
-            try:
-                await page.wait_for_selector(sel, timeout=2000)
-                suggestions = await page.query_selector_all(sel)
-                if suggestions:
-                    for s in suggestions:
-                        try:
-                            div_btn = await s.query_selector("div[role='button']")
-                            if div_btn:
-                                await page.evaluate('(el) => el.click()', div_btn)
-                                clicked = True
-                                break
-                        except Exception:
-                            continue
-                    if not clicked:
-                        try:
-                            await page.evaluate('(el) => el.click()', suggestions[0])
-                            clicked = True
-                        except Exception:
-                            pass
-                    if clicked:
-                        break
-            except Exception:
-                continue
-        if not clicked:
-            await page.wait_for_timeout(2000)
-            await page.focus("input[name='ss']")
-            await page.keyboard.press("Enter")
-        await page.wait_for_selector("button[type='submit']", timeout=10000)
-        await page.click("button[type='submit']")
-        await page.wait_for_load_state("networkidle")
-        popup_selectors = [
-            "button[aria-label*='Dismiss']",
-            ".bui-modal__close",
-            "button[aria-label*='Cerrar']",
-            "button[aria-label*='Close']",
-            "button[aria-label*='Accept']",
-            "button[aria-label*='Aceptar']",
-            "button[aria-label*='Entendido']",
-            "button[aria-label*='Got it']",
-            "button[aria-label*='OK']",
-            "button[aria-label*='Allow']",
-            "button[aria-label*='Permitir']",
-            "button[data-testid='cookie-banner-close-button']",
-            "#onetrust-accept-btn-handler",
-            ".modal-mask .modal-close",
-            ".modal__close",
-            ".close-button",
-            ".c-modal__close"
-        ]
-        for _ in range(3):
-            for sel in popup_selectors:
-                try:
-                    el = await page.query_selector(sel)
-                    if el:
-                        await el.click()
-                        await page.wait_for_timeout(500)
-                except Exception:
-                    pass
-        await page.wait_for_selector("a[data-testid='property-card-desktop-single-image']", timeout=10000)
-        hotel_link = await page.query_selector("a[data-testid='property-card-desktop-single-image']")
-        if not hotel_link:
-            raise RuntimeError("No se encontró el enlace del hotel en los resultados.")
-        context = page.context
-        new_page_promise = context.wait_for_event("page")
-        await hotel_link.click()
-        try:
-            new_page = await asyncio.wait_for(new_page_promise, timeout=10)
-            await new_page.wait_for_load_state("networkidle")
-            page_to_scrape = new_page
-        except asyncio.TimeoutError:
-            page_to_scrape = page
-        for _ in range(3):
-            for sel in popup_selectors:
-                try:
-                    el = await page_to_scrape.query_selector(sel)
-                    if el:
-                        await el.click()
-                        await page_to_scrape.wait_for_timeout(500)
-                except Exception:
-                    pass
-        try:
-            await page_to_scrape.wait_for_selector("#hprt-table", timeout=30000, state='visible')
-        except Exception:
-            print("No se encontró la tabla de habitaciones")
-            html = await page_to_scrape.content()
-            print(html[:2000])
-            await browser.close()
-            return []
-        results = []
-        base_url = page_to_scrape.url
-        for offset in range(0, 3):
-            checkin = (today + timedelta(days=offset)).strftime("%Y-%m-%d")
-            checkout = (today + timedelta(days=offset+1)).strftime("%Y-%m-%d")
-            new_url = re.sub(r"checkin=\d{4}-\d{2}-\d{2}", f"checkin={checkin}", base_url)
-            new_url = re.sub(r"checkout=\d{4}-\d{2}-\d{2}", f"checkout={checkout}", new_url)
-            await page_to_scrape.goto(new_url)
-            await asyncio.sleep(2)
-            try:
-                await page_to_scrape.wait_for_selector("#hprt-table", timeout=20000, state='visible')
-            except Exception:
-                print(f"No se encontró la tabla de habitaciones para {checkin}")
-                continue
-            rows = await page_to_scrape.query_selector_all("#hprt-table tr")
-            day_rooms = []
-            for row in rows:
-                try:
-                    room_type_el = await row.query_selector("th span.hprt-roomtype-icon-link")
-                    price_el = None
-                    tds = await row.query_selector_all("td")
-                    for td in tds:
-                        price_candidate = await td.query_selector("span.prco-valign-middle-helper")
-                        if price_candidate:
-                            price_el = price_candidate
-                            break
-                    if room_type_el and price_el:
-                        room_text = (await room_type_el.inner_text()).strip()
-                        price_text = (await price_el.inner_text()).strip()
-                        day_rooms.append({"room_type": room_text, "price": price_text})
-                except Exception:
-                    continue
-            results.append({"date": checkin, "rooms": day_rooms})
-        await browser.close()
-        return results
-
-async def insert_user_hotel_prices(user_id: str, hotel_name: str, results: list):
-    for day in results:
-        checkin_date = day["date"]
-        for room in day["rooms"]:
-            r = supabase.table("hotel_usuario").insert({
-                "user_id": user_id,
-                "hotel_name": hotel_name,
-                "scrape_date": datetime.today().strftime("%Y-%m-%d"),
-                "checkin_date": checkin_date,
-                "room_type": room["room_type"],
-                "price": room["price"]
-            }).execute()
-            print("Insert response:", r)
-
-async def main_scrape(user_id: str, hotel_name: str):
-    prices = await scrape_booking_prices(hotel_name)
-    print("Precios:", prices)
-    await insert_user_hotel_prices(user_id, hotel_name, prices)
-    print("¡Listo!")
+    return with_next_page(jsonify(result), result['next_cursor'])
 
 @app.route('/run-scrape-hotel-propio', methods=['POST'])
 def run_scrape_hotel_propio():
+    from python_scripts import hotel_propio
     try:
         data = request.get_json()
         user_id = data.get('user_id')
@@ -620,28 +509,13 @@ def run_scrape_hotel_propio():
         jwt = data.get('jwt', '')  # <-- Nuevo: lee el JWT del body
         if not user_id or not hotel_name:
             return {'status': 'error', 'message': 'user_id y hotel_name requeridos'}, 400
-        args = [
-            'python', 'python_scripts/hotel_propio.py',
-            user_id, hotel_name
-        ]
-        if jwt:
-            args += ['--jwt', jwt]  # <-- Nuevo: agrega el JWT si existe
-        print('Args to subprocess:', args)
-        result = subprocess.run(
-            args,
-            capture_output=True,
-            text=True,
-            check=True,
-            encoding='utf-8',
-            errors='replace'
+        print('Scraping hotel propio:', user_id, hotel_name)
+        result = run_coroutine(
+            hotel_propio.run_hotel_propio(user_id, hotel_name, headless_mode='true', jwt=jwt),
+            timeout=JOBS_CONFIG['timeouts']['hotel_propio']
         )
-        print('STDOUT:', result.stdout)
-        print('STDERR:', result.stderr)
-        return jsonify({'output': result.stdout}), 200
-    except subprocess.CalledProcessError as e:
-        print('STDOUT:', e.stdout)
-        print('STDERR:', e.stderr)
-        return jsonify({'error': e.stderr}), 500
+        response_cache.invalidate(user_id, ['hotels', 'hotel_prices'])
+        return jsonify({'output': result}), 200
     except Exception as ex:
         print('General Exception:', ex)
         return jsonify({'error': str(ex)}), 500
@@ -651,18 +525,10 @@ def get_scraping_period():
     user_id = request.args.get('user_id')
     if not user_id:
         return jsonify({'error': 'user_id requerido'}), 400
-    SUPABASE_URL = os.getenv("SUPABASE_URL")
-    SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-    headers = {
-        'apikey': SUPABASE_KEY,
-        'Authorization': f'Bearer {SUPABASE_KEY}'
-    }
-    user_url = f"{SUPABASE_URL}/auth/v1/admin/users/{user_id}"
-    user_resp = requests.get(user_url, headers=headers)
-    if user_resp.status_code != 200:
-        return jsonify({'error': 'No se pudo obtener el usuario de Supabase', 'details': user_resp.text}), 500
-    user_data = user_resp.json()
-    user_meta = user_data.get('user_metadata', {})
+    try:
+        user_meta = db.get_user(user_id).get('user_metadata', {})
+    except SupabaseError as e:
+        return supabase_error_response(e, 'No se pudo obtener el usuario de Supabase', 500)
     scraping_period_days = user_meta.get('scraping_period_days')
     last_scraping_run = user_meta.get('last_scraping_run')
     return jsonify({'scraping_period_days': scraping_period_days, 'last_scraping_run': last_scraping_run})
@@ -674,208 +540,175 @@ def set_scraping_period():
     scraping_period_days = data.get('scraping_period_days')
     if not user_id or not scraping_period_days:
         return jsonify({'error': 'user_id y scraping_period_days requeridos'}), 400
-    SUPABASE_URL = os.getenv("SUPABASE_URL")
-    SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-    headers = {
-        'apikey': SUPABASE_KEY,
-        'Authorization': f'Bearer {SUPABASE_KEY}',
-        'Content-Type': 'application/json'
-    }
-    user_url = f"{SUPABASE_URL}/auth/v1/admin/users/{user_id}"
-    # Obtener metadata actual
-    user_resp = requests.get(user_url, headers=headers)
-    if user_resp.status_code != 200:
-        return jsonify({'error': 'No se pudo obtener el usuario de Supabase', 'details': user_resp.text}), 500
-    user_data = user_resp.json()
-    user_meta = user_data.get('user_metadata', {})
-    user_meta['scraping_period_days'] = scraping_period_days
-    print('PATCH URL:', user_url)
-    print('PATCH HEADERS:', headers)
-    print('PATCH BODY:', {"user_metadata": user_meta})
-    patch_resp = requests.put(user_url, headers={**headers, 'Content-Type': 'application/json'}, json={"user_metadata": user_meta})
-    print('PATCH STATUS CODE:', patch_resp.status_code)
-    if patch_resp.status_code != 200:
-        print('PATCH ERROR:', patch_resp.text)
-        return jsonify({'error': 'No se pudo actualizar la metadata', 'details': patch_resp.text}), 500
+    # Mezcla con la metadata actual del usuario
+    try:
+        db.update_user_metadata(user_id, {'scraping_period_days': scraping_period_days})
+    except SupabaseError as e:
+        print('PATCH ERROR:', e.status, e.details)
+        return supabase_error_response(e, 'No se pudo actualizar la metadata', 500)
     return jsonify({'success': True})
 
-# Modificar run_all_scrapings para guardar la última ejecución
+# Dueño de los trabajos por lotes del scheduler (no es un usuario real)
+SCHEDULED_JOB_OWNER = 'scheduler'
+
+def update_last_scraping_run(job):
+    """Guarda la fecha de última ejecución en la metadata del usuario (o usuarios del lote) al terminar un trabajo"""
+    if job['state'] == 'cancelled':
+        return
+    if job['user_id'] != SCHEDULED_JOB_OWNER:
+        set_last_scraping_run(job['user_id'])
+        return
+    # Lote del scheduler: los usuarios cuyo hotel se procesó sin error
+    batch_result = next((s['result'] for s in job['scripts'] if s['name'] == 'hotel_propio_batch'), None) or {}
+    for item in batch_result.get('results', []):
+        if not item.get('error'):
+            set_last_scraping_run(item['user_id'])
+
+def set_last_scraping_run(user_id: str):
+    try:
+        db.update_user_metadata(user_id, {'last_scraping_run': datetime.utcnow().isoformat()})
+    except SupabaseError as e:
+        print('No se pudo actualizar last_scraping_run:', e.details)
+    except Exception as e:
+        print(f'Error actualizando last_scraping_run: {e}')
+
+def invalidate_scraped_users(job):
+    """Al terminar un trabajo (aunque sea cancelado o con error) sus usuarios pueden tener datos nuevos"""
+    if job['user_id'] != SCHEDULED_JOB_OWNER:
+        response_cache.invalidate(job['user_id'])
+    else:
+        # Lote nocturno: toca a muchos usuarios (hoteles y eventos), se vacía toda la caché
+        response_cache.clear()
+
+scrape_jobs.on_complete(update_last_scraping_run)
+scrape_jobs.on_complete(invalidate_scraped_users)
+
+async def scrape_hotel_propio_step(user_id: str, hotel_name: str):
+    """Paso de trabajo: precios del hotel del usuario, resumido para el estado del trabajo"""
+    from python_scripts import hotel_propio
+    result = await hotel_propio.run_hotel_propio(user_id, hotel_name, headless_mode='true')
+    return {
+        'days': len(result['prices']),
+        'rooms': sum(len(day['rooms']) for day in result['prices']),
+        'insert': result['insert']
+    }
+
+async def scrape_eventos_step(user_id: str, hotel_name: str):
+    """Paso de trabajo: eventos cercanos al hotel del usuario"""
+    from python_scripts import scrape_eventos
+    lat, lon = scrape_eventos.get_hotel_coordinates(hotel_name)
+    eventos = await scrape_eventos.fetch_nearby_events(lat, lon, 10, user_id, hotel_name)
+    return {'mx': len(eventos['mx']), 'us': len(eventos['us'])}
+
+async def scrape_hotel_propio_batch_step(pairs: list):
+    """Paso de trabajo: hoteles de varios usuarios, cada hotel distinto se scrapea una vez"""
+    from python_scripts import hotel_propio
+    summary = await hotel_propio.run_hotel_propio_batch(pairs, headless_mode='true')
+    return {
+        'users': summary['users'],
+        'hotels': summary['hotels'],
+        'results': [
+            {key: item.get(key) for key in ('user_id', 'hotel_name', 'days', 'rooms', 'error')}
+            for item in summary['results']
+        ]
+    }
+
+async def scrape_eventos_batch_step(pairs: list):
+    """Paso de trabajo: eventos cercanos para cada usuario del lote"""
+    totals = {'ok': 0, 'errors': 0}
+    for user_id, hotel_name in pairs:
+        try:
+            await scrape_eventos_step(user_id, hotel_name)
+            totals['ok'] += 1
+        except Exception as e:
+            print(f'Error scrapeando eventos para usuario {user_id}: {e}')
+            totals['errors'] += 1
+    return totals
+
+def build_scheduled_batch_scripts(pairs: list):
+    """Pasos del trabajo nocturno por lotes: un solo proceso y pool de navegadores para todos los usuarios"""
+    timeouts = JOBS_CONFIG['timeouts']
+    return [
+        {
+            'name': 'hotel_propio_batch',
+            'run': lambda: scrape_hotel_propio_batch_step(pairs),
+            'timeout': timeouts['hotel_propio_batch']
+        },
+        {
+            'name': 'scrape_eventos_batch',
+            'run': lambda: scrape_eventos_batch_step(pairs),
+            'timeout': timeouts['scrape_eventos_batch']
+        }
+    ]
+
+def build_scraping_scripts(user_id: str, hotel_name: str):
+    """Pasos que forman un trabajo de /run-all-scrapings (se ejecutan en el loop de trabajo)"""
+    timeouts = JOBS_CONFIG['timeouts']
+    return [
+        {
+            'name': 'hotel_propio',
+            'run': lambda: scrape_hotel_propio_step(user_id, hotel_name),
+            'timeout': timeouts['hotel_propio']
+        },
+        {
+            'name': 'scrape_eventos',
+            'run': lambda: scrape_eventos_step(user_id, hotel_name),
+            'timeout': timeouts['scrape_eventos']
+        }
+    ]
+
 @app.route('/run-all-scrapings', methods=['POST'])
 def run_all_scrapings():
-    import traceback
-    from datetime import datetime
-    
-    # Debug logs para registrar inicio del proceso
-    start_time = datetime.now()
-    print("=" * 60)
-    print(f"[DEBUG] SCRAPING PROCESS STARTED at {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
-    print("=" * 60)
-    print("=== /run-all-scrapings endpoint called ===")
-    print("Request method:", request.method)
-    print("Request headers:", dict(request.headers))
-    print("Request origin:", request.headers.get('Origin'))
-    
+    """Encola el scraping del usuario y devuelve el ID del trabajo sin esperar a que termine"""
     data = request.get_json()
     print('[LOG] /run-all-scrapings called. data:', data)
     user_id = data.get('user_id')
-    print('[LOG] user_id extracted:', user_id)
-    
     if not user_id:
         print('[LOG] user_id not provided')
         return {'error': 'user_id requerido'}, 400
     try:
-        SUPABASE_URL = os.getenv("SUPABASE_URL")
-        SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-        headers = {
-            'apikey': SUPABASE_KEY,
-            'Authorization': f'Bearer {SUPABASE_KEY}'
-        }
-        user_url = f"{SUPABASE_URL}/auth/v1/admin/users/{user_id}"
-        user_resp = requests.get(user_url, headers=headers)
-        if user_resp.status_code != 200:
-            return {'error': 'No se pudo obtener el usuario de Supabase', 'details': user_resp.text}, 500
-        user_data = user_resp.json()
-        user_meta = user_data.get('user_metadata', {})
-        hotel_name = user_meta.get('hotel') or user_meta.get('hotel_name') or user_meta.get('name') or ''
-        phone = user_meta.get('Phone') or user_meta.get('phone') or ''
-        # Ejecutar los scripts como antes...
-        scripts = [
-            ['python', 'python_scripts/hotel_propio.py', user_id, hotel_name, '--headless', 'true'],
-            ['python', 'python_scripts/scrape_eventos.py', hotel_name, '10', user_id]
-        ]
-        processes = []
-        for script_args in scripts:
-            try:
-                # Usar sys.executable para asegurar que usamos el mismo Python
-                import sys
-                script_args[0] = sys.executable
-                
-                print(f"Ejecutando script: {' '.join(script_args)}")
-                
-                p = subprocess.Popen(
-                    script_args,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    cwd=os.getcwd(),  # Asegurar que estamos en el directorio correcto
-                    env=os.environ.copy()  # Copiar el entorno actual
-                )
-                processes.append((script_args, p))
-            except Exception as sub_ex:
-                print(f"Error lanzando subprocess: {sub_ex}")
-                processes.append((script_args, None))
-        results = []
-        for script_args, p in processes:
-            if p is None:
-                results.append({
-                    'script': ' '.join(script_args),
-                    'stdout': '',
-                    'stderr': 'Failed to launch subprocess',
-                    'returncode': -1
-                })
-                continue
-            try:
-                # Timeout diferenciado por tipo de script
-                script_name = ' '.join(script_args)
-                if 'hotel_propio.py' in script_name:
-                    timeout = 2700  # 45 minutos para hoteles
-                elif 'scrape_eventos.py' in script_name:
-                    timeout = 600   # 10 minutos para eventos
-                else:
-                    timeout = 1800  # 30 minutos por defecto
-                
-                stdout, stderr = p.communicate(timeout=timeout)
-                results.append({
-                    'script': ' '.join(script_args),
-                    'stdout': stdout,
-                    'stderr': stderr,
-                    'returncode': p.returncode
-                })
-                print(f"Script completado: {' '.join(script_args)}")
-                print(f"Return code: {p.returncode}")
-                if stdout:
-                    print(f"STDOUT: {stdout[:500]}...")
-                if stderr:
-                    print(f"STDERR: {stderr[:500]}...")
-            except subprocess.TimeoutExpired:
-                p.kill()
-                script_name = ' '.join(script_args)
-                if 'hotel_propio.py' in script_name:
-                    timeout_msg = 'Script de hoteles timed out after 45 minutes'
-                elif 'scrape_eventos.py' in script_name:
-                    timeout_msg = 'Script de eventos timed out after 10 minutes'
-                else:
-                    timeout_msg = 'Script timed out after 30 minutes'
-                
-                results.append({
-                    'script': ' '.join(script_args),
-                    'stdout': '',
-                    'stderr': timeout_msg,
-                    'returncode': -1
-                })
-                print(f"Script timeout: {' '.join(script_args)}")
-            except Exception as comm_ex:
-                results.append({
-                    'script': ' '.join(script_args),
-                    'stdout': '',
-                    'stderr': str(comm_ex),
-                    'returncode': -1
-                })
-                print(f"Error en comunicación: {comm_ex}")
-        # Guardar la fecha de última ejecución en la metadata
-        user_meta['last_scraping_run'] = datetime.utcnow().isoformat()
         try:
-            patch_resp = requests.put(user_url, headers={**headers, 'Content-Type': 'application/json'}, json={"user_metadata": user_meta})
-            if patch_resp.status_code != 200:
-                print('No se pudo actualizar last_scraping_run:', patch_resp.text)
-        except Exception as e:
-            print(f'Error actualizando last_scraping_run: {e}')
-        
-        # Verificar si al menos un script se ejecutó exitosamente
-        successful_scripts = [r for r in results if r['returncode'] == 0]
-        if not successful_scripts:
-            print("ADVERTENCIA: Ningún script se ejecutó exitosamente")
-        else:
-            print(f"Éxito: {len(successful_scripts)} de {len(results)} scripts completados")
-        
-        # Debug logs para registrar fin del proceso
-        end_time = datetime.now()
-        duration = end_time - start_time
-        print("=" * 60)
-        print(f"[DEBUG] SCRAPING PROCESS COMPLETED at {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"[DEBUG] TOTAL DURATION: {duration}")
-        print(f"[DEBUG] Duration in seconds: {duration.total_seconds():.2f}")
-        print("=" * 60)
-        
-        return jsonify({'results': results})
+            user_meta = db.get_user(user_id).get('user_metadata', {})
+        except SupabaseError as e:
+            return supabase_error_response(e, 'No se pudo obtener el usuario de Supabase', 500)
+        hotel_name = user_meta.get('hotel') or user_meta.get('hotel_name') or user_meta.get('name') or ''
+        job = scrape_jobs.submit(user_id, build_scraping_scripts(user_id, hotel_name))
+        print(f"[LOG] Trabajo {job['job_id']} ({job['state']}) para usuario {user_id}")
+        return jsonify({
+            'job_id': job['job_id'],
+            'state': job['state'],
+            'status_url': f"/jobs/{job['job_id']}"
+        }), 202
+    except JobQueueFull as ex:
+        return jsonify({'error': str(ex)}), 429
     except Exception as ex:
-        # Debug logs para registrar error del proceso
-        end_time = datetime.now()
-        duration = end_time - start_time
-        print("=" * 60)
-        print(f"[DEBUG] SCRAPING PROCESS FAILED at {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"[DEBUG] DURATION BEFORE ERROR: {duration}")
-        print(f"[DEBUG] Duration in seconds: {duration.total_seconds():.2f}")
-        print(f"[DEBUG] ERROR: {ex}")
-        print("=" * 60)
         print('General Exception:', ex)
         return jsonify({'error': str(ex)}), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = scrape_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = scrape_jobs.cancel(job_id)
+    if not job:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(job)
+
 def run_scheduled_scrapings():
     try:
-        SUPABASE_URL = os.getenv("SUPABASE_URL")
-        SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-        headers = {
-            'apikey': SUPABASE_KEY,
-            'Authorization': f'Bearer {SUPABASE_KEY}'
-        }
         # Obtener todos los usuarios
-        users_url = f"{SUPABASE_URL}/auth/v1/admin/users"
-        resp = requests.get(users_url, headers=headers)
-        if resp.status_code != 200:
-            print('No se pudo obtener la lista de usuarios:', resp.text)
+        try:
+            users = db.list_users()
+        except SupabaseError as e:
+            print('No se pudo obtener la lista de usuarios:', e.details)
             return
-        users = resp.json().get('users', [])
+        due = []
         for user in users:
             user_id = user['id']
             meta = user.get('user_metadata', {})
@@ -894,10 +727,16 @@ def run_scheduled_scrapings():
                 last_run_dt = None
             if not last_run_dt or (now - last_run_dt).days >= int(period):
                 print(f'Auto-running scraping para usuario {user_id}')
-                try:
-                    requests.post(f'http://localhost:5000/run-all-scrapings', json={'user_id': user_id}, timeout=600)
-                except Exception as e:
-                    print(f'Error auto-running scraping para usuario {user_id}:', e)
+                hotel_name = meta.get('hotel') or meta.get('hotel_name') or meta.get('name') or ''
+                due.append((user_id, hotel_name))
+        if not due:
+            return
+        # Un solo trabajo por lotes: los hoteles que siguen varios usuarios se scrapean una vez
+        try:
+            job = scrape_jobs.submit(SCHEDULED_JOB_OWNER, build_scheduled_batch_scripts(due))
+            print(f"Trabajo por lotes {job['job_id']} encolado para {len(due)} usuarios")
+        except Exception as e:
+            print('Error auto-running scraping por lotes:', e)
     except Exception as e:
         print('Error en run_scheduled_scrapings:', e)
 
@@ -915,38 +754,12 @@ def amadeus_hotels():
     keyword = data.get('keyword', None)
     if lat is None or lng is None:
         return jsonify({'error': 'lat y lng son requeridos'}), 400
-    args = [
-        'python', 'python_scripts/amadeus_hotels.py',
-        '--lat', str(lat),
-        '--lng', str(lng),
-        '--radius', str(radius)
-    ]
-    if keyword:
-        args += ['--keyword', keyword]
+    from python_scripts.amadeus_hotels import search_hotels
     try:
-        result = subprocess.run(
-            args,
-            capture_output=True,
-            text=True,
-            check=True,
-            encoding='utf-8',
-            errors='replace'
-        )
-        import json
-        try:
-            hotels = json.loads(result.stdout)
-        except Exception as ex:
-            print('[ERROR] No se pudo parsear JSON de amadeus_hotels.py:', result.stdout)
-            return jsonify({'error': 'Respuesta no válida del script Amadeus', 'details': result.stdout}), 500
-        if isinstance(hotels, dict) and 'error' in hotels:
-            print('[ERROR] Script Amadeus devolvió error:', hotels['error'])
-            return jsonify({'error': hotels['error']}), 500
+        hotels = search_hotels(lat, lng, radius, keyword)
         return jsonify({'hotels': hotels}), 200
-    except subprocess.CalledProcessError as e:
-        print('[ERROR] Subprocess error:', e.stderr)
-        return jsonify({'error': e.stderr}), 500
     except Exception as ex:
-        print('[ERROR] Excepción general:', ex)
+        print('[ERROR] Error consultando Amadeus:', ex)
         return jsonify({'error': str(ex)}), 500
 
 if __name__ == '__main__':
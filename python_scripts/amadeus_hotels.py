@@ -9,11 +9,9 @@ load_dotenv()
 AMADEUS_CLIENT_ID = os.getenv("AMADEUS_API_KEY")
 AMADEUS_CLIENT_SECRET = os.getenv("AMADEUS_API_SECRET")
 
-if not AMADEUS_CLIENT_ID or not AMADEUS_CLIENT_SECRET:
-    print(json.dumps({"error": "Faltan las variables de entorno AMADEUS_CLIENT_ID o AMADEUS_CLIENT_SECRET"}))
-    sys.exit(1)
-
 def get_access_token():
+    if not AMADEUS_CLIENT_ID or not AMADEUS_CLIENT_SECRET:
+        raise ValueError("Faltan las variables de entorno AMADEUS_CLIENT_ID o AMADEUS_CLIENT_SECRET")
     url = "https://test.api.amadeus.com/v1/security/oauth2/token"
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
     data = {
@@ -23,8 +21,7 @@ def get_access_token():
     }
     res = requests.post(url, headers=headers, data=data)
     if res.status_code != 200:
-        print(json.dumps({"error": f"Error obteniendo token: {res.text}"}))
-        sys.exit(1)
+        raise Exception(f"Error obteniendo token: {res.text}")
     return res.json().get("access_token")
 
 def get_hotels_by_geocode(lat, lng, token=None, radius=20, keyword=None):
@@ -46,6 +43,11 @@ def get_hotels_by_geocode(lat, lng, token=None, radius=20, keyword=None):
         hotels = [h for h in hotels if keyword.lower() in h.get("name", "").lower()]
     return hotels
 
+def search_hotels(lat, lng, radius=20, keyword=None):
+    """Obtiene un token y devuelve la lista de hoteles cercanos (lanza excepción si falla)"""
+    token = get_access_token()
+    return get_hotels_by_geocode(lat, lng, token, radius, keyword)
+
 # CLI Mode
 if __name__ == "__main__":
     import argparse
@@ -56,8 +58,7 @@ if __name__ == "__main__":
     parser.add_argument("--keyword", required=False, help="Filtrar por nombre de hotel")
     args = parser.parse_args()
     try:
-        token = get_access_token()
-        hotels = get_hotels_by_geocode(args.lat, args.lng, token, args.radius, args.keyword)
+        hotels = search_hotels(args.lat, args.lng, args.radius, args.keyword)
         print(json.dumps(hotels, ensure_ascii=False))
     except Exception as e:
         print(json.dumps({"error": str(e)}))
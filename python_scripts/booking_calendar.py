@@ -0,0 +1,161 @@
+"""
+Precios por noche de todo el horizonte desde el calendario de disponibilidad
+de Booking (operación GraphQL AvailabilityCalendar de la página del hotel).
+
+Cada petición cubre varias semanas, así que el horizonte completo se obtiene
+con unas pocas llamadas hechas desde la propia página (mismas cookies y
+origen). Solo las fechas marcadas como interesantes se cargan después una a
+una para tener el desglose por tipo de habitación.
+"""
+import logging
+import math
+import re
+from datetime import datetime, timedelta
+from statistics import median
+from typing import Any, Dict, List, Optional
+
+try:
+    from .config import CALENDAR_CONFIG
+    from .price_utils import normalize_prices
+except ImportError:
+    from config import CALENDAR_CONFIG
+    from price_utils import normalize_prices
+
+logger = logging.getLogger(__name__)
+
+# Tipo de habitación con el que se guarda el precio del calendario en hotel_usuario
+CALENDAR_ROOM_TYPE = "Precio más bajo (calendario)"
+
+AVAILABILITY_CALENDAR_QUERY = """
+query AvailabilityCalendar($input: AvailabilityCalendarQueryInput!) {
+  availabilityCalendar(input: $input) {
+    ... on AvailabilityCalendarQueryResult {
+      hotelId
+      days { available avgPriceFormatted checkin minLengthOfStay __typename }
+      __typename
+    }
+    ... on AvailabilityCalendarQueryError { message __typename }
+    __typename
+  }
+}
+"""
+
+# Se ejecuta en la página del hotel: usa sus cookies y el token CSRF de la sesión
+_FETCH_JS = """
+async ({url, body}) => {
+    const headers = {'Content-Type': 'application/json'};
+    const csrf = (window.booking && window.booking.env && window.booking.env.b_csrf_token) || null;
+    if (csrf) headers['X-Booking-CSRF-Token'] = csrf;
+    const r = await fetch(url, {method: 'POST', headers, body: JSON.stringify(body), credentials: 'include'});
+    if (!r.ok) return {status: r.status, json: null};
+    return {status: r.status, json: await r.json()};
+}
+"""
+
+_HOTEL_PATH_RE = re.compile(r"/hotel/([a-z]{2})/([^/.?]+)")
+
+
+def pagename_details(hotel_url: str) -> Optional[Dict[str, str]]:
+    """countryCode y pagename a partir de /hotel/<cc>/<pagename>.<lang>.html"""
+    match = _HOTEL_PATH_RE.search(hotel_url)
+    if not match:
+        return None
+    return {"countryCode": match.group(1), "pagename": match.group(2)}
+
+
+async def fetch_calendar(page, hotel_url: str, start: datetime, days: int,
+                         adults: int = 2, rooms: int = 1) -> Dict[str, Dict[str, Any]]:
+    """
+    Devuelve {fecha: {"available", "price", "min_length_of_stay"}} para
+    `days` noches desde `start`, en ventanas de CALENDAR_CONFIG["window_days"].
+    Un diccionario vacío significa que el calendario no está disponible.
+    """
+    details = pagename_details(hotel_url)
+    if not details:
+        logger.info(f"[CALENDAR] No se reconoce la URL del hotel: {hotel_url}")
+        return {}
+    lang = re.search(r"[?&]lang=([\w-]+)", hotel_url)
+    graphql_url = "https://www.booking.com/dml/graphql" + (f"?lang={lang.group(1)}" if lang else "")
+
+    calendar: Dict[str, Dict[str, Any]] = {}
+    window = CALENDAR_CONFIG["window_days"]
+    for offset in range(0, days, window):
+        body = {
+            "operationName": "AvailabilityCalendar",
+            "query": AVAILABILITY_CALENDAR_QUERY,
+            "variables": {
+                "input": {
+                    "travelPurpose": 2,
+                    "pagenameDetails": details,
+                    "searchConfig": {
+                        "searchConfigDate": {
+                            "startDate": (start + timedelta(days=offset)).strftime("%Y-%m-%d"),
+                            "amountOfDays": min(window, days - offset),
+                        },
+                        "nbAdults": adults,
+                        "nbRooms": rooms,
+                        "nbChildren": 0,
+                        "childrenAges": [],
+                    },
+                }
+            },
+        }
+        try:
+            response = await page.evaluate(_FETCH_JS, {"url": graphql_url, "body": body})
+        except Exception as e:
+            logger.warning(f"[CALENDAR] Error pidiendo el calendario: {e}")
+            return {}
+        result = ((response or {}).get("json") or {}).get("data", {}).get("availabilityCalendar") or {}
+        if "days" not in result:
+            logger.warning(f"[CALENDAR] Respuesta sin días ({(response or {}).get('status')}): {result.get('message', '')}")
+            return {}
+        for day in result["days"]:
+            calendar[day["checkin"]] = {
+                "available": bool(day.get("available")),
+                "price": day.get("avgPriceFormatted"),
+                "min_length_of_stay": day.get("minLengthOfStay"),
+            }
+    logger.info(f"[CALENDAR] {len(calendar)} noches en {-(-days // window)} peticiones")
+    return calendar
+
+
+def flag_interesting_dates(calendar: Dict[str, Dict[str, Any]], threshold_pct: float = None,
+                           max_dates: int = None) -> List[str]:
+    """
+    Fechas que merecen el desglose por habitación: la primera del horizonte y
+    las disponibles cuyo precio se aleja de la mediana o del día anterior más
+    de threshold_pct. Como mucho max_dates, priorizando las mayores desviaciones.
+    """
+    threshold = (CALENDAR_CONFIG["threshold_pct"] if threshold_pct is None else threshold_pct) / 100
+    max_dates = CALENDAR_CONFIG["max_detail_dates"] if max_dates is None else max_dates
+    dates = sorted(calendar)
+    available = [d for d in dates if calendar[d]["available"]]
+    # Mismas reglas de separadores que hotel_usuario ("MXN 1.250,50" -> 1250.5)
+    parsed = normalize_prices(calendar[d]["price"] for d in available)["price_amount"].tolist()
+    amounts = {d: a for d, a in zip(available, parsed) if not math.isnan(a)}
+    if not amounts:
+        return dates[:1]
+    mid = median(amounts.values())
+
+    scores = {}
+    previous = None
+    for d in dates:
+        amount = amounts.get(d)
+        if amount is None:
+            previous = None
+            continue
+        deviation = abs(amount - mid) / mid
+        jump = abs(amount - previous) / previous if previous else 0
+        if max(deviation, jump) >= threshold:
+            scores[d] = max(deviation, jump)
+        previous = amount
+
+    flagged = sorted(scores, key=scores.get, reverse=True)[:max_dates]
+    return sorted(set(flagged) | {dates[0]})
+
+
+def calendar_rooms(entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Habitaciones (formato de extract_room_table) para una noche del calendario"""
+    if not entry["available"] or not entry["price"]:
+        return []
+    return [{"room_type": CALENDAR_ROOM_TYPE, "price": entry["price"], "source": "calendar"}]
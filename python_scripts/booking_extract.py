@@ -0,0 +1,303 @@
+"""
+Extracción de la tabla de habitaciones de Booking (#hprt-table) con un solo
+page.evaluate.
+
+Todo el recorrido del DOM (tabla, filas, tipo de habitación, precio,
+ocupación y condiciones) se hace dentro de la página y se devuelve como JSON,
+en lugar de una llamada CDP por selector, fila y celda.
+
+parse_room_table hace el mismo recorrido sobre HTML descargado sin navegador
+(BeautifulSoup) y devuelve la misma estructura.
+"""
+import re
+from typing import Any, Dict, List
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# ─── Selectores candidatos (se prueban en orden dentro del script) ────────
+TABLE_SELECTORS = [
+    "#hprt-table",
+    ".hprt-table",
+    "table[data-et-view]",
+    "table.hprt-table",
+    ".roomstable",
+    "table[class*='room']",
+    "table[class*='hprt']",
+    "table"
+]
+
+ROW_SELECTORS = [
+    "#hprt-table tr",
+    "#hprt-table tbody tr",
+    ".hprt-table tr",
+    "table[data-et-view] tr"
+]
+
+ROOM_TYPE_SELECTORS = [
+    "th span.hprt-roomtype-icon-link",
+    "th .hprt-roomtype-icon-link",
+    "th .hprt-roomtype",
+    "th span",
+    "th"
+]
+
+PRICE_SELECTORS = [
+    "span.prco-valign-middle-helper",
+    "span.js-average-per-night-price",
+    "span.prc-no-css",
+    "div.bui-price-display__value span.prco-valign-middle-helper"
+]
+
+# Mismos formatos de precio que se buscaban con re.search en Python
+PRICE_PATTERNS = [
+    r"(MXN\s*\$?|\$)\s*[\d,.]+",
+    r"[\d,.]+\s*(MXN|\$)",
+    r"\$[\d,.]+",
+    r"MXN\s*[\d,.]+",
+    r"[\d,]+\.?\d*\s*(MXN|\$)",
+    r"(MXN|\$)\s*[\d,]+\.?\d*"
+]
+
+ROOM_KEYWORDS = ["room", "habitación", "suite", "deluxe", "king", "queen"]
+
+ROOM_TABLE_JS = r"""
+(opts) => {
+    const text = (el) => (el && (el.innerText || el.textContent) || '').trim();
+    const hasKeyword = (el) => {
+        const html = el.innerHTML.toLowerCase();
+        return opts.keywords.some(k => html.includes(k));
+    };
+
+    // Tabla: primer selector que apunte a un <table> con información de habitaciones
+    let table = null, tableSelector = null;
+    for (const sel of opts.tableSelectors) {
+        const el = document.querySelector(sel);
+        if (el && el.tagName.toLowerCase() === 'table' && hasKeyword(el)) {
+            table = el; tableSelector = sel; break;
+        }
+    }
+    if (!table) {
+        table = Array.from(document.querySelectorAll('table')).find(hasKeyword) || null;
+        if (!table) return {table_selector: null, row_selector: null, room_type_selector: null, price_selector: null, rooms: []};
+        tableSelector = 'table';
+    }
+
+    // Filas: primer selector con resultados, o las filas de la tabla encontrada
+    let rows = [], rowSelector = null;
+    for (const sel of opts.rowSelectors) {
+        const found = document.querySelectorAll(sel);
+        if (found.length) { rows = Array.from(found); rowSelector = sel; break; }
+    }
+    if (!rows.length) { rows = Array.from(table.querySelectorAll('tr')); rowSelector = 'tr'; }
+
+    const patterns = opts.pricePatterns.map(p => new RegExp(p, 'i'));
+    const matchPrice = (s) => {
+        for (const re of patterns) {
+            const m = s.match(re);
+            if (m) return m[0].trim();
+        }
+        return null;
+    };
+
+    const rooms = [];
+    const seen = new Set();
+    // Selectores que dieron el tipo y el precio (para el registro de selectores)
+    let roomTypeSelector = null, priceSelector = null;
+    for (const row of rows) {
+        // Tipo de habitación
+        let roomType = null, roomTypeSel = null;
+        for (const sel of opts.roomTypeSelectors) {
+            const el = row.querySelector(sel);
+            const t = text(el);
+            if (t && t.length > 5) { roomType = t; roomTypeSel = sel; break; }
+        }
+        if (!roomType) continue;
+
+        // Precio: selectores conocidos y, si no, formatos de precio en las celdas
+        const cells = Array.from(row.querySelectorAll('td'));
+        let price = null, priceSel = null;
+        for (const td of cells) {
+            for (const sel of opts.priceSelectors) {
+                const t = text(td.querySelector(sel));
+                if (t && /\d/.test(t)) { price = matchPrice(t) || t; priceSel = sel; break; }
+            }
+            if (price) break;
+        }
+        if (!price) {
+            for (const td of cells) {
+                price = matchPrice(text(td));
+                if (price) break;
+            }
+        }
+        if (!price) continue;
+        roomTypeSelector = roomTypeSelector || roomTypeSel;
+        priceSelector = priceSelector || priceSel;
+
+        const key = roomType + '|' + price;
+        if (seen.has(key)) continue;
+        seen.add(key);
+
+        // Ocupación: número de iconos de persona o "Max. people: N"
+        const occCell = row.querySelector('.hprt-table-cell-occupancy, .hprt-occupancy-occupancy-info');
+        let occupancy = null;
+        if (occCell) {
+            const icons = occCell.querySelectorAll('.bicon-occupancy, .c-occupancy-icons__adults i, svg');
+            const m = text(occCell).match(/(\d+)/) || (occCell.getAttribute('aria-label') || '').match(/(\d+)/);
+            occupancy = m ? parseInt(m[1], 10) : (icons.length || null);
+        }
+
+        const conditions = text(row.querySelector('.hprt-table-cell-conditions, .hprt-conditions')).toLowerCase()
+            || text(row).toLowerCase();
+        const currencyMatch = price.match(/[A-Z]{3}|[$€£]/);
+
+        rooms.push({
+            room_type: roomType,
+            price: price,
+            currency: currencyMatch ? currencyMatch[0] : null,
+            occupancy: occupancy,
+            free_cancellation: /free cancellation|cancelación gratis|cancelación gratuita/.test(conditions),
+            no_prepayment: /no prepayment|sin pago por adelantado|no se requiere pago por adelantado/.test(conditions),
+            breakfast_included: /breakfast included|desayuno incluido/.test(conditions)
+        });
+    }
+    return {
+        table_selector: tableSelector, row_selector: rowSelector,
+        room_type_selector: roomTypeSelector, price_selector: priceSelector, rooms: rooms
+    };
+}
+"""
+
+
+async def extract_room_table(page, table_selectors: List[str] = None, row_selectors: List[str] = None,
+                             room_type_selectors: List[str] = None,
+                             price_selectors: List[str] = None) -> Dict[str, Any]:
+    """
+    Devuelve {"table_selector", "row_selector", "room_type_selector",
+    "price_selector", "rooms"} con una sola llamada a la página.
+    "table_selector" es None si no hay tabla de habitaciones; los selectores
+    de tipo y precio son los que funcionaron en la primera habitación.
+    """
+    return await page.evaluate(ROOM_TABLE_JS, {
+        "tableSelectors": table_selectors or TABLE_SELECTORS,
+        "rowSelectors": row_selectors or ROW_SELECTORS,
+        "roomTypeSelectors": room_type_selectors or ROOM_TYPE_SELECTORS,
+        "priceSelectors": price_selectors or PRICE_SELECTORS,
+        "pricePatterns": PRICE_PATTERNS,
+        "keywords": ROOM_KEYWORDS,
+    })
+
+
+# ─── Versión sin navegador (mismo algoritmo que ROOM_TABLE_JS) ────────────
+_PRICE_RES = [re.compile(p, re.IGNORECASE) for p in PRICE_PATTERNS]
+_CURRENCY_RE = re.compile(r"[A-Z]{3}|[$€£]")
+_FREE_CANCELLATION_RE = re.compile(r"free cancellation|cancelación gratis|cancelación gratuita")
+_NO_PREPAYMENT_RE = re.compile(r"no prepayment|sin pago por adelantado|no se requiere pago por adelantado")
+_BREAKFAST_RE = re.compile(r"breakfast included|desayuno incluido")
+
+
+def _text(el) -> str:
+    return el.get_text(" ", strip=True) if el is not None else ""
+
+
+def _match_price(text: str):
+    for regex in _PRICE_RES:
+        match = regex.search(text)
+        if match:
+            return match.group(0).strip()
+    return None
+
+
+def parse_room_table(html: str, table_selectors: List[str] = None, row_selectors: List[str] = None,
+                     room_type_selectors: List[str] = None,
+                     price_selectors: List[str] = None) -> Dict[str, Any]:
+    """Extrae la tabla de habitaciones de un HTML con la misma salida que extract_room_table"""
+    soup = BeautifulSoup(html, HTML_PARSER)
+
+    def has_keyword(el) -> bool:
+        content = el.decode_contents().lower()
+        return any(k in content for k in ROOM_KEYWORDS)
+
+    table = table_selector = None
+    for sel in table_selectors or TABLE_SELECTORS:
+        el = soup.select_one(sel)
+        if el is not None and el.name == "table" and has_keyword(el):
+            table, table_selector = el, sel
+            break
+    if table is None:
+        table = next((t for t in soup.find_all("table") if has_keyword(t)), None)
+        if table is None:
+            return {"table_selector": None, "row_selector": None, "room_type_selector": None,
+                    "price_selector": None, "rooms": []}
+        table_selector = "table"
+
+    rows, row_selector = [], None
+    for sel in row_selectors or ROW_SELECTORS:
+        found = soup.select(sel)
+        if found:
+            rows, row_selector = found, sel
+            break
+    if not rows:
+        rows, row_selector = table.find_all("tr"), "tr"
+
+    rooms, seen = [], set()
+    room_type_selector = price_selector = None
+    for row in rows:
+        room_type = room_type_sel = None
+        for sel in room_type_selectors or ROOM_TYPE_SELECTORS:
+            text = _text(row.select_one(sel))
+            if text and len(text) > 5:
+                room_type, room_type_sel = text, sel
+                break
+        if not room_type:
+            continue
+
+        cells = row.find_all("td")
+        price = price_sel = None
+        for td in cells:
+            for sel in price_selectors or PRICE_SELECTORS:
+                text = _text(td.select_one(sel))
+                if text and any(c.isdigit() for c in text):
+                    price, price_sel = _match_price(text) or text, sel
+                    break
+            if price:
+                break
+        if not price:
+            for td in cells:
+                price = _match_price(_text(td))
+                if price:
+                    break
+        if not price:
+            continue
+        room_type_selector = room_type_selector or room_type_sel
+        price_selector = price_selector or price_sel
+
+        if (room_type, price) in seen:
+            continue
+        seen.add((room_type, price))
+
+        occupancy = None
+        occ_cell = row.select_one(".hprt-table-cell-occupancy, .hprt-occupancy-occupancy-info")
+        if occ_cell is not None:
+            match = re.search(r"(\d+)", _text(occ_cell)) or re.search(r"(\d+)", occ_cell.get("aria-label") or "")
+            icons = occ_cell.select(".bicon-occupancy, .c-occupancy-icons__adults i, svg")
+            occupancy = int(match.group(1)) if match else (len(icons) or None)
+
+        conditions = (_text(row.select_one(".hprt-table-cell-conditions, .hprt-conditions")) or _text(row)).lower()
+        currency = _CURRENCY_RE.search(price)
+        rooms.append({
+            "room_type": room_type,
+            "price": price,
+            "currency": currency.group(0) if currency else None,
+            "occupancy": occupancy,
+            "free_cancellation": bool(_FREE_CANCELLATION_RE.search(conditions)),
+            "no_prepayment": bool(_NO_PREPAYMENT_RE.search(conditions)),
+            "breakfast_included": bool(_BREAKFAST_RE.search(conditions)),
+        })
+    return {"table_selector": table_selector, "row_selector": row_selector,
+            "room_type_selector": room_type_selector, "price_selector": price_selector, "rooms": rooms}
@@ -0,0 +1,211 @@
+"""
+Extracción de datos del hotel a partir de las respuestas JSON que la propia
+página de Booking descarga (XHR/fetch de GraphQL y el JSON-LD del documento).
+
+PayloadCapture escucha page.on("response") y guarda los JSON cuyo URL
+coincide con PAYLOAD_CONFIG["url_patterns"]. De ellos se sacan nombre,
+estrellas, dirección y bloques de habitación con la misma estructura que
+booking_extract.extract_room_table, sin esperar a que el DOM se renderice.
+Los campos que no aparezcan en ningún JSON se devuelven como None para que
+quien llama use la extracción por DOM.
+"""
+import asyncio
+import json
+import logging
+import re
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    from .config import PAYLOAD_CONFIG
+except ImportError:
+    from config import PAYLOAD_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_LD_JSON_RE = re.compile(r'<script[^>]+type="application/ld\+json"[^>]*>(.*?)</script>', re.DOTALL | re.IGNORECASE)
+
+# Claves candidatas en los payloads (GraphQL y JSON-LD usan nombres distintos)
+HOTEL_TYPES = {"hotel", "lodgingbusiness", "property", "basicpropertydata"}
+ROOM_NAME_KEYS = ("roomName", "room_name", "name_without_policy", "roomTypeName")
+PRICE_KEYS = ("finalPrice", "displayPrice", "grossPrice", "price")
+AMOUNT_KEYS = ("amount", "value", "amountUnformatted")
+FORMATTED_KEYS = ("formatted", "amountRounded", "amountFormatted")
+CURRENCY_KEYS = ("currency", "currencyCode")
+OCCUPANCY_KEYS = ("maxOccupancy", "max_persons", "nrAdults", "nr_adults")
+FREE_CANCELLATION_KEYS = ("freeCancellation", "isFreeCancellable", "is_free_cancellable")
+NO_PREPAYMENT_KEYS = ("noPrepayment", "isNoPrepayment", "no_prepayment")
+BREAKFAST_KEYS = ("breakfastIncluded", "isBreakfastIncluded", "breakfast_included")
+
+
+def _walk(obj: Any) -> Iterator[dict]:
+    """Todos los diccionarios anidados de un payload, en orden de documento"""
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            yield item
+            stack.extend(reversed(list(item.values())))
+        elif isinstance(item, list):
+            stack.extend(reversed(item))
+
+
+def _first(data: dict, keys) -> Any:
+    for key in keys:
+        if data.get(key) not in (None, ""):
+            return data[key]
+    return None
+
+
+def _stars(hotel: dict) -> Optional[int]:
+    value = _first(hotel, ("starRating", "stars", "class", "qualityClass"))
+    if isinstance(value, dict):
+        value = _first(value, ("ratingValue", "value", "stars"))
+    try:
+        stars = int(float(value))
+    except (TypeError, ValueError):
+        return None
+    return stars if 0 < stars <= 5 else None
+
+
+def _address(hotel: dict) -> Optional[str]:
+    value = _first(hotel, ("fullAddress", "address"))
+    if isinstance(value, dict):
+        parts = [value.get(k) for k in ("streetAddress", "addressLocality", "addressRegion", "postalCode", "addressCountry")]
+        if isinstance(parts[-1], dict):
+            parts[-1] = parts[-1].get("name")
+        value = ", ".join(str(p) for p in parts if p)
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+def _price(block: dict) -> Optional[Dict[str, Any]]:
+    """{"price", "currency"} del bloque; price con el mismo formato de texto que la tabla"""
+    value = _first(block, PRICE_KEYS)
+    currency = _first(block, CURRENCY_KEYS)
+    if isinstance(value, dict):
+        currency = _first(value, CURRENCY_KEYS) or currency
+        formatted = _first(value, FORMATTED_KEYS)
+        if isinstance(formatted, str) and re.search(r"\d", formatted):
+            return {"price": formatted.strip(), "currency": currency}
+        value = _first(value, AMOUNT_KEYS)
+    if isinstance(value, str) and re.search(r"\d", value):
+        return {"price": value.strip(), "currency": currency}
+    if isinstance(value, (int, float)) and value > 0:
+        return {"price": f"{currency + ' ' if currency else ''}{value:,.0f}", "currency": currency}
+    return None
+
+
+class PayloadCapture:
+    """Guarda los JSON relevantes que recibe una página mientras navega"""
+
+    def __init__(self, page, url_patterns: List[str] = None):
+        self.page = page
+        self.url_patterns = [re.compile(p) for p in (url_patterns or PAYLOAD_CONFIG["url_patterns"])]
+        self.payloads: List[Any] = []
+        self._pending = set()
+        self._last_activity = 0.0
+
+    def attach(self):
+        self.page.on("response", self._on_response)
+        return self
+
+    def detach(self):
+        self.page.remove_listener("response", self._on_response)
+
+    def reset(self):
+        """Descarta los payloads de la navegación anterior"""
+        self.payloads.clear()
+
+    def _on_response(self, response):
+        resource_type = response.request.resource_type
+        if resource_type == "document":
+            reader = self._read_document
+        elif resource_type in ("xhr", "fetch") and any(p.search(response.url) for p in self.url_patterns):
+            reader = self._read_json
+        else:
+            return
+        task = asyncio.ensure_future(reader(response))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        self._last_activity = asyncio.get_event_loop().time()
+
+    async def _read_json(self, response):
+        try:
+            if "json" not in (response.headers.get("content-type") or ""):
+                return
+            self.payloads.append(await response.json())
+        except Exception as e:
+            logger.debug(f"[PAYLOAD] No se pudo leer {response.url}: {e}")
+
+    async def _read_document(self, response):
+        """El documento trae el hotel como JSON-LD"""
+        try:
+            html = await response.text()
+        except Exception:
+            return
+        for block in _LD_JSON_RE.findall(html):
+            try:
+                self.payloads.append(json.loads(block))
+            except ValueError:
+                continue
+
+    async def settle(self, timeout: float = None, idle: float = None):
+        """Espera a que terminen las lecturas pendientes y no lleguen respuestas nuevas durante `idle` s"""
+        timeout = PAYLOAD_CONFIG["settle_timeout"] if timeout is None else timeout
+        idle = PAYLOAD_CONFIG["idle"] if idle is None else idle
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            if self._pending:
+                await asyncio.wait(set(self._pending), timeout=max(0.0, deadline - loop.time()))
+                continue
+            quiet = loop.time() - self._last_activity
+            if quiet >= idle:
+                return
+            await asyncio.sleep(idle - quiet)
+
+    def hotel_details(self) -> Dict[str, Any]:
+        """{"nombre", "estrellas", "ubicacion"}; None en lo que no venga en los JSON"""
+        details = {"nombre": None, "estrellas": None, "ubicacion": None}
+        for payload in self.payloads:
+            for data in _walk(payload):
+                kind = str(data.get("@type") or data.get("__typename") or "").lower()
+                if kind not in HOTEL_TYPES:
+                    continue
+                if details["nombre"] is None and isinstance(data.get("name"), str):
+                    details["nombre"] = data["name"].strip() or None
+                if details["estrellas"] is None:
+                    details["estrellas"] = _stars(data)
+                if details["ubicacion"] is None:
+                    details["ubicacion"] = _address(data)
+        return details
+
+    def rooms(self) -> List[Dict[str, Any]]:
+        """Bloques de habitación con la estructura de extract_room_table (vacío si no hay)"""
+        rooms = []
+        seen = set()
+        for payload in self.payloads:
+            for block in _walk(payload):
+                room_type = _first(block, ROOM_NAME_KEYS)
+                if not isinstance(room_type, str) or len(room_type.strip()) <= 5:
+                    continue
+                price = _price(block)
+                if not price:
+                    continue
+                key = f"{room_type}|{price['price']}"
+                if key in seen:
+                    continue
+                seen.add(key)
+                occupancy = _first(block, OCCUPANCY_KEYS)
+                breakfast = _first(block, BREAKFAST_KEYS)
+                if breakfast is None and isinstance(block.get("mealplan"), str):
+                    breakfast = "breakfast" in block["mealplan"].lower()
+                rooms.append({
+                    "room_type": room_type.strip(),
+                    "price": price["price"],
+                    "currency": price["currency"],
+                    "occupancy": occupancy if isinstance(occupancy, int) else None,
+                    "free_cancellation": bool(_first(block, FREE_CANCELLATION_KEYS)),
+                    "no_prepayment": bool(_first(block, NO_PREPAYMENT_KEYS)),
+                    "breakfast_included": bool(breakfast),
+                })
+        return rooms
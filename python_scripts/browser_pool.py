@@ -0,0 +1,204 @@
+"""
+Pool de navegadores Chromium compartido por todos los scrapers.
+
+Mantiene hasta N navegadores calientes y entrega a cada tarea un BrowserContext
+aislado. Un navegador se relanza cuando supera su presupuesto de contextos o
+navegaciones, o cuando el heap JS medido en sus contextos supera el límite.
+Cada contexto lleva instalado el bloqueo de recursos (ver resource_blocker).
+
+Uso:
+    async with browser_context(headless=True, user_agent=ua) as context:
+        page = await context.new_page()
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from playwright.async_api import async_playwright, Browser, BrowserContext
+
+try:
+    from .config import BROWSER_POOL_CONFIG
+    from .page_recycler import page_js_heap_mb
+    from .resource_blocker import ResourceBlocker
+except ImportError:
+    from config import BROWSER_POOL_CONFIG
+    from page_recycler import page_js_heap_mb
+    from resource_blocker import ResourceBlocker
+
+logger = logging.getLogger(__name__)
+
+# Script para ocultar la automatización, común a todos los contextos
+STEALTH_INIT_SCRIPT = """
+Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
+Object.defineProperty(navigator, 'languages', {get: () => ['en-US', 'en']});
+"""
+
+
+class _BrowserSlot:
+    """Un navegador del pool junto con sus contadores de uso"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.browser: Optional[Browser] = None
+        self.active = 0
+        self.contexts_served = 0
+        self.navigations = 0
+        self.peak_js_heap_mb = 0.0
+        self.launches = 0
+
+    def over_budget(self, config: Dict[str, Any]) -> bool:
+        return (
+            self.contexts_served >= config["max_contexts_per_browser"]
+            or self.navigations >= config["max_navigations_per_browser"]
+            or self.peak_js_heap_mb >= config["max_js_heap_mb"]
+        )
+
+
+class BrowserPool:
+    """Pool de navegadores Chromium sobre una sola instancia de Playwright"""
+
+    def __init__(self, size: int = None, headless: bool = True, launch_args: List[str] = None,
+                 blocker: Optional[ResourceBlocker] = None, **budget):
+        self.config = {**BROWSER_POOL_CONFIG, **budget}
+        self.blocker = blocker or ResourceBlocker()
+        self.size = size or self.config["size"]
+        self.headless = headless
+        self.launch_args = launch_args or self.config["args"]
+        self._playwright = None
+        self._slots = [_BrowserSlot(i) for i in range(self.size)]
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+    # ─── Ciclo de vida ────────────────────────────────────────────────────
+    async def start(self):
+        async with self._lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+                # El resto de navegadores se lanzan al haber contextos concurrentes
+                await self._launch(self._slots[0])
+                logger.info(f"[POOL] Pool de hasta {self.size} navegadores iniciado (headless={self.headless})")
+
+    async def close(self):
+        async with self._lock:
+            self._closed = True
+            for slot in self._slots:
+                if slot.browser:
+                    try:
+                        await slot.browser.close()
+                    except Exception:
+                        pass
+                    slot.browser = None
+            if self._playwright:
+                await self._playwright.stop()
+                self._playwright = None
+
+    async def _launch(self, slot: _BrowserSlot):
+        slot.browser = await self._playwright.chromium.launch(headless=self.headless, args=self.launch_args)
+        slot.contexts_served = 0
+        slot.navigations = 0
+        slot.peak_js_heap_mb = 0.0
+        slot.launches += 1
+
+    # ─── API para los scrapers ────────────────────────────────────────────
+    @asynccontextmanager
+    async def context(self, **context_options) -> BrowserContext:
+        """Entrega un BrowserContext aislado que se cierra al salir del bloque"""
+        await self.start()
+        async with self._lock:
+            slot = min(self._slots, key=lambda s: (s.active, s.browser is None))
+            if slot.browser is None or not slot.browser.is_connected():
+                await self._launch(slot)
+            slot.active += 1
+            slot.contexts_served += 1
+        context = None
+        blocking = None
+        try:
+            context = await slot.browser.new_context(**context_options)
+            await context.add_init_script(STEALTH_INIT_SCRIPT)
+            blocking = await self.blocker.attach(context)
+            context.on("page", lambda page: self._track_page(slot, page))
+            yield context
+        finally:
+            if context is not None:
+                await self._sample_js_heap(slot, context)
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            if blocking is not None and self.blocker.enabled:
+                self.blocker.record(blocking)
+            async with self._lock:
+                slot.active -= 1
+                if slot.active == 0 and not self._closed and slot.over_budget(self.config):
+                    logger.info(
+                        f"[POOL] Reciclando navegador {slot.index}: {slot.contexts_served} contextos, "
+                        f"{slot.navigations} navegaciones, heap máx {slot.peak_js_heap_mb:.0f} MB"
+                    )
+                    try:
+                        await slot.browser.close()
+                    except Exception:
+                        pass
+                    await self._launch(slot)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "browser": slot.index,
+                "active_contexts": slot.active,
+                "contexts_served": slot.contexts_served,
+                "navigations": slot.navigations,
+                "peak_js_heap_mb": round(slot.peak_js_heap_mb, 1),
+                "launches": slot.launches,
+            }
+            for slot in self._slots
+        ]
+
+    def blocking_stats(self) -> Dict[str, Any]:
+        """Contadores acumulados del bloqueo de recursos"""
+        return self.blocker.totals.as_dict()
+
+    # ─── Métricas ─────────────────────────────────────────────────────────
+    @staticmethod
+    def _track_page(slot: _BrowserSlot, page):
+        def on_navigation(frame):
+            if frame == page.main_frame:
+                slot.navigations += 1
+        page.on("framenavigated", on_navigation)
+
+    @staticmethod
+    async def _sample_js_heap(slot: _BrowserSlot, context: BrowserContext):
+        """Lee el heap JS de las páginas abiertas del contexto vía CDP"""
+        total = 0.0
+        for page in context.pages:
+            total += await page_js_heap_mb(page) or 0.0
+        slot.peak_js_heap_mb = max(slot.peak_js_heap_mb, total)
+
+
+# ─── Pools compartidos por proceso ────────────────────────────────────────
+_pools: Dict[Any, BrowserPool] = {}
+
+
+def get_browser_pool(headless: bool = True) -> BrowserPool:
+    """Devuelve el pool compartido del event loop actual para el modo headless dado"""
+    key = (id(asyncio.get_running_loop()), bool(headless))
+    pool = _pools.get(key)
+    if pool is None or pool._closed:
+        pool = BrowserPool(headless=bool(headless))
+        _pools[key] = pool
+    return pool
+
+
+@asynccontextmanager
+async def browser_context(headless: bool = True, **context_options) -> BrowserContext:
+    """Atajo para pedir un contexto al pool compartido"""
+    async with get_browser_pool(headless).context(**context_options) as context:
+        yield context
+
+
+async def shutdown_browser_pools():
+    """Cierra los pools del event loop actual (al final de una ejecución por CLI)"""
+    loop_id = id(asyncio.get_running_loop())
+    for key in [k for k in _pools if k[0] == loop_id]:
+        await _pools.pop(key).close()
@@ -0,0 +1,258 @@
+"""
+Escritura por lotes en tablas de Supabase (PostgREST).
+
+Las filas se envían como arrays JSON en bloques configurables (por número
+de filas y por bytes del JSON) sobre una sesión HTTP keep-alive. Las
+peticiones bloqueantes se ejecutan en hilos para no frenar el event loop de
+los scrapers; cada bloque se reintenta con backoff y se registra su latencia.
+Un bloque rechazado por sus datos se divide en mitades hasta aislar las
+filas que fallan.
+
+StreamingBulkWriter recibe los resultados a medida que se producen y los
+envía en cuanto se llena un bloque o pasa flush_interval.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from .config import BULK_WRITE_CONFIG, CHECKPOINT_CONFIG
+except ImportError:
+    from config import BULK_WRITE_CONFIG, CHECKPOINT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Códigos que merece la pena reintentar
+RETRY_STATUS = (408, 429, 500, 502, 503, 504)
+# Rechazos que no dependen de las filas: dividir el bloque no ayuda
+NO_BISECT_STATUS = (401, 403, 404) + RETRY_STATUS
+
+
+class BulkWriter:
+    """Inserta (o hace upsert de) filas en una tabla de PostgREST por bloques"""
+
+    def __init__(self, supabase_url: str, table: str, headers: Dict[str, str], on_conflict: str = None,
+                 chunk_size: int = None, concurrency: int = None, max_retries: int = None,
+                 session: Optional[requests.Session] = None, max_chunk_bytes: int = None,
+                 bisect: bool = None, row_key: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        self.url = f"{supabase_url}/rest/v1/{table}"
+        if on_conflict:
+            self.url += f"?on_conflict={on_conflict}"
+        self.table = table
+        self.headers = {
+            "Content-Type": "application/json",
+            **headers,
+        }
+        # No necesitamos que PostgREST devuelva las filas insertadas
+        prefer = [p for p in self.headers.get("Prefer", "").split(",") if p]
+        if not any(p.startswith("return=") for p in prefer):
+            prefer.append("return=minimal")
+        self.headers["Prefer"] = ",".join(prefer)
+        self.chunk_size = chunk_size or BULK_WRITE_CONFIG["chunk_size"]
+        self.concurrency = concurrency or BULK_WRITE_CONFIG["concurrency"]
+        self.max_retries = BULK_WRITE_CONFIG["max_retries"] if max_retries is None else max_retries
+        self.max_chunk_bytes = max_chunk_bytes or BULK_WRITE_CONFIG["max_chunk_bytes"]
+        self.bisect = BULK_WRITE_CONFIG["bisect"] if bisect is None else bisect
+        self.row_key = row_key  # identifica en el resumen las filas rechazadas
+        self._owns_session = session is None  # una sesión recibida es compartida: no se cierra aquí
+        self.session = session or self._new_session(self.concurrency)
+
+    @staticmethod
+    def _new_session(pool_size: int) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def close(self):
+        if self._owns_session:
+            self.session.close()
+
+    # ─── API ──────────────────────────────────────────────────────────────
+    async def write(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Envía todas las filas y devuelve un resumen con filas insertadas,
+        filas fallidas y la latencia de cada bloque.
+        """
+        chunks = self._chunks(rows)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send(index: str, chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            async with semaphore:
+                report = await asyncio.to_thread(self._send_chunk, index, chunk)
+            if report["ok"] or not self.bisect or len(chunk) == 1 or report["status"] in NO_BISECT_STATUS \
+                    or report["status"] is None:
+                if not report["ok"] and len(chunk) == 1 and self.row_key:
+                    report["row_key"] = self.row_key(chunk[0])
+                return [report]
+            # Rechazo por los datos: dividir para aislar las filas malas
+            middle = len(chunk) // 2
+            logger.info(f"[BULK] Dividiendo el bloque {index} de {self.table} ({len(chunk)} filas)")
+            halves = await asyncio.gather(send(f"{index}a", chunk[:middle]), send(f"{index}b", chunk[middle:]))
+            return halves[0] + halves[1]
+
+        started = time.perf_counter()
+        reports = [r for group in await asyncio.gather(*(send(str(i), chunk) for i, chunk in enumerate(chunks)))
+                   for r in group]
+        summary = {
+            "table": self.table,
+            "rows": len(rows),
+            "inserted": sum(r["rows"] for r in reports if r["ok"]),
+            "failed": sum(r["rows"] for r in reports if not r["ok"]),
+            "chunks": reports,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        rejected = [r["row_key"] for r in reports if "row_key" in r]
+        if rejected:
+            summary["rejected_rows"] = rejected
+        logger.info(
+            f"[BULK] {self.table}: {summary['inserted']}/{summary['rows']} filas en "
+            f"{len(chunks)} bloques, {summary['elapsed_ms']} ms"
+        )
+        return summary
+
+    def _chunks(self, rows: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Bloques de como mucho chunk_size filas y max_chunk_bytes bytes de JSON"""
+        chunks: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        size = 2  # corchetes del array
+        for row in rows:
+            row_bytes = len(json.dumps(row, ensure_ascii=False).encode("utf-8")) + 1
+            if current and (len(current) >= self.chunk_size or size + row_bytes > self.max_chunk_bytes):
+                chunks.append(current)
+                current, size = [], 2
+            current.append(row)
+            size += row_bytes
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _send_chunk(self, index, chunk: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Envía un bloque con reintentos (se ejecuta en un hilo)"""
+        attempts = 0
+        status = None
+        error = None
+        started = time.perf_counter()
+        while attempts <= self.max_retries:
+            attempts += 1
+            try:
+                r = self.session.post(self.url, headers=self.headers, json=chunk,
+                                      timeout=BULK_WRITE_CONFIG["timeout"])
+                status = r.status_code
+                if r.status_code in (200, 201, 204):
+                    error = None
+                    break
+                error = r.text[:500]
+                if r.status_code not in RETRY_STATUS:
+                    break
+            except requests.RequestException as e:
+                status = None
+                error = str(e)
+            if attempts <= self.max_retries:
+                time.sleep(BULK_WRITE_CONFIG["backoff_seconds"] * (2 ** (attempts - 1)))
+        report = {
+            "chunk": index,
+            "rows": len(chunk),
+            "ok": error is None,
+            "status": status,
+            "attempts": attempts,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        if error:
+            report["error"] = error
+            logger.error(f"[BULK] Bloque {index} de {self.table} falló ({status}): {error}")
+        else:
+            logger.info(f"[BULK] Bloque {index}: {len(chunk)} filas en {report['latency_ms']} ms ({attempts} intento(s))")
+        return report
+
+
+_CLOSE = object()
+
+
+class StreamingBulkWriter:
+    """
+    Consumidor asíncrono sobre un BulkWriter.
+
+    submit(key, rows) encola las filas de una unidad de trabajo (por ejemplo
+    una fecha). Se envían en cuanto el buffer llega a flush_rows o la unidad
+    más antigua lleva flush_interval segundos esperando. on_flushed(keys) se
+    llama con las unidades cuyas filas quedaron guardadas sin errores.
+    """
+
+    def __init__(self, writer: BulkWriter, on_flushed: Optional[Callable[[List[str]], None]] = None,
+                 flush_rows: int = None, flush_interval: float = None):
+        self.writer = writer
+        self.on_flushed = on_flushed
+        self.flush_rows = flush_rows or writer.chunk_size
+        self.flush_interval = CHECKPOINT_CONFIG["flush_interval"] if flush_interval is None else flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self.totals = {"rows": 0, "inserted": 0, "failed": 0, "flushes": 0, "keys": 0, "elapsed_ms": 0.0}
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._consume())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def submit(self, key: str, rows: List[Dict[str, Any]]):
+        await self._queue.put((key, rows))
+
+    async def close(self):
+        """Envía lo pendiente y termina el consumidor"""
+        if self._task is None:
+            return
+        await self._queue.put(_CLOSE)
+        try:
+            await self._task
+        finally:
+            self._task = None
+            self.writer.close()
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        keys: List[str] = []
+        rows: List[Dict[str, Any]] = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = None
+            if item is _CLOSE or item is None:
+                if keys:
+                    await self._flush(keys, rows)
+                    keys, rows, deadline = [], [], None
+                if item is _CLOSE:
+                    return
+                continue
+            key, key_rows = item
+            keys.append(key)
+            rows.extend(key_rows)
+            if deadline is None:
+                deadline = loop.time() + self.flush_interval
+            if len(rows) >= self.flush_rows:
+                await self._flush(keys, rows)
+                keys, rows, deadline = [], [], None
+
+    async def _flush(self, keys: List[str], rows: List[Dict[str, Any]]):
+        summary = await self.writer.write(rows) if rows else {"inserted": 0, "failed": 0, "elapsed_ms": 0.0}
+        self.totals["rows"] += len(rows)
+        self.totals["inserted"] += summary["inserted"]
+        self.totals["failed"] += summary["failed"]
+        self.totals["elapsed_ms"] = round(self.totals["elapsed_ms"] + summary["elapsed_ms"], 1)
+        self.totals["flushes"] += 1
+        if summary["failed"]:
+            logger.error(f"[BULK] {summary['failed']} filas de {len(keys)} unidades no se guardaron; no se marcan como completas")
+            return
+        self.totals["keys"] += len(keys)
+        if self.on_flushed:
+            self.on_flushed(keys)
@@ -70,6 +70,130 @@ PLAYWRIGHT_CONFIG = {
     "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 }
 
+# ─── Configuración del pool de navegadores compartido ─────────────────────
+BROWSER_POOL_CONFIG = {
+    "size": int(os.getenv("BROWSER_POOL_SIZE", "2")),
+    "max_contexts_per_browser": int(os.getenv("BROWSER_POOL_MAX_CONTEXTS", "50")),
+    "max_navigations_per_browser": int(os.getenv("BROWSER_POOL_MAX_NAVIGATIONS", "500")),
+    "max_js_heap_mb": int(os.getenv("BROWSER_POOL_MAX_JS_HEAP_MB", "512")),
+    "args": [
+        "--no-sandbox",
+        "--disable-setuid-sandbox",
+        "--disable-dev-shm-usage",
+        "--disable-accelerated-2d-canvas",
+        "--no-first-run",
+        "--no-zygote",
+        "--disable-gpu",
+        "--disable-background-timer-throttling",
+        "--disable-backgrounding-occluded-windows",
+        "--disable-renderer-backgrounding",
+        "--disable-features=TranslateUI",
+        "--disable-ipc-flooding-protection",
+        "--disable-blink-features=AutomationControlled",
+        "--disable-infobars",
+        "--window-size=1920,1080"
+    ]
+}
+
+# ─── Configuración de bloqueo de recursos ─────────────────────────────────
+def _env_list(name: str, default: str):
+    return [item.strip().lower() for item in os.getenv(name, default).split(",") if item.strip()]
+
+
+RESOURCE_BLOCKING_CONFIG = {
+    "enabled": os.getenv("RESOURCE_BLOCKING", "true").lower() == "true",
+    # Tipos de recurso de Playwright (request.resource_type) que nunca se descargan
+    "block_resource_types": _env_list("BLOCK_RESOURCE_TYPES", "image,media,font"),
+    # Dominios propios: sus scripts se permiten aunque no sean del mismo sitio
+    "allow_domains": _env_list("BLOCK_ALLOW_DOMAINS", "booking.com,bstatic.com,songkick.com"),
+    # Publicidad y analítica: se bloquea cualquier petición
+    "deny_domains": _env_list(
+        "BLOCK_DENY_DOMAINS",
+        "google-analytics.com,googletagmanager.com,doubleclick.net,googlesyndication.com,"
+        "googleadservices.com,facebook.net,facebook.com,connect.facebook.net,hotjar.com,"
+        "criteo.com,criteo.net,adnxs.com,taboola.com,outbrain.com,scorecardresearch.com,"
+        "bat.bing.com,clarity.ms,tiktok.com,snapchat.com,quantserve.com,newrelic.com,nr-data.net"
+    ),
+    # Bloquear scripts de terceros (ni del sitio de la página ni de allow_domains)
+    "block_third_party_scripts": os.getenv("BLOCK_THIRD_PARTY_SCRIPTS", "true").lower() == "true"
+}
+
+# ─── Configuración de reciclado de páginas ────────────────────────────────
+RECYCLE_CONFIG = {
+    "max_navigations": int(os.getenv("SCRAPE_PAGE_MAX_NAVIGATIONS", "10")),  # navegaciones por página antes de reabrirla
+    "max_js_heap_mb": float(os.getenv("SCRAPE_PAGE_MAX_JS_HEAP_MB", "150")), # heap JS por página
+    "sample_every": int(os.getenv("SCRAPE_PAGE_SAMPLE_EVERY", "3")),         # navegaciones entre mediciones
+    "max_renderers": int(os.getenv("SCRAPE_MAX_RENDERERS", "6"))             # páginas de trabajo abiertas a la vez por proceso
+}
+
+# ─── Configuración de esperas y cortesía ──────────────────────────────────
+READINESS_CONFIG = {
+    "navigation_timeout": int(os.getenv("SCRAPE_NAVIGATION_TIMEOUT_MS", "30000")),
+    "element_timeout": int(os.getenv("SCRAPE_ELEMENT_TIMEOUT_MS", "15000")),  # formulario, sugerencias, resultados
+    "table_timeout": int(os.getenv("SCRAPE_TABLE_TIMEOUT_MS", "10000")),      # tabla de habitaciones con precios
+    # Pausa entre fechas: base + uniforme(0, jitter) segundos
+    "politeness_delay": float(os.getenv("SCRAPE_POLITENESS_DELAY", "0.5")),
+    "politeness_jitter": float(os.getenv("SCRAPE_POLITENESS_JITTER", "0.75"))
+}
+
+# ─── Configuración de la cola de fechas ───────────────────────────────────
+DATE_QUEUE_CONFIG = {
+    "workers": int(os.getenv("SCRAPE_DATE_WORKERS", "3")),          # páginas que toman fechas de la cola
+    "horizon_days": int(os.getenv("SCRAPE_HORIZON_DAYS", "91")),    # hoy + 90 días
+    "max_retries": int(os.getenv("SCRAPE_DATE_RETRIES", "1"))       # reintentos por fecha
+}
+
+# ─── Configuración de descarga HTTP sin navegador ─────────────────────────
+HTTP_FASTPATH_CONFIG = {
+    "enabled": os.getenv("SCRAPE_HTTP_FASTPATH", "true").lower() == "true",
+    "concurrency": int(os.getenv("SCRAPE_HTTP_CONCURRENCY", "4")),  # peticiones simultáneas por hotel
+    "timeout": float(os.getenv("SCRAPE_HTTP_TIMEOUT", "20"))
+}
+
+# ─── Configuración del modo calendario ────────────────────────────────────
+CALENDAR_CONFIG = {
+    "enabled": os.getenv("SCRAPE_CALENDAR_MODE", "false").lower() == "true",
+    "window_days": int(os.getenv("SCRAPE_CALENDAR_WINDOW_DAYS", "31")),    # noches por petición
+    "threshold_pct": float(os.getenv("SCRAPE_CALENDAR_THRESHOLD_PCT", "15")),  # desviación para marcar una fecha
+    "max_detail_dates": int(os.getenv("SCRAPE_CALENDAR_MAX_DETAIL_DATES", "10"))  # fechas con desglose por habitación
+}
+
+# ─── Configuración de captura de respuestas JSON ──────────────────────────
+PAYLOAD_CONFIG = {
+    "enabled": os.getenv("SCRAPE_JSON_PAYLOADS", "true").lower() == "true",
+    # Respuestas XHR/fetch que se leen (expresiones regulares sobre la URL)
+    "url_patterns": [p for p in os.getenv("SCRAPE_PAYLOAD_URL_PATTERNS", r"/dml/graphql,/orca/,hotelpage,roomtable").split(",") if p],
+    "settle_timeout": float(os.getenv("SCRAPE_PAYLOAD_SETTLE_SECONDS", "3")),  # espera máxima tras cargar la página
+    "idle": float(os.getenv("SCRAPE_PAYLOAD_IDLE_SECONDS", "0.4"))             # sin respuestas nuevas durante
+}
+
+# ─── Configuración del registro de selectores ─────────────────────────────
+SELECTOR_REGISTRY_CONFIG = {
+    "path": os.getenv("SELECTOR_REGISTRY_PATH", str(Path(__file__).parent / "cache" / "selector_stats.json")),
+    "fast_timeout": int(os.getenv("SELECTOR_FAST_TIMEOUT_MS", "1500")),  # intento del ganador histórico
+    "decay": float(os.getenv("SELECTOR_SCORE_DECAY", "0.9")),            # decaimiento de los demás por acierto
+    "save_interval": float(os.getenv("SELECTOR_SAVE_INTERVAL", "10"))    # segundos entre escrituras
+}
+
+# ─── Configuración de páginas de resultados de búsqueda ───────────────────
+SEARCH_RESULTS_CONFIG = {
+    "page_size": int(os.getenv("SEARCH_RESULTS_PAGE_SIZE", "25")),   # tarjetas por página (parámetro offset)
+    "max_pages": int(os.getenv("SEARCH_RESULTS_MAX_PAGES", "40")),   # límite de páginas por búsqueda
+    "discovery_concurrency": int(os.getenv("SEARCH_RESULTS_CONCURRENCY", "3")),  # páginas de resultados en paralelo
+    "snapshot_workers": int(os.getenv("MARKET_SNAPSHOT_WORKERS", "3"))  # fechas en paralelo en el modo snapshot
+}
+
+# ─── Configuración de la caché de URLs de propiedades ─────────────────────
+PROPERTY_CACHE_CONFIG = {
+    "path": os.getenv("PROPERTY_URL_CACHE_PATH", str(Path(__file__).parent / "cache" / "property_urls.json")),
+    "ttl_seconds": int(os.getenv("PROPERTY_URL_CACHE_TTL_DAYS", "30")) * 86400
+}
+
+# ─── Configuración del modo por lotes (varios usuarios) ───────────────────
+BATCH_CONFIG = {
+    "hotel_concurrency": int(os.getenv("SCRAPE_BATCH_HOTELS", "2"))  # hoteles distintos en paralelo
+}
+
 # ─── Configuración de retry ───────────────────────────────────────────────
 RETRY_CONFIG = {
     "stop_after_attempt": 3,
@@ -78,6 +202,70 @@ RETRY_CONFIG = {
     "wait_max": 10
 }
 
+# ─── Configuración de escritura por lotes en Supabase ─────────────────────
+BULK_WRITE_CONFIG = {
+    "chunk_size": int(os.getenv("BULK_WRITE_CHUNK_SIZE", "500")),  # filas por petición
+    "concurrency": int(os.getenv("BULK_WRITE_CONCURRENCY", "2")),  # bloques en paralelo
+    "max_chunk_bytes": int(os.getenv("BULK_WRITE_MAX_CHUNK_BYTES", "2000000")),  # bytes de JSON por petición
+    "bisect": os.getenv("BULK_WRITE_BISECT", "true").lower() == "true",  # dividir bloques rechazados
+    "max_retries": 3,
+    "backoff_seconds": 1,
+    "timeout": 30
+}
+
+# ─── Configuración del cliente REST de Supabase ───────────────────────────
+SUPABASE_REST_CONFIG = {
+    "pool_connections": 4,  # hosts distintos con pool propio
+    "pool_maxsize": int(os.getenv("SUPABASE_POOL_SIZE", "10")),  # conexiones keep-alive por host
+    "connect_timeout": 5,
+    "read_timeout": int(os.getenv("SUPABASE_READ_TIMEOUT", "30")),
+    "max_retries": 3,
+    "backoff_seconds": 0.5
+}
+
+# ─── Configuración de la caché de respuestas del dashboard ────────────────
+RESPONSE_CACHE_CONFIG = {
+    "enabled": os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true",
+    "ttl_seconds": int(os.getenv("RESPONSE_CACHE_TTL", "300")),
+    "max_entries": int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))  # LRU al superarlo
+}
+
+# ─── Configuración de normalización de precios ────────────────────────────
+PRICE_CONFIG = {
+    "default_currency": os.getenv("PRICE_DEFAULT_CURRENCY", "MXN"),  # moneda de "$" sin código
+    "backfill_batch": int(os.getenv("PRICE_BACKFILL_BATCH", "1000"))
+}
+
+# ─── Configuración de paginación de la API ────────────────────────────────
+PAGINATION_CONFIG = {
+    # Filas por página si no se indica limit; si quedan más, la respuesta trae next_cursor y Link rel="next"
+    "default_limit": int(os.getenv("API_DEFAULT_LIMIT", "1000")),
+    "max_limit": int(os.getenv("API_MAX_LIMIT", "5000")),
+    "stream_page_size": int(os.getenv("API_STREAM_PAGE_SIZE", "1000"))  # filas por petición en modo NDJSON
+}
+
+# ─── Configuración de escritura en streaming y checkpoints ────────────────
+CHECKPOINT_CONFIG = {
+    "directory": os.getenv("SCRAPE_CHECKPOINT_DIR", str(Path(__file__).parent / "cache" / "checkpoints")),
+    "keep_days": 2,
+    "flush_interval": float(os.getenv("STREAM_FLUSH_SECONDS", "5"))  # máximo que una fecha espera en el buffer
+}
+
+# ─── Configuración de trabajos en segundo plano ───────────────────────────
+JOBS_CONFIG = {
+    "max_workers": int(os.getenv("SCRAPE_JOB_WORKERS", "2")),
+    "max_queued": int(os.getenv("SCRAPE_JOB_MAX_QUEUED", "100")),
+    "max_jobs_kept": 500,
+    "log_tail_lines": 200,
+    "default_timeout": 1800,  # 30 minutos por defecto
+    "timeouts": {
+        "hotel_propio": 2700,  # 45 minutos para hoteles
+        "scrape_eventos": 600,  # 10 minutos para eventos
+        "hotel_propio_batch": 14400,  # 4 horas para el lote nocturno de hoteles
+        "scrape_eventos_batch": 3600  # 1 hora para los eventos del lote
+    }
+}
+
 # ─── Configuración de validación ──────────────────────────────────────────
 VALIDATION_CONFIG = {
     "max_radius_km": 1000,
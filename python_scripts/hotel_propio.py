@@ -3,13 +3,42 @@ import os
 import re
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from supabase import create_client, Client, AsyncClient
-from playwright.async_api import async_playwright
+from supabase import create_client, AsyncClient
 import uuid
 import random
-import requests
-
 
+try:
+    from .booking_calendar import calendar_rooms, fetch_calendar, flag_interesting_dates
+    from .booking_extract import PRICE_SELECTORS, ROOM_TYPE_SELECTORS, ROW_SELECTORS, TABLE_SELECTORS, extract_room_table
+    from .browser_pool import browser_context, shutdown_browser_pools
+    from .bulk_writer import BulkWriter, StreamingBulkWriter
+    from .config import BATCH_CONFIG, CALENDAR_CONFIG, DATE_QUEUE_CONFIG, HTTP_FASTPATH_CONFIG, READINESS_CONFIG
+    from .http_fastpath import fetch_rooms_over_http
+    from .page_ready import goto, politeness_delay, wait_for_any, wait_for_room_table
+    from .page_recycler import MemoryReport
+    from .popup_guard import POPUP_SELECTORS, PopupGuard
+    from .price_utils import add_price_columns, price_columns_available
+    from .property_cache import PropertyUrlCache, get_property_cache, with_dates
+    from .scrape_checkpoint import ScrapeCheckpoint
+    from .selector_registry import get_selector_registry
+    from .supabase_rest import get_supabase_rest
+    from .work_queue import RetryItem, run_page_workers
+except ImportError:
+    from booking_calendar import calendar_rooms, fetch_calendar, flag_interesting_dates
+    from booking_extract import PRICE_SELECTORS, ROOM_TYPE_SELECTORS, ROW_SELECTORS, TABLE_SELECTORS, extract_room_table
+    from browser_pool import browser_context, shutdown_browser_pools
+    from bulk_writer import BulkWriter, StreamingBulkWriter
+    from config import BATCH_CONFIG, CALENDAR_CONFIG, DATE_QUEUE_CONFIG, HTTP_FASTPATH_CONFIG, READINESS_CONFIG
+    from http_fastpath import fetch_rooms_over_http
+    from page_ready import goto, politeness_delay, wait_for_any, wait_for_room_table
+    from page_recycler import MemoryReport
+    from popup_guard import POPUP_SELECTORS, PopupGuard
+    from price_utils import add_price_columns, price_columns_available
+    from property_cache import PropertyUrlCache, get_property_cache, with_dates
+    from scrape_checkpoint import ScrapeCheckpoint
+    from selector_registry import get_selector_registry
+    from supabase_rest import get_supabase_rest
+    from work_queue import RetryItem, run_page_workers
 
 load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -28,18 +57,6 @@ def is_valid_uuid(val):
     except ValueError:
         return False
 
-async def popup_closer(page, popup_selectors, interval=2):
-    while True:
-        for sel in popup_selectors:
-            try:
-                el = await page.query_selector(sel)
-                if el:
-                    await el.click()
-                    await page.wait_for_timeout(300)
-            except Exception:
-                pass
-        await asyncio.sleep(interval)
-
 USER_AGENTS = [
     # Chrome Windows
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
@@ -58,7 +75,120 @@ USER_AGENTS = [
 def get_random_user_agent():
     return random.choice(USER_AGENTS)
 
-async def scrape_booking_prices(hotel_name: str, locale="en-us", currency="MXN", headless_mode="false"):
+async def resolve_property_page(context, page, hotel_name: str, locale: str, currency: str, checkin: str, checkout: str):
+    """Busca el hotel en Booking y devuelve la página de detalle de la propiedad"""
+    # Construir URL con fechas y configuración
+    url = (
+        f"https://www.booking.com/searchresults.html?lang={locale}&selected_currency={currency}"
+        f"&checkin={checkin}&checkout={checkout}"
+    )
+    await goto(page, url)
+
+    # Esperar al buscador en lugar de una pausa fija
+    if not await wait_for_any(page, ["input[name='ss']"]):
+        print("[DEBUG] El buscador no apareció a tiempo, intentando de todas formas...")
+
+    # Escribir el nombre del hotel y seleccionar el primer resultado sugerido
+    await page.fill("input[name='ss']", hotel_name)
+    # Probar varios selectores de sugerencias
+    suggestion_selectors = [
+        "li[data-testid='autocomplete-result']",
+        "li[data-i='0']",
+        "ul[role='listbox'] li",
+        "li.sb-autocomplete__item"
+    ]
+    # Esperar a la primera sugerencia: el selector ganador histórico con un
+    # timeout corto y, si no aparece, todos los candidatos en paralelo
+    selector_registry = get_selector_registry()
+    winner = await selector_registry.race(page, "search", "suggestion", suggestion_selectors)
+    ordered = selector_registry.order("search", "suggestion", suggestion_selectors)
+    if winner:
+        ordered = [winner] + [sel for sel in ordered if sel != winner]
+    suggestions = []
+    clicked = False
+    for sel in ordered:
+        try:
+            suggestions = await page.query_selector_all(sel)
+            if suggestions:
+                # Intentar click en el div[role='button'] hijo usando JS
+                for s in suggestions:
+                    try:
+                        div_btn = await s.query_selector("div[role='button']")
+                        if div_btn:
+                            await page.evaluate('(el) => el.click()', div_btn)
+                            clicked = True
+                            break
+                    except Exception:
+                        continue
+                if not clicked:
+                    try:
+                        await page.evaluate('(el) => el.click()', suggestions[0])
+                        clicked = True
+                    except Exception:
+                        pass
+                if clicked:
+                    break
+        except Exception:
+            continue
+    if not clicked:
+        # Si no hay sugerencias, enviar Enter al input para forzar la búsqueda
+        await page.focus("input[name='ss']")
+        await page.keyboard.press("Enter")
+    # Presionar el botón de búsqueda (los popups los cierra el PopupGuard del contexto)
+    await page.wait_for_selector("button[type='submit']", timeout=10000)
+    # Haz scroll al botón
+    try:
+        await page.eval_on_selector("button[type='submit']", "el => el.scrollIntoView()")
+    except Exception:
+        pass
+    # Intenta click normal, si falla, click JS
+    try:
+        await page.click("button[type='submit']")
+    except Exception as e:
+        print("[WARN] Click normal falló, intentando click JS", e)
+        try:
+            await page.evaluate('document.querySelector("button[type=\\\'submit\\\']").click()')
+        except Exception as e2:
+            print("[ERROR] Click JS también falló", e2)
+
+    # Esperar el primer card y hacer clic en la imagen/enlace del hotel
+    await page.wait_for_selector("a[data-testid='property-card-desktop-single-image']", timeout=READINESS_CONFIG["element_timeout"])
+    hotel_link = await page.query_selector("a[data-testid='property-card-desktop-single-image']")
+    if not hotel_link:
+        raise RuntimeError("No se encontró el enlace del hotel en los resultados.")
+
+    # Prepara para capturar la nueva página
+    new_page_promise = context.wait_for_event("page")
+
+    await hotel_link.click()
+
+    # Espera la nueva página (pestaña)
+    try:
+        new_page = await asyncio.wait_for(new_page_promise, timeout=10)
+        await new_page.wait_for_load_state("domcontentloaded")
+        page_to_scrape = new_page
+    except asyncio.TimeoutError:
+        # Si no se abre nueva pestaña, sigue en la misma
+        page_to_scrape = page
+
+    return page_to_scrape
+
+def horizon_dates(today: datetime = None) -> list:
+    """Fechas de check-in del horizonte configurado (hoy incluido)"""
+    today = today or datetime.today()
+    return [(today + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(DATE_QUEUE_CONFIG["horizon_days"])]
+
+async def scrape_booking_prices(hotel_name: str, locale="en-us", currency="MXN", headless_mode="false", city: str = "",
+                                skip_dates: set = None, on_date=None):
+    """
+    Scrapea los precios del horizonte de fechas. skip_dates son fechas ya
+    guardadas en una ejecución anterior; on_date(day) se espera con cada fecha
+    terminada para que se guarde sin esperar al resto.
+    """
+    skip_dates = skip_dates or set()
+    if skip_dates and all(d in skip_dates for d in horizon_dates()):
+        print(f"[DEBUG] Todas las fechas de {hotel_name} ya se guardaron hoy, nada que scrapear")
+        return []
     user_agent = get_random_user_agent()
     # Convierte headless_mode a bool si es string
     if isinstance(headless_mode, str):
@@ -71,52 +201,15 @@ async def scrape_booking_prices(hotel_name: str, locale="en-us", currency="MXN",
     
     print(f"[DEBUG] Iniciando scraping con headless={headless}, hotel={hotel_name}")
     
-    # Elimina el try sin except/finally
-    # try:
-    async with async_playwright() as p:
-        # Configurar opciones adicionales para evitar detección de bots
-        browser_options = {
-            'headless': headless,
-            'args': [
-                '--no-sandbox',
-                '--disable-setuid-sandbox',
-                '--disable-dev-shm-usage',
-                '--disable-accelerated-2d-canvas',
-                '--no-first-run',
-                '--no-zygote',
-                '--disable-gpu',
-                '--disable-background-timer-throttling',
-                '--disable-backgrounding-occluded-windows',
-                '--disable-renderer-backgrounding',
-                '--disable-features=TranslateUI',
-                '--disable-ipc-flooding-protection',
-                '--disable-blink-features=AutomationControlled',
-                '--disable-web-security',
-                '--disable-features=VizDisplayCompositor',
-                '--user-agent=' + user_agent
-            ]
-        }
-        
-        browser = await p.chromium.launch(**browser_options)
-        page = await browser.new_page()
-        
-        # Configurar el contexto para evitar detección de bots
-        await page.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined,
-            });
-            Object.defineProperty(navigator, 'plugins', {
-                get: () => [1, 2, 3, 4, 5],
-            });
-            Object.defineProperty(navigator, 'languages', {
-                get: () => ['en-US', 'en'],
-            });
-        """)
-        
-        # Universal: set user-agent via extra headers
-        await page.set_extra_http_headers({"user-agent": user_agent})
-        
-        print(f"[DEBUG] Browser iniciado con user-agent: {user_agent}")
+    # Pedir un contexto aislado al pool de navegadores compartido
+    async with browser_context(headless=headless, user_agent=user_agent) as context:
+        # Selectores ordenados por los aciertos de ejecuciones anteriores
+        selector_registry = get_selector_registry()
+        # Cierre de popups y banners dentro de la página, en todas las pestañas del contexto
+        popup_guard = PopupGuard(selector_registry.order("any", "popup", POPUP_SELECTORS))
+        await popup_guard.install(context)
+        page = await context.new_page()
+        print(f"[DEBUG] Contexto iniciado con user-agent: {user_agent}")
 
         # Calcular fechas: hoy y mañana
         today = datetime.today()
@@ -124,450 +217,170 @@ async def scrape_booking_prices(hotel_name: str, locale="en-us", currency="MXN",
         checkin = today.strftime("%Y-%m-%d")
         checkout = tomorrow.strftime("%Y-%m-%d")
 
-        # Construir URL con fechas y configuración
-        url = (
-            f"https://www.booking.com/searchresults.html?lang={locale}&selected_currency={currency}"
-            f"&checkin={checkin}&checkout={checkout}"
+        # Selectores candidatos para la tabla de habitaciones, el ganador histórico primero
+        table_selectors = selector_registry.order("hotel", "table", TABLE_SELECTORS)
+        extraction_selectors = {
+            "table_selectors": table_selectors,
+            "row_selectors": selector_registry.order("hotel", "row", ROW_SELECTORS),
+            "room_type_selectors": selector_registry.order("hotel", "room_type", ROOM_TYPE_SELECTORS),
+            "price_selectors": selector_registry.order("hotel", "price", PRICE_SELECTORS),
+        }
+
+        # Ir directo a la URL cacheada si existe y sigue mostrando la tabla;
+        # si no, resolverla con la búsqueda completa
+        property_cache = get_property_cache()
+        cached_url = property_cache.get(hotel_name, city, locale, currency)
+        page_to_scrape = None
+        if cached_url:
+            print(f"[DEBUG] URL de la propiedad desde caché: {cached_url}")
+            await goto(page, with_dates(cached_url, checkin, checkout))
+            if await wait_for_room_table(page, table_selectors):
+                page_to_scrape = page
+            else:
+                print("[DEBUG] La URL cacheada ya no muestra la tabla, resolviendo de nuevo")
+                property_cache.invalidate(hotel_name, city, locale, currency)
+        if page_to_scrape is None:
+            page_to_scrape = await resolve_property_page(context, page, hotel_name, locale, currency, checkin, checkout)
+
+        # Esperar a que la tabla de habitaciones esté presente y visible y
+        # verificar en una sola llamada que contenga habitaciones
+        await wait_for_room_table(page_to_scrape, table_selectors)
+        extracted = await extract_room_table(page_to_scrape, **extraction_selectors)
+
+        if extracted["table_selector"]:
+            print(f"Tabla encontrada con selector: {extracted['table_selector']}")
+            selector_registry.record_extraction("hotel", extracted)
+            # Guardar (o refrescar) la URL validada en la caché compartida
+            property_cache.put(hotel_name, page_to_scrape.url, city, locale, currency)
+        else:
+            print("No se encontró ninguna tabla con información de habitaciones")
+            html = await page_to_scrape.content()
+            print("HTML de la página:")
+            print(html[:3000])
+            selector_registry.flush()
+            return []
+
+        # --- Scraping de los próximos días con una cola (hotel, fecha) compartida ---
+        base_url = page_to_scrape.url  # URL de la página de detalle del hotel
+        print(f"[DEBUG] URL base del hotel: {base_url}")
+
+        workers = DATE_QUEUE_CONFIG["workers"]
+        horizon_days = DATE_QUEUE_CONFIG["horizon_days"]
+        print(
+            f"[DEBUG] Cola de fechas: {horizon_days} días, {workers} páginas, "
+            f"{DATE_QUEUE_CONFIG['max_retries']} reintento(s) por fecha"
         )
-        await page.goto(url)
-        await page.wait_for_timeout(10000)
-        
-        # En modo headless, esperar más tiempo para que la página cargue completamente
-        if headless:
-            await page.wait_for_timeout(5000)
-            print("[DEBUG] Esperando carga adicional en modo headless...")
-
-        # Escribir el nombre del hotel y seleccionar el primer resultado sugerido
-        await page.fill("input[name='ss']", hotel_name)
-        await page.wait_for_timeout(10000)  # Esperar 1 segundo para que aparezcan sugerencias
-        # Probar varios selectores de sugerencias
-        suggestion_selectors = [
-            "li[data-testid='autocomplete-result']",
-            "li[data-i='0']",
-            "ul[role='listbox'] li",
-            "li.sb-autocomplete__item"
-        ]
-        suggestions = []
-        clicked = False
-        for sel in suggestion_selectors:
-            try:
-                await page.wait_for_selector(sel, timeout=2000)
-                suggestions = await page.query_selector_all(sel)
-                if suggestions:
-                    # Intentar click en el div[role='button'] hijo usando JS
-                    for s in suggestions:
-                        try:
-                            div_btn = await s.query_selector("div[role='button']")
-                            if div_btn:
-                                await page.evaluate('(el) => el.click()', div_btn)
-                                clicked = True
-                                break
-                        except Exception:
-                            continue
-                    if not clicked:
-                        try:
-                            await page.evaluate('(el) => el.click()', suggestions[0])
-                            clicked = True
-                        except Exception:
-                            pass
-                    if clicked:
-                        break
-            except Exception:
-                continue
-        if not clicked:
-            # Si no hay sugerencias, esperar 2 segundos y enviar Enter al input para forzar la búsqueda
-            await page.wait_for_timeout(10000)
-            await page.focus("input[name='ss']")
-            await page.keyboard.press("Enter")
-        # Presionar el botón de búsqueda
-        # --- NUEVO: Cierra popups y overlays antes de hacer click en el botón de submit ---
-        popup_selectors = [
-            "button[aria-label*='Dismiss']",
-            ".bui-modal__close",
-            "button[aria-label*='Cerrar']",
-            "button[aria-label*='Close']",
-            "button[aria-label*='Accept']",
-            "button[aria-label*='Aceptar']",
-            "button[aria-label*='Entendido']",
-            "button[aria-label*='Got it']",
-            "button[aria-label*='OK']",
-            "button[aria-label*='Allow']",
-            "button[aria-label*='Permitir']",
-            "button[data-testid='cookie-banner-close-button']",
-            "#onetrust-accept-btn-handler",
-            ".modal-mask .modal-close",
-            ".modal__close",
-            ".close-button",
-            ".c-modal__close"
-        ]
-        for sel in popup_selectors:
-            try:
-                el = await page.query_selector(sel)
-                if el:
-                    await el.click()
-                    await page.wait_for_timeout(300)
-            except Exception:
-                pass
-        await page.wait_for_selector("button[type='submit']", timeout=10000)
-        # Haz scroll al botón
-        try:
-            await page.eval_on_selector("button[type='submit']", "el => el.scrollIntoView()")
-        except Exception:
-            pass
-        # Intenta click normal, si falla, click JS
-        try:
-            await page.click("button[type='submit']")
-        except Exception as e:
-            print("[WARN] Click normal falló, intentando click JS", e)
-            try:
-                await page.evaluate('document.querySelector("button[type=\\\'submit\\\']").click()')
-            except Exception as e2:
-                print("[ERROR] Click JS también falló", e2)
-
-        # Cerrar pop-ups extra en la segunda pantalla
-        popup_selectors = [
-            "button[aria-label*='Dismiss']",
-            ".bui-modal__close",
-            "button[aria-label*='Cerrar']",
-            "button[aria-label*='Close']",
-            "button[aria-label*='Accept']",
-            "button[aria-label*='Aceptar']",
-            "button[aria-label*='Entendido']",
-            "button[aria-label*='Got it']",
-            "button[aria-label*='OK']",
-            "button[aria-label*='Allow']",
-            "button[aria-label*='Permitir']",
-            "button[data-testid='cookie-banner-close-button']",
-            "#onetrust-accept-btn-handler",
-            ".modal-mask .modal-close",
-            ".modal__close",
-            ".close-button",
-            ".c-modal__close"
-        ]
-        # Lanzar tarea de cierre de popups en background
-        popup_task = asyncio.create_task(popup_closer(page, popup_selectors, interval=2))
-
-        # Esperar el primer card y hacer clic en la imagen/enlace del hotel
-        await page.wait_for_selector("a[data-testid='property-card-desktop-single-image']", timeout=10000)
-        hotel_link = await page.query_selector("a[data-testid='property-card-desktop-single-image']")
-        if not hotel_link:
-            popup_task.cancel()
-            raise RuntimeError("No se encontró el enlace del hotel en los resultados.")
-
-        # Justo antes de hacer clic en el enlace del hotel:
-        context = page.context
-
-        # Prepara para capturar la nueva página
-        new_page_promise = context.wait_for_event("page")
-
-        await hotel_link.click()
-
-        # Espera la nueva página (pestaña)
-        try:
-            new_page = await asyncio.wait_for(new_page_promise, timeout=10)
-            await new_page.wait_for_load_state("networkidle")
-            page_to_scrape = new_page
-        except asyncio.TimeoutError:
-            # Si no se abre nueva pestaña, sigue en la misma
-            page_to_scrape = page
-
-        # Lanzar tarea de cierre de popups en la página del hotel
-        hotel_popup_task = asyncio.create_task(popup_closer(page_to_scrape, popup_selectors, interval=2))
-
-        # Definir selectores para la tabla de habitaciones
-        table_selectors = [
-            "#hprt-table",
-            ".hprt-table",
-            "table[data-et-view]",
-            "table.hprt-table",
-            ".roomstable",
-            "table[class*='room']",
-            "table[class*='hprt']",
-            "table"
-        ]
-
-        # Esperar a que la tabla de habitaciones esté presente y visible
-        # Intentar múltiples selectores para la tabla
-        table_found = False
-        for selector in table_selectors:
-            try:
-                await page_to_scrape.wait_for_selector(selector, timeout=10000, state='visible')
-                # Verificar que sea realmente una tabla de habitaciones
-                element = await page_to_scrape.query_selector(selector)
-                if element:
-                    tag_name = await element.evaluate('el => el.tagName.toLowerCase()')
-                    if tag_name == 'table':
-                        # Verificar que contenga información de habitaciones
-                        element_html = await element.inner_html()
-                        if any(keyword in element_html.lower() for keyword in ['room', 'habitación', 'suite', 'deluxe', 'king', 'queen']):
-                            print(f"Tabla encontrada con selector: {selector}")
-                            table_found = True
-                            break
-            except Exception:
+        print(
+            f"[DEBUG] Timeouts: navegación={READINESS_CONFIG['navigation_timeout']}ms, "
+            f"tabla={READINESS_CONFIG['table_timeout']}ms"
+        )
+        print(
+            f"[DEBUG] Pausa entre fechas: {READINESS_CONFIG['politeness_delay']}s "
+            f"+ jitter hasta {READINESS_CONFIG['politeness_jitter']}s"
+        )
+
+        date_tasks = []
+        for offset in range(horizon_days):
+            checkin = (today + timedelta(days=offset)).strftime("%Y-%m-%d")
+            checkout = (today + timedelta(days=offset+1)).strftime("%Y-%m-%d")
+            if checkin in skip_dates:
                 continue
-        
-        if not table_found:
-            print("No se encontró la tabla de habitaciones con ningún selector")
-            print("Intentando buscar cualquier tabla en la página...")
-            
-            # Buscar cualquier tabla en la página
-            try:
-                tables = await page_to_scrape.query_selector_all("table")
-                print(f"Encontradas {len(tables)} tablas en la página")
-                
-                for i, table in enumerate(tables):
-                    try:
-                        table_html = await table.inner_html()
-                        if "room" in table_html.lower() or "habitación" in table_html.lower():
-                            print(f"Tabla {i} contiene información de habitaciones")
-                            table_found = True
-                            break
-                    except Exception:
+            # Modifica la URL con las nuevas fechas
+            new_url = re.sub(r"checkin=\d{4}-\d{2}-\d{2}", f"checkin={checkin}", base_url)
+            new_url = re.sub(r"checkout=\d{4}-\d{2}-\d{2}", f"checkout={checkout}", new_url)
+            date_tasks.append({"key": f"{hotel_name}|{checkin}", "date": checkin, "url": new_url})
+
+        async def process_date(date_page, task: dict) -> dict:
+            """Carga una fecha en la página del worker y extrae su tabla (lanza excepción para reintentar)"""
+            checkin = task["date"]
+            print(f"[DEBUG] Procesando fecha {checkin}")
+            await goto(date_page, task["url"])
+
+            # Esperar a que la tabla tenga filas con precio (acotado) y
+            # extraer la tabla completa con un solo page.evaluate
+            if not await wait_for_room_table(date_page, table_selectors):
+                print(f"Timeout esperando la tabla para {checkin}, continuando...")
+            extracted = await extract_room_table(date_page, **extraction_selectors)
+
+            if not extracted["table_selector"]:
+                raise RetryItem(f"No se encontró la tabla de habitaciones para {checkin}")
+            selector_registry.record_extraction("hotel", extracted)
+
+            print(f"Tabla encontrada para {checkin} con selector: {extracted['table_selector']} (filas: {extracted['row_selector']})")
+            day_rooms = extracted["rooms"]
+            for room in day_rooms:
+                print(f"Habitación encontrada para {checkin}: {room['room_type']} - {room['price']}")
+
+            if not day_rooms:
+                print(f"No se encontraron habitaciones para {checkin}")
+            else:
+                print(f"Total de habitaciones encontradas para {checkin}: {len(day_rooms)}")
+            day = {"date": checkin, "rooms": day_rooms}
+            if on_date:
+                await on_date(day)
+            return day
+
+        async def http_date_done(checkin: str, rooms: list):
+            if on_date:
+                await on_date({"date": checkin, "rooms": rooms})
+
+        def date_failed(task: dict, error: BaseException) -> dict:
+            print(f"Error procesando fecha {task['date']}: {error}")
+            return {"date": task["date"], "rooms": []}
+
+        # Modo calendario: el precio más bajo por noche de todo el horizonte en
+        # unas pocas peticiones; solo las fechas interesantes se cargan enteras
+        by_date = {}
+        detail_tasks = date_tasks
+        if CALENDAR_CONFIG["enabled"] and date_tasks:
+            calendar = await fetch_calendar(page_to_scrape, base_url, today, horizon_days)
+            if calendar:
+                interesting = set(flag_interesting_dates(calendar))
+                detail_tasks = [task for task in date_tasks if task["date"] in interesting or task["date"] not in calendar]
+                detail_dates = {task["date"] for task in detail_tasks}
+                for task in date_tasks:
+                    if task["date"] in detail_dates:
                         continue
-            except Exception as e:
-                print(f"Error buscando tablas: {e}")
-            
-            if not table_found:
-                print("No se encontró ninguna tabla con información de habitaciones")
-                html = await page_to_scrape.content()
-                print("HTML de la página:")
-                print(html[:3000])
-                await browser.close()
-                popup_task.cancel()
-                hotel_popup_task.cancel()
-                return []
-
-        # --- NUEVO: Scraping para los próximos 90 días con concurrencia ---
-        results = []
-        base_url = page_to_scrape.url  # URL de la página de detalle del hotel
-        print(f"[DEBUG] URL base del hotel: {base_url}")
-        
-        # Configurar concurrencia - procesar 5 fechas en paralelo
-        CONCURRENT_TASKS = 5
-        semaphore = asyncio.Semaphore(CONCURRENT_TASKS)
-        
-        # Configuración de timeouts optimizados
-        PAGE_LOAD_TIMEOUT = 10000  # 10 segundos
-        SELECTOR_TIMEOUT = 10000   # 10 segundos
-        SLEEP_BETWEEN_DATES = 3    # 3 segundos
-        
-        print(f"[DEBUG] Configuración de concurrencia: {CONCURRENT_TASKS} tareas simultáneas")
-        print(f"[DEBUG] Timeouts: carga={PAGE_LOAD_TIMEOUT}ms, selector={SELECTOR_TIMEOUT}ms")
-        print(f"[DEBUG] Sleep entre fechas: {SLEEP_BETWEEN_DATES}s")
-        
-        # Definir los rangos de fechas para las 3 páginas (como scrape_hotels_parallel)
-        date_ranges = [
-            (0, 30),   # Días 0-30
-            (31, 60),  # Días 31-60
-            (61, 90)   # Días 61-90
-        ]
-        
-        async def process_date_range(start_day: int, end_day: int):
-            """Procesa un rango de fechas en una página separada (como scrape_hotels_parallel)"""
-            async with semaphore:
-                print(f"[DEBUG] Iniciando procesamiento de rango {start_day}-{end_day} en página separada")
-                
-                # Crear una nueva página para este rango (como scrape_hotels_parallel)
-                range_page = await browser.new_page()
-                try:
-                    # Configurar la página como en scrape_hotels_parallel
-                    await range_page.set_extra_http_headers({"user-agent": get_random_user_agent()})
-                    await range_page.add_init_script("""
-                        Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-                    """)
-                    
-                    range_results = []
-                    
-                    # Procesar cada fecha en el rango secuencialmente en esta página
-                    for offset in range(start_day, end_day + 1):
-                        checkin = (today + timedelta(days=offset)).strftime("%Y-%m-%d")
-                        checkout = (today + timedelta(days=offset+1)).strftime("%Y-%m-%d")
-                        
-                        # Modifica la URL con las nuevas fechas
-                        new_url = re.sub(r"checkin=\d{4}-\d{2}-\d{2}", f"checkin={checkin}", base_url)
-                        new_url = re.sub(r"checkout=\d{4}-\d{2}-\d{2}", f"checkout={checkout}", new_url)
-                        
-                        print(f"[DEBUG] Procesando fecha {checkin} en rango {start_day}-{end_day}")
-                        
-                        try:
-                            await range_page.goto(new_url)
-                            await asyncio.sleep(SLEEP_BETWEEN_DATES)
-                            
-                            # Esperar a que la página cargue completamente
-                            try:
-                                await range_page.wait_for_load_state("networkidle", timeout=PAGE_LOAD_TIMEOUT)
-                            except Exception:
-                                print(f"Timeout esperando carga completa para {checkin}, continuando...")
-                            
-                            # Intentar múltiples selectores para la tabla
-                            table_found = False
-                            for selector in table_selectors:
-                                try:
-                                    await range_page.wait_for_selector(selector, timeout=SELECTOR_TIMEOUT, state='visible')
-                                    # Verificar que sea realmente una tabla de habitaciones
-                                    element = await range_page.query_selector(selector)
-                                    if element:
-                                        tag_name = await element.evaluate('el => el.tagName.toLowerCase()')
-                                        if tag_name == 'table':
-                                            # Verificar que contenga información de habitaciones
-                                            element_html = await element.inner_html()
-                                            if any(keyword in element_html.lower() for keyword in ['room', 'habitación', 'suite', 'deluxe', 'king', 'queen']):
-                                                print(f"Tabla encontrada para {checkin} con selector: {selector}")
-                                                table_found = True
-                                                break
-                                except Exception:
-                                    continue
-                            
-                            if not table_found:
-                                print(f"No se encontró la tabla de habitaciones para {checkin}")
-                                range_results.append({"date": checkin, "rooms": []})
-                                continue
-                            
-                            # Mejorar la extracción de habitaciones con múltiples selectores
-                            day_rooms = []
-                            
-                            # Intentar diferentes selectores para las filas de habitaciones
-                            row_selectors = [
-                                "#hprt-table tr",
-                                "#hprt-table tbody tr",
-                                ".hprt-table tr",
-                                "table[data-et-view] tr"
-                            ]
-                            
-                            rows = []
-                            for selector in row_selectors:
-                                try:
-                                    rows = await range_page.query_selector_all(selector)
-                                    if rows:
-                                        print(f"Encontradas {len(rows)} filas con selector: {selector}")
-                                        break
-                                except Exception:
-                                    continue
-                            
-                            if not rows:
-                                print(f"No se encontraron filas de habitaciones para {checkin}")
-                                range_results.append({"date": checkin, "rooms": []})
-                                continue
-                            
-                            for row in rows:
-                                try:
-                                    # Intentar múltiples selectores para el tipo de habitación
-                                    room_type_selectors = [
-                                        "th span.hprt-roomtype-icon-link",
-                                        "th .hprt-roomtype-icon-link",
-                                        "th .hprt-roomtype",
-                                        "th span",
-                                        "th"
-                                    ]
-                                    
-                                    room_type_el = None
-                                    room_text = None
-                                    
-                                    for room_selector in room_type_selectors:
-                                        try:
-                                            room_type_el = await row.query_selector(room_selector)
-                                            if room_type_el:
-                                                room_text = (await room_type_el.inner_text()).strip()
-                                                if room_text and len(room_text) > 5:  # Asegurar que no esté vacío
-                                                    break
-                                        except Exception:
-                                            continue
-                                    
-                                    if not room_text:
-                                        continue
-                                    
-                                    # Buscar precio en todas las celdas de la fila
-                                    price_text = None
-                                    tds = await row.query_selector_all("td")
-                                    
-                                    for td in tds:
-                                        try:
-                                            td_text = await td.inner_text()
-                                            # Buscar diferentes formatos de precio
-                                            price_patterns = [
-                                                r'(MXN\s*\$?|\$)\s*[\d,.]+',
-                                                r'[\d,.]+\s*(MXN|\$)',
-                                                r'\$[\d,.]+',
-                                                r'MXN\s*[\d,.]+',
-                                                r'[\d,]+\.?\d*\s*(MXN|\$)',
-                                                r'(MXN|\$)\s*[\d,]+\.?\d*'
-                                            ]
-                                            
-                                            for pattern in price_patterns:
-                                                match = re.search(pattern, td_text, re.IGNORECASE)
-                                                if match:
-                                                    price_text = match.group(0).strip()
-                                                    break
-                                            
-                                            if price_text:
-                                                break
-                                        except Exception:
-                                            continue
-                                    
-                                    if room_text and price_text:
-                                        # Verificar que no sea un duplicado en el mismo día
-                                        is_duplicate = False
-                                        for existing_room in day_rooms:
-                                            if existing_room["room_type"] == room_text and existing_room["price"] == price_text:
-                                                is_duplicate = True
-                                                break
-                                        
-                                        if not is_duplicate:
-                                            day_rooms.append({"room_type": room_text, "price": price_text})
-                                            print(f"Habitación encontrada para {checkin}: {room_text} - {price_text}")
-                                
-                                except Exception as e:
-                                    print(f"Error procesando fila para {checkin}: {e}")
-                                    continue
-                            
-                            if not day_rooms:
-                                print(f"No se encontraron habitaciones para {checkin}")
-                            else:
-                                print(f"Total de habitaciones encontradas para {checkin}: {len(day_rooms)}")
-                            
-                            range_results.append({"date": checkin, "rooms": day_rooms})
-                            
-                        except Exception as e:
-                            print(f"Error procesando fecha {checkin}: {e}")
-                            range_results.append({"date": checkin, "rooms": []})
-                    
-                    print(f"[DEBUG] Rango {start_day}-{end_day} completado. {len(range_results)} días procesados")
-                    return range_results
-                    
-                except Exception as e:
-                    print(f"Error procesando rango {start_day}-{end_day}: {e}")
-                    return []
-                finally:
-                    await range_page.close()
-        
-        # Crear tareas concurrentes para los 3 rangos (como scrape_hotels_parallel)
-        range_tasks = []
-        for start_day, end_day in date_ranges:
-            print(f"[DEBUG] Preparando tarea para rango de días {start_day}-{end_day}")
-            range_tasks.append(process_date_range(start_day, end_day))
-        
-        # Ejecutar las 3 páginas concurrentemente (como scrape_hotels_parallel)
-        print(f"[DEBUG] Iniciando procesamiento concurrente de 3 páginas simultáneamente")
-        print(f"[DEBUG] Total de rangos: {len(range_tasks)} (3 páginas)")
-        print(f"[DEBUG] Concurrencia: {CONCURRENT_TASKS} tareas simultáneas")
-        
-        all_results = await asyncio.gather(*range_tasks, return_exceptions=True)
-        
-        # Combinar resultados de todas las páginas
-        valid_results = []
-        for result in all_results:
-            if isinstance(result, list):
-                valid_results.extend(result)
-            elif isinstance(result, Exception):
-                print(f"Error en rango concurrente: {result}")
-        
-        print(f"[DEBUG] Procesamiento completado. {len(valid_results)} días procesados exitosamente en total")
-        
-        # Asignar los resultados válidos
-        results = valid_results
-        await browser.close()
-        popup_task.cancel()
-        hotel_popup_task.cancel()
+                    day = {"date": task["date"], "rooms": calendar_rooms(calendar[task["date"]])}
+                    by_date[task["date"]] = day
+                    if on_date:
+                        await on_date(day)
+                print(f"[DEBUG] Calendario: {len(by_date)} noches sin desglose, {len(detail_tasks)} fechas interesantes")
+            else:
+                print("[DEBUG] Calendario no disponible, se cargan todas las fechas")
+
+        # Camino rápido: las fechas se piden por HTTP con las cookies del contexto
+        http_rooms = {}
+        pending_tasks = detail_tasks
+        if HTTP_FASTPATH_CONFIG["enabled"]:
+            http_rooms, pending_tasks = await fetch_rooms_over_http(
+                context, page_to_scrape, detail_tasks, table_selectors, on_result=http_date_done
+            )
+            print(f"[DEBUG] {len(http_rooms)} fechas obtenidas por HTTP, {len(pending_tasks)} con el navegador")
+
+        # Las fechas pendientes se procesan con las páginas del navegador,
+        # que se reciclan por navegaciones o memoria
+        memory_report = MemoryReport(hotel_name)
+        browser_results = await run_page_workers(
+            context, pending_tasks, process_date,
+            workers=workers,
+            on_failure=date_failed,
+            between_items=politeness_delay,
+            report=memory_report,
+        ) if pending_tasks else []
+        by_date.update({r["date"]: r for r in browser_results})
+        by_date.update({date: {"date": date, "rooms": rooms} for date, rooms in http_rooms.items()})
+        # Resultados en el orden de date_tasks, es decir, por fecha
+        results = [by_date[task["date"]] for task in date_tasks]
+
+        if skip_dates:
+            print(f"[DEBUG] {len(skip_dates)} días ya guardados en una ejecución anterior")
+        print(f"[DEBUG] Procesamiento completado. {len(results)} días procesados en total")
+        print(f"[DEBUG] Popups cerrados: {popup_guard.stats()}")
+        print(f"[DEBUG] Memoria: {memory_report.as_dict()}")
+        for selector, count in popup_guard.dismissals.items():
+            selector_registry.record("any", "popup", selector, count)
+        selector_registry.flush()
         return results
    
                         # -----SUPABASE----- #
@@ -575,71 +388,169 @@ async def scrape_booking_prices(hotel_name: str, locale="en-us", currency="MXN",
                         # -----SUPABASE----- #
                         # -----SUPABASE----- #
 
-async def insert_user_hotel_prices(user_id: str, hotel_name: str, results: list, jwt: str = ""): 
-    user_id = user_id.strip()
-    if not is_valid_uuid(user_id):
-        print("ERROR: user_id no es un UUID válido:", user_id)
-        return
-    
-    SUPABASE_URL = os.getenv("SUPABASE_URL")
-    SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
-    # Cambiar la estrategia de conflicto para permitir múltiples habitaciones por día
-    url = f"{SUPABASE_URL}/rest/v1/hotel_usuario"
-    token = jwt if jwt else SUPABASE_KEY
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-        "Prefer": "resolution=merge-duplicates"
-    }
-    
-    total_inserted = 0
-    total_errors = 0
-    
-    print(f"Iniciando inserción de datos para {len(results)} días...")
-    
-    for day in results:
-        checkin_date = day["date"]
-        rooms_count = len(day["rooms"])
-        print(f"Procesando {checkin_date}: {rooms_count} habitaciones")
-        
+def hotel_usuario_writer(jwt: str = "") -> BulkWriter:
+    """BulkWriter para hotel_usuario con el JWT del usuario (o la anon key)"""
+    return get_supabase_rest().bulk_writer("hotel_usuario", jwt=jwt, prefer="resolution=merge-duplicates")
+
+def build_price_rows(user_id: str, hotel_name: str, days: list, scrape_date: str = None,
+                     price_columns: bool = True) -> list:
+    """
+    Una fila de hotel_usuario por habitación y día; con price_columns el precio
+    va además normalizado a importe y moneda (ver price_columns_available)
+    """
+    scrape_date = scrape_date or datetime.today().strftime("%Y-%m-%d")
+    rows = []
+    for day in days:
         for room in day["rooms"]:
-            # Generar un ID único para cada inserción
-            unique_id = str(uuid.uuid4())
-            
-            data = {
-                "id": unique_id,  # Agregar ID único
+            rows.append({
+                "id": str(uuid.uuid4()),  # ID único para permitir múltiples habitaciones por día
                 "user_id": user_id,
                 "hotel_name": hotel_name,
-                "scrape_date": datetime.today().strftime("%Y-%m-%d"),
-                "checkin_date": checkin_date,
+                "scrape_date": scrape_date,
+                "checkin_date": day["date"],
                 "room_type": room["room_type"],
                 "price": room["price"]
-            }
+            })
+    return add_price_columns(rows) if price_columns else rows
+
+class UserPriceStream:
+    """
+    Guarda en hotel_usuario cada fecha en cuanto se scrapea y la registra en el
+    checkpoint del día al confirmarse, para reanudar solo lo que falte.
+    """
+
+    def __init__(self, user_id: str, hotel_name: str, jwt: str = ""):
+        self.user_id = user_id
+        self.hotel_name = hotel_name
+        self.checkpoint = ScrapeCheckpoint(user_id, hotel_name)
+        self.completed = self.checkpoint.completed_dates()
+        self.writer = StreamingBulkWriter(hotel_usuario_writer(jwt), on_flushed=self.checkpoint.mark)
+        self.price_columns = False
+
+    async def __aenter__(self):
+        # Sin la migración de price_amount/price_currency, PostgREST rechazaría cada fila
+        self.price_columns = await asyncio.to_thread(price_columns_available, get_supabase_rest())
+        await self.writer.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.writer.close()
+
+    async def add_day(self, day: dict):
+        if day["date"] in self.completed:
+            return
+        rows = build_price_rows(self.user_id, self.hotel_name, [day], price_columns=self.price_columns)
+        await self.writer.submit(day["date"], rows)
+
+    def finish(self) -> dict:
+        """Resumen de inserción; borra el checkpoint si ya está todo el horizonte"""
+        done = self.checkpoint.completed_dates()
+        missing = [d for d in horizon_dates() if d not in done]
+        if not missing:
+            self.checkpoint.clear()
+        totals = self.writer.totals
+        print(
+            f"Resumen de inserción: {totals['inserted']} filas insertadas, {totals['failed']} errores, "
+            f"{totals['keys']} días guardados en {totals['flushes']} envíos, "
+            f"{len(self.completed)} días reanudados, {len(missing)} días pendientes"
+        )
+        return {
+            "inserted": totals["inserted"],
+            "errors": totals["failed"],
+            "days": totals["keys"],
+            "resumed_days": len(self.completed),
+            "missing_days": len(missing),
+            "elapsed_ms": totals["elapsed_ms"]
+        }
+
+async def run_hotel_propio(user_id: str, hotel_name: str, headless_mode="new", jwt: str = "", city: str = "") -> dict:
+    """
+    Punto de entrada como librería: scrapea los precios del hotel del usuario,
+    los guarda en hotel_usuario a medida que se obtienen y devuelve los precios
+    junto al resumen de inserción. Las fechas ya guardadas hoy se omiten.
+    """
+    user_id = user_id.strip()
+    if not is_valid_uuid(user_id):
+        print("ERROR: user_id no es un UUID válido:", user_id)
+        return {"hotel_name": hotel_name, "prices": [], "insert": {"inserted": 0, "errors": 0, "days": 0, "error": "user_id no es un UUID válido"}}
+    async with UserPriceStream(user_id, hotel_name, jwt=jwt) as stream:
+        prices = await scrape_booking_prices(
+            hotel_name, headless_mode=headless_mode, city=city,
+            skip_dates=stream.completed, on_date=stream.add_day
+        )
+    print("Precios:", prices)
+    insert_summary = stream.finish()
+    print("¡Listo!")
+    return {"hotel_name": hotel_name, "prices": prices, "insert": insert_summary}
+
+async def run_hotel_propio_batch(pairs: list, headless_mode="new", hotel_concurrency: int = None) -> dict:
+    """
+    Modo por lotes: recibe pares (user_id, hotel_name), scrapea una sola vez
+    cada hotel distinto (varios usuarios pueden seguir el mismo) sobre el pool
+    de navegadores compartido y guarda las filas de cada usuario a medida que
+    se obtienen.
+    """
+    hotels = {}
+    for user_id, hotel_name in pairs:
+        user_id = user_id.strip()
+        if not hotel_name or not is_valid_uuid(user_id):
+            continue
+        hotels.setdefault(PropertyUrlCache.key(hotel_name), []).append((user_id, hotel_name))
+    print(f"[BATCH] {len(pairs)} usuarios, {len(hotels)} hoteles distintos")
+
+    semaphore = asyncio.Semaphore(hotel_concurrency or BATCH_CONFIG["hotel_concurrency"])
+    results = []
+
+    async def process_hotel(users: list):
+        hotel_name = users[0][1]
+        streams = [UserPriceStream(user_id, user_hotel_name) for user_id, user_hotel_name in users]
+        # Solo se omiten las fechas que ya tienen guardadas todos los usuarios del hotel
+        skip_dates = set.intersection(*(stream.completed for stream in streams))
+
+        async def on_date(day: dict):
+            for stream in streams:
+                await stream.add_day(day)
+
+        async with semaphore:
+            for stream in streams:
+                await stream.__aenter__()
             try:
-                r = requests.post(url, headers=headers, json=data)
-                if r.status_code in [200, 201]:
-                    total_inserted += 1
-                    print(f"[OK] Insertado: {checkin_date} - {room['room_type']} - {room['price']}")
-                else:
-                    total_errors += 1
-                    print(f"[ERROR] Error {r.status_code}: {checkin_date} - {room['room_type']} - {room['price']}")
-                    print(f"  Response: {r.text}")
+                prices = await scrape_booking_prices(hotel_name, headless_mode=headless_mode,
+                                                     skip_dates=skip_dates, on_date=on_date)
+                error = None
             except Exception as e:
-                total_errors += 1
-                print(f"[EXCEPTION] {checkin_date} - {room['room_type']} - {room['price']}")
-                print(f"  Error: {e}")
-    
-    print(f"Resumen de inserción:")
-    print(f"  - Total insertados: {total_inserted}")
-    print(f"  - Total errores: {total_errors}")
-    print(f"  - Días procesados: {len(results)}")
+                print(f"[BATCH] Error scrapeando {hotel_name}: {e}")
+                prices, error = [], str(e)
+            finally:
+                for stream in streams:
+                    await stream.__aexit__(None, None, None)
+        for stream in streams:
+            item = {
+                "user_id": stream.user_id,
+                "hotel_name": stream.hotel_name,
+                "days": len(prices),
+                "rooms": sum(len(day["rooms"]) for day in prices),
+                "insert": stream.finish(),
+            }
+            if error:
+                item["error"] = error
+            results.append(item)
+
+    await asyncio.gather(*(process_hotel(users) for users in hotels.values()))
+    return {"users": len(pairs), "hotels": len(hotels), "results": results}
 
 async def main(user_id: str, hotel_name: str, headless_mode="new", jwt: str = ""):
-    prices = await scrape_booking_prices(hotel_name, headless_mode=headless_mode)
-    print("Precios:", prices)
-    await insert_user_hotel_prices(user_id, hotel_name, prices, jwt=jwt)
-    print("¡Listo!")
+    try:
+        await run_hotel_propio(user_id, hotel_name, headless_mode=headless_mode, jwt=jwt)
+    finally:
+        await shutdown_browser_pools()
+
+async def main_batch(pairs: list, headless_mode="new"):
+    try:
+        summary = await run_hotel_propio_batch(pairs, headless_mode=headless_mode)
+        print("Resumen:", summary)
+    finally:
+        await shutdown_browser_pools()
 
 # --- Bloque para ejecución directa por CLI ---
 if __name__ == "__main__":
@@ -649,7 +560,15 @@ if __name__ == "__main__":
     headless_mode = "new"
     jwt = ""
     args = sys.argv[1:]
-    if len(args) >= 2:
+    if len(args) >= 2 and args[0] == "--batch":
+        # Archivo JSON con una lista de pares [user_id, hotel_name]
+        import json
+        with open(args[1], "r", encoding="utf-8") as f:
+            pairs = [tuple(pair) for pair in json.load(f)]
+        if "--headless" in args and args.index("--headless") + 1 < len(args):
+            headless_mode = args[args.index("--headless") + 1]
+        asyncio.run(main_batch(pairs, headless_mode))
+    elif len(args) >= 2:
         user_id = args[0]
         hotel_name = args[1]
         # Buscar headless_mode y jwt en los argumentos
@@ -661,4 +580,5 @@ if __name__ == "__main__":
         asyncio.run(main(user_id, hotel_name, headless_mode, jwt))
     else:
         print("Modo API: ejecuta con 'uvicorn hotel_propio:app --reload'")
-        print("Modo CLI: python hotel_propio.py <user_id> <hotel_name> [--headless <true|false|new>] [--jwt <token>]")
\ No newline at end of file
+        print("Modo CLI: python hotel_propio.py <user_id> <hotel_name> [--headless <true|false|new>] [--jwt <token>]")
+        print("Modo lotes: python hotel_propio.py --batch <pares.json> [--headless <true|false|new>]")
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+Descarga de páginas de fecha de Booking por HTTP, sin navegador.
+
+Una vez que el navegador ha resuelto la URL del hotel y las cookies de
+consentimiento, las páginas por fecha se piden con un cliente httpx
+compartido (cookies y cabeceras exportadas del BrowserContext) y se
+analizan con booking_extract.parse_room_table. Las fechas en las que el
+análisis falla o se detecta una página de desafío se devuelven como
+pendientes para que el navegador las procese.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+try:
+    from .booking_extract import parse_room_table
+    from .config import HTTP_FASTPATH_CONFIG
+    from .page_ready import politeness_delay
+except ImportError:
+    from booking_extract import parse_room_table
+    from config import HTTP_FASTPATH_CONFIG
+    from page_ready import politeness_delay
+
+logger = logging.getLogger(__name__)
+
+# Marcas de páginas anti-bot / desafío
+CHALLENGE_MARKERS = (
+    "captcha",
+    "challenge-platform",
+    "cf-chl",
+    "awswaf",
+    "px-captcha",
+    "/_sec/cp_challenge",
+    "access denied",
+)
+CHALLENGE_STATUS = (202, 403, 405, 429, 503)
+
+
+def looks_like_challenge(status: int, html: str) -> bool:
+    """True si una respuesta sin tabla de habitaciones parece un desafío anti-bot"""
+    if status in CHALLENGE_STATUS:
+        return True
+    head = html[:20000].lower()
+    return any(marker in head for marker in CHALLENGE_MARKERS)
+
+
+async def client_from_context(context, page) -> httpx.AsyncClient:
+    """Crea un cliente httpx con las cookies y cabeceras del BrowserContext"""
+    identity = await page.evaluate("() => ({ua: navigator.userAgent, languages: navigator.languages})")
+    languages = identity.get("languages") or ["en-US", "en"]
+    headers = {
+        "User-Agent": identity["ua"],
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": ",".join(languages),
+        "Referer": page.url,
+    }
+    cookies = httpx.Cookies()
+    for cookie in await context.cookies():
+        cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+    concurrency = HTTP_FASTPATH_CONFIG["concurrency"]
+    return httpx.AsyncClient(
+        headers=headers,
+        cookies=cookies,
+        follow_redirects=True,
+        timeout=HTTP_FASTPATH_CONFIG["timeout"],
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+    )
+
+
+async def fetch_rooms_over_http(context, page, tasks: List[Dict[str, Any]], table_selectors: List[str] = None,
+                                on_result: Optional[Callable[[str, List[dict]], Awaitable[None]]] = None
+                                ) -> Tuple[Dict[str, List[dict]], List[Dict[str, Any]]]:
+    """
+    Descarga y analiza las fechas de `tasks` ({"date", "url"}) por HTTP.
+    on_result(fecha, rooms) se espera con cada fecha obtenida.
+
+    Devuelve (rooms_por_fecha, tareas_pendientes): las pendientes son las que
+    deben repetirse con el navegador. Si se detecta un desafío se deja de usar
+    HTTP para el resto de fechas.
+    """
+    results: Dict[str, List[dict]] = {}
+    if not tasks:
+        return results, []
+
+    semaphore = asyncio.Semaphore(HTTP_FASTPATH_CONFIG["concurrency"])
+    blocked = asyncio.Event()
+    started = time.perf_counter()
+
+    async def fetch(client: httpx.AsyncClient, task: Dict[str, Any]):
+        async with semaphore:
+            if blocked.is_set():
+                return
+            try:
+                response = await client.get(task["url"])
+                html = response.text
+                extracted = await asyncio.to_thread(parse_room_table, html, table_selectors) \
+                    if response.status_code == 200 else {"rooms": []}
+                if extracted["rooms"]:
+                    if on_result:
+                        try:
+                            await on_result(task["date"], extracted["rooms"])
+                        except Exception as e:
+                            # Un fallo al guardar solo afecta a esta fecha: la repite el navegador
+                            logger.warning(f"[HTTP] {task['date']}: error procesando el resultado ({e}); se usa el navegador")
+                            return
+                    results[task["date"]] = extracted["rooms"]
+                elif looks_like_challenge(response.status_code, html):
+                    blocked.set()
+                    logger.warning(f"[HTTP] Desafío detectado en {task['date']} ({response.status_code}); se usa el navegador")
+                    return
+            except (httpx.HTTPError, ValueError) as e:
+                logger.info(f"[HTTP] {task['date']} falló por HTTP ({e}); se usa el navegador")
+            await politeness_delay()
+
+    async with await client_from_context(context, page) as client:
+        await asyncio.gather(*(fetch(client, task) for task in tasks))
+
+    # Pendientes en el mismo orden que las tareas de entrada
+    pending = [task for task in tasks if task["date"] not in results]
+    logger.info(
+        f"[HTTP] {len(results)}/{len(tasks)} fechas por HTTP en {time.perf_counter() - started:.1f}s, "
+        f"{len(pending)} pendientes para el navegador"
+    )
+    return results, pending
@@ -0,0 +1,69 @@
+"""
+Esperas basadas en eventos para los scrapers de Booking.
+
+En lugar de pausas fijas se espera a que el elemento que se va a leer esté
+listo (con un timeout acotado) y entre navegaciones se aplica una pausa de
+cortesía configurable y con jitter (READINESS_CONFIG).
+"""
+import asyncio
+import random
+from typing import List, Optional
+
+try:
+    from .booking_extract import TABLE_SELECTORS
+    from .config import READINESS_CONFIG
+except ImportError:
+    from booking_extract import TABLE_SELECTORS
+    from config import READINESS_CONFIG
+
+# La tabla está lista cuando alguna fila tiene tipo de habitación y un precio con dígitos
+ROOM_TABLE_READY_JS = """
+(selectors) => {
+    for (const sel of selectors) {
+        const table = document.querySelector(sel);
+        if (!table || table.tagName.toLowerCase() !== 'table') continue;
+        for (const row of table.querySelectorAll('tr')) {
+            if (row.querySelector('th') && /\\d/.test(Array.from(row.querySelectorAll('td')).map(td => td.innerText).join(' '))) {
+                return true;
+            }
+        }
+    }
+    return false;
+}
+"""
+
+
+async def goto(page, url: str, timeout: int = None):
+    """Navega sin esperar a 'load' ni 'networkidle'; la preparación la deciden las esperas de elementos"""
+    return await page.goto(url, wait_until="domcontentloaded",
+                           timeout=timeout or READINESS_CONFIG["navigation_timeout"])
+
+
+async def wait_for_any(page, selectors: List[str], timeout: int = None, state: str = "visible") -> bool:
+    """Espera a que aparezca cualquiera de los selectores; False si vence el timeout"""
+    try:
+        await page.wait_for_selector(", ".join(selectors), state=state,
+                                     timeout=timeout or READINESS_CONFIG["element_timeout"])
+        return True
+    except Exception:
+        return False
+
+
+async def wait_for_room_table(page, table_selectors: Optional[List[str]] = None, timeout: int = None) -> bool:
+    """Espera a que la tabla de habitaciones tenga al menos una fila con precio"""
+    selectors = [s for s in (table_selectors or TABLE_SELECTORS) if s != "table"] or ["table"]
+    try:
+        await page.wait_for_function(ROOM_TABLE_READY_JS, arg=selectors,
+                                     timeout=timeout or READINESS_CONFIG["table_timeout"])
+        return True
+    except Exception:
+        return False
+
+
+async def politeness_delay(base: float = None, jitter: float = None):
+    """Pausa de cortesía entre peticiones al mismo sitio: base + uniforme(0, jitter)"""
+    base = READINESS_CONFIG["politeness_delay"] if base is None else base
+    jitter = READINESS_CONFIG["politeness_jitter"] if jitter is None else jitter
+    delay = base + random.uniform(0, jitter)
+    if delay > 0:
+        await asyncio.sleep(delay)
@@ -0,0 +1,215 @@
+"""
+Reciclado de páginas y presupuesto de memoria para bucles largos de fechas.
+
+La memoria del renderer de Chromium crece con cada navegación de una misma
+página. PageRecycler entrega la página de un worker y la cierra y reabre en
+el mismo contexto cuando supera RECYCLE_CONFIG["max_navigations"] o su heap
+JS pasa de RECYCLE_CONFIG["max_js_heap_mb"]. Cada página abierta ocupa un
+hueco del límite de renderers concurrentes del proceso (max_renderers), así
+que varios hoteles en paralelo no pueden abrir más pestañas que ese tope.
+
+MemoryReport junta las lecturas de una ejecución (heap JS por página y RSS
+de los procesos hijos, es decir Playwright y Chromium) para el log final.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+try:
+    from .config import RECYCLE_CONFIG
+except ImportError:
+    from config import RECYCLE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_renderer_slots: Dict[int, asyncio.Semaphore] = {}
+
+
+def renderer_slots() -> asyncio.Semaphore:
+    """Semáforo de renderers del event loop actual"""
+    key = id(asyncio.get_running_loop())
+    if key not in _renderer_slots:
+        _renderer_slots[key] = asyncio.Semaphore(RECYCLE_CONFIG["max_renderers"])
+    return _renderer_slots[key]
+
+
+async def page_js_heap_mb(page) -> Optional[float]:
+    """Heap JS usado por la página (vía CDP); None si no se puede medir"""
+    try:
+        cdp = await page.context.new_cdp_session(page)
+        try:
+            metrics = await cdp.send("Performance.getMetrics")
+        finally:
+            await cdp.detach()
+        used = next((m["value"] for m in metrics["metrics"] if m["name"] == "JSHeapUsedSize"), None)
+        return used / (1024 * 1024) if used is not None else None
+    except Exception:
+        return None
+
+
+def descendant_rss_mb() -> Optional[float]:
+    """RSS total de los procesos hijos (driver de Playwright y Chromium); None fuera de Linux"""
+    try:
+        parents, rss_pages = {}, {}
+        for name in os.listdir("/proc"):
+            if not name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{name}/stat", "r") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                parents[int(name)] = int(fields[1])
+                rss_pages[int(name)] = int(fields[21])
+            except (OSError, IndexError, ValueError):
+                continue
+    except OSError:
+        return None
+    root = os.getpid()
+    descendants, frontier = set(), {root}
+    while frontier:
+        frontier = {pid for pid, parent in parents.items() if parent in frontier and pid not in descendants}
+        descendants |= frontier
+    return sum(rss_pages[pid] for pid in descendants) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class MemoryReport:
+    """Lecturas de memoria de una ejecución"""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.started = time.perf_counter()
+        self.page_heaps: List[float] = []
+        self.rss_samples: List[float] = []
+        self.recycled = 0
+        self.navigations = 0
+        self.peak_renderers = 0
+        self._open_renderers = 0
+
+    def page_opened(self):
+        self._open_renderers += 1
+        self.peak_renderers = max(self.peak_renderers, self._open_renderers)
+
+    def page_closed(self):
+        self._open_renderers -= 1
+
+    def sample(self, js_heap_mb: Optional[float] = None):
+        if js_heap_mb is not None:
+            self.page_heaps.append(js_heap_mb)
+        rss = descendant_rss_mb()
+        if rss is not None:
+            self.rss_samples.append(rss)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "label": self.label,
+            "elapsed_s": round(time.perf_counter() - self.started, 1),
+            "navigations": self.navigations,
+            "pages_recycled": self.recycled,
+            "peak_renderers": self.peak_renderers,
+            "peak_page_js_heap_mb": round(max(self.page_heaps), 1) if self.page_heaps else None,
+            "peak_browser_rss_mb": round(max(self.rss_samples), 1) if self.rss_samples else None,
+            "last_browser_rss_mb": round(self.rss_samples[-1], 1) if self.rss_samples else None,
+        }
+
+    def log(self):
+        logger.info(f"[MEMORY] {self.as_dict()}")
+
+
+class PageRecycler:
+    """
+    Página de un worker que se recicla por navegaciones o memoria.
+
+    Uso:
+        async with PageRecycler(context, report=report) as recycler:
+            for item in items:
+                page = await recycler.get()   # antes de cada navegación
+                ...
+
+    La página (y su hueco de renderer) se abre en el primer get(); release()
+    la devuelve mientras el worker espera trabajo, para no bloquear a otros.
+    """
+
+    def __init__(self, context, page=None, report: Optional[MemoryReport] = None,
+                 setup: Optional[Callable[[Any], Awaitable[None]]] = None,
+                 max_navigations: int = None, max_js_heap_mb: float = None, sample_every: int = None):
+        self.context = context
+        self.page = page
+        self.report = report
+        self.setup = setup
+        self.max_navigations = max_navigations or RECYCLE_CONFIG["max_navigations"]
+        self.max_js_heap_mb = max_js_heap_mb or RECYCLE_CONFIG["max_js_heap_mb"]
+        self.sample_every = sample_every or RECYCLE_CONFIG["sample_every"]
+        self.navigations = 0
+        self._slot = False
+
+    async def __aenter__(self):
+        if self.page is not None:
+            # Página recibida del llamador: ocupa un hueco desde ya
+            await self._acquire()
+            if self.report:
+                self.report.page_opened()
+        return self
+
+    async def _acquire(self):
+        if not self._slot:
+            await renderer_slots().acquire()
+            self._slot = True
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _open(self):
+        self.page = await self.context.new_page()
+        self.navigations = 0
+        if self.report:
+            self.report.page_opened()
+        if self.setup:
+            await self.setup(self.page)
+
+    async def _close_page(self):
+        if self.page is not None:
+            try:
+                await self.page.close()
+            except Exception:
+                pass
+            self.page = None
+            if self.report:
+                self.report.page_closed()
+
+    async def get(self):
+        """Página para la siguiente navegación (nueva si la anterior superó su presupuesto)"""
+        if self.page is None:
+            await self._acquire()
+            await self._open()
+        reason = None
+        if self.navigations >= self.max_navigations:
+            reason = f"{self.navigations} navegaciones"
+        elif self.navigations and self.navigations % self.sample_every == 0:
+            heap = await page_js_heap_mb(self.page)
+            if self.report:
+                self.report.sample(heap)
+            if heap is not None and heap >= self.max_js_heap_mb:
+                reason = f"heap JS {heap:.0f} MB"
+        if reason:
+            logger.info(f"[RECYCLE] Reabriendo página tras {reason}")
+            await self._close_page()
+            await self._open()
+            if self.report:
+                self.report.recycled += 1
+        self.navigations += 1
+        if self.report:
+            self.report.navigations += 1
+        return self.page
+
+    async def release(self):
+        """Cierra la página y libera su hueco; el próximo get() abre otra"""
+        await self._close_page()
+        if self._slot:
+            renderer_slots().release()
+            self._slot = False
+
+    async def close(self):
+        if self.report and self.page is not None:
+            self.report.sample(await page_js_heap_mb(self.page))
+        await self.release()
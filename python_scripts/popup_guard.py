@@ -0,0 +1,87 @@
+"""
+Cierre de popups y banners de cookies dentro de la página.
+
+Un script inyectado con add_init_script observa el DOM con un
+MutationObserver y, solo cuando aparece un overlay que coincide con
+POPUP_SELECTORS, le hace click. Cada cierre se notifica a Python mediante una
+binding expuesta para llevar la cuenta por selector; no hay sondeo desde
+Python ni tráfico CDP mientras no aparezca nada.
+"""
+import json
+import logging
+from collections import Counter
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+POPUP_SELECTORS = [
+    "button[aria-label*='Dismiss']",
+    ".bui-modal__close",
+    "button[aria-label*='Cerrar']",
+    "button[aria-label*='Close']",
+    "button[aria-label*='Accept']",
+    "button[aria-label*='Aceptar']",
+    "button[aria-label*='Entendido']",
+    "button[aria-label*='Got it']",
+    "button[aria-label*='OK']",
+    "button[aria-label*='Allow']",
+    "button[aria-label*='Permitir']",
+    "button[data-testid='cookie-banner-close-button']",
+    "#onetrust-accept-btn-handler",
+    ".modal-mask .modal-close",
+    ".modal__close",
+    ".close-button",
+    ".c-modal__close"
+]
+
+BINDING_NAME = "__popupDismissed"
+
+_OBSERVER_JS = """
+(() => {
+    const selectors = %(selectors)s;
+    const report = (sel) => { try { window.%(binding)s && window.%(binding)s(sel); } catch (e) {} };
+    let scheduled = false;
+    const sweep = () => {
+        scheduled = false;
+        for (const sel of selectors) {
+            for (const el of document.querySelectorAll(sel)) {
+                // Solo overlays visibles y cada elemento una sola vez
+                if (el.__popupDismissed || !el.getClientRects().length) continue;
+                el.__popupDismissed = true;
+                try { el.click(); report(sel); } catch (e) {}
+            }
+        }
+    };
+    // Agrupar ráfagas de mutaciones en un solo barrido
+    const schedule = () => { if (!scheduled) { scheduled = true; setTimeout(sweep, 50); } };
+    const start = () => {
+        new MutationObserver(schedule).observe(document.documentElement, {childList: true, subtree: true});
+        schedule();
+    };
+    if (document.documentElement) start();
+    else document.addEventListener('DOMContentLoaded', start, {once: true});
+})();
+"""
+
+
+class PopupGuard:
+    """Instala el observador de popups en un BrowserContext y cuenta los cierres"""
+
+    def __init__(self, selectors: Optional[List[str]] = None):
+        self.selectors = selectors or POPUP_SELECTORS
+        self.dismissals = Counter()
+
+    async def install(self, context):
+        """Debe llamarse antes de abrir las páginas del contexto"""
+        await context.expose_binding(BINDING_NAME, self._on_dismissed)
+        await context.add_init_script(_OBSERVER_JS % {
+            "selectors": json.dumps(self.selectors),
+            "binding": BINDING_NAME,
+        })
+
+    def _on_dismissed(self, source, selector: str):
+        self.dismissals[selector] += 1
+        logger.debug(f"[POPUP] Cerrado {selector} en {source.get('page').url if source.get('page') else '?'}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"total": sum(self.dismissals.values()), **self.dismissals}
@@ -0,0 +1,183 @@
+"""
+Normalización de los precios scrapeados ("MXN 1,200", "$1.250,50", ...) a
+importe numérico y moneda, vectorizada con pandas.
+
+hotel_propio guarda price_amount y price_currency junto al texto original
+en cada fila de hotel_usuario, así /api/hotel-prices solo proyecta y
+promedia. Las columnas las crea la migración
+supabase/migrations/20261018000000_hotel_usuario_price_columns.sql; hasta
+que se aplique, price_columns_available() da False y las filas se escriben
+y leen solo con el texto. Las filas anteriores se completan con:
+
+    python -m python_scripts.price_utils backfill [--user USER_ID]
+
+Separadores: si aparecen coma y punto, el último es el decimal; si solo
+aparece uno, es de miles cuando forma grupos de tres cifras ("1,200",
+"1.250.000") y decimal en otro caso ("1,5"). Los importes <= 0 o ilegibles
+quedan como nulos.
+"""
+import logging
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    from .config import PRICE_CONFIG
+except ImportError:
+    from config import PRICE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMNS = ("price_amount", "price_currency")
+
+SYMBOL_CURRENCY = {"€": "EUR", "£": "GBP"}
+
+_columns_available: Optional[bool] = None
+
+
+def normalize_prices(values: Iterable[Any]) -> pd.DataFrame:
+    """DataFrame con price_amount (float, NaN si no hay importe) y price_currency, en el orden de values"""
+    text = pd.Series(list(values), dtype="object").astype("string").str.strip()
+    code = text.str.extract(r"\b([A-Z]{3})\b", expand=False)
+    symbol = text.str.extract(r"([$€£])", expand=False)
+    # "$" sin código: la moneda por defecto del sitio (Booking muestra MXN)
+    symbol_currency = symbol.map(lambda s: SYMBOL_CURRENCY.get(s, PRICE_CONFIG["default_currency"]),
+                                 na_action="ignore")
+    currency = code.fillna(symbol_currency)
+
+    number = (
+        text.str.extract(r"(\d[\d.,\s]*)", expand=False)
+        .str.replace(r"\s", "", regex=True)
+        .str.rstrip(".,")
+    )
+    has_dot = number.str.contains(".", regex=False)
+    has_comma = number.str.contains(",", regex=False)
+    grouped_comma = number.str.fullmatch(r"\d{1,3}(?:,\d{3})+")
+    grouped_dot = number.str.fullmatch(r"\d{1,3}(?:\.\d{3})+")
+    comma_decimal = has_comma & (
+        (has_dot & (number.str.rfind(",") > number.str.rfind(".")))
+        | (~has_dot & ~grouped_comma)
+    )
+    cleaned = number.where(
+        ~comma_decimal.fillna(False),
+        number.str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+    )
+    cleaned = cleaned.where(comma_decimal.fillna(False), cleaned.str.replace(",", "", regex=False))
+    cleaned = cleaned.where(~grouped_dot.fillna(False), cleaned.str.replace(".", "", regex=False))
+    amount = pd.to_numeric(cleaned, errors="coerce").astype("float64")
+    amount = amount.where(amount > 0)
+
+    currency = currency.where(amount.notna())
+    return pd.DataFrame({"price_amount": amount, "price_currency": currency.astype("object")})
+
+
+def parse_price(value: Any) -> Tuple[Optional[float], Optional[str]]:
+    """(importe, moneda) de un solo precio; (None, None) si no se puede leer"""
+    row = normalize_prices([value]).iloc[0]
+    if pd.isna(row["price_amount"]):
+        return None, None
+    return float(row["price_amount"]), row["price_currency"]
+
+
+def add_price_columns(rows: List[Dict[str, Any]], field: str = "price") -> List[Dict[str, Any]]:
+    """Añade price_amount y price_currency a cada fila (en el sitio) a partir de row[field]"""
+    if not rows:
+        return rows
+    normalized = normalize_prices(row.get(field) for row in rows)
+    amounts = normalized["price_amount"].tolist()
+    currencies = normalized["price_currency"].tolist()
+    for row, amount, currency in zip(rows, amounts, currencies):
+        valid = not pd.isna(amount)
+        row["price_amount"] = float(amount) if valid else None
+        row["price_currency"] = currency if valid and not pd.isna(currency) else None
+    return rows
+
+
+def price_columns_available(db) -> bool:
+    """
+    Si hotel_usuario ya tiene price_amount y price_currency (se consulta una
+    vez por proceso). Ante un error de red da False sin recordarlo: escribir
+    sin las columnas siempre es válido y el backfill las completa después.
+    """
+    global _columns_available
+    if _columns_available is not None:
+        return _columns_available
+    try:
+        from .supabase_rest import SupabaseError
+    except ImportError:
+        from supabase_rest import SupabaseError
+    try:
+        db.select("hotel_usuario", columns=",".join(PRICE_COLUMNS), limit=0)
+        _columns_available = True
+    except SupabaseError as e:
+        if e.status is None or e.status >= 500:
+            logger.warning(f"[PRICES] No se pudo comprobar las columnas de precio ({e}); se omiten")
+            return False
+        logger.warning(f"[PRICES] hotel_usuario sin {'/'.join(PRICE_COLUMNS)} ({e.status}): "
+                       f"aplica la migración de supabase/migrations; se guarda solo el texto")
+        _columns_available = False
+    return _columns_available
+
+
+def backfill_price_columns(user_id: str = None, batch_size: int = None) -> Dict[str, int]:
+    """
+    Completa price_amount/price_currency de las filas de hotel_usuario que no
+    los tienen. Recorre por id (keyset) para no volver sobre filas ilegibles y
+    reescribe cada lote con upsert por id. Usa la service key (SUPABASE_KEY).
+    """
+    import asyncio
+    try:
+        from .supabase_rest import get_supabase_rest
+    except ImportError:
+        from supabase_rest import get_supabase_rest
+
+    db = get_supabase_rest("SUPABASE_KEY")
+    batch_size = batch_size or PRICE_CONFIG["backfill_batch"]
+    totals = {"scanned": 0, "parsed": 0, "unparsed": 0, "written": 0, "failed": 0}
+    filters = {"price_amount": "is.null"}
+    if user_id:
+        filters["user_id"] = f"eq.{user_id}"
+    after = None
+    while True:
+        rows, after = db.select_page("hotel_usuario", filters, after=after, limit=batch_size)
+        totals["scanned"] += len(rows)
+        parsed = [row for row in add_price_columns(rows) if row["price_amount"] is not None]
+        totals["parsed"] += len(parsed)
+        totals["unparsed"] += len(rows) - len(parsed)
+        if parsed:
+            writer = db.bulk_writer("hotel_usuario", on_conflict="id", prefer="resolution=merge-duplicates",
+                                    row_key=lambda row: row["id"])
+            summary = asyncio.run(writer.write(parsed))
+            totals["written"] += summary["inserted"]
+            totals["failed"] += summary["failed"]
+        logger.info(f"[PRICES] Backfill: {totals}")
+        if after is None:
+            break
+    return totals
+
+
+def main(argv: List[str] = None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Normalización de precios de hotel_usuario")
+    sub = parser.add_subparsers(dest="command", required=True)
+    backfill = sub.add_parser("backfill", help="Completa price_amount/price_currency de las filas existentes")
+    backfill.add_argument("--user", help="Solo las filas de este user_id")
+    backfill.add_argument("--batch", type=int, help="Filas por lote")
+    parse = sub.add_parser("parse", help="Muestra cómo se normalizan los precios dados")
+    parse.add_argument("prices", nargs="+")
+    args = parser.parse_args(argv)
+    if args.command == "parse":
+        print(normalize_prices(args.prices).assign(price=args.prices).to_string(index=False))
+        return
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    totals = backfill_price_columns(args.user, args.batch)
+    print(totals)
+    if totals["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
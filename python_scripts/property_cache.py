@@ -0,0 +1,120 @@
+"""
+Caché persistente nombre de hotel -> URL de la propiedad en Booking.
+
+La clave es nombre normalizado | ciudad | locale | moneda y el valor la URL
+de detalle (sin parámetros de sesión) con la fecha en que se resolvió. Vive
+en un archivo JSON compartido por todos los usuarios; una entrada vencida
+(TTL) o que ya no muestra la tabla de habitaciones se vuelve a resolver con
+la búsqueda completa.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+try:
+    from .config import PROPERTY_CACHE_CONFIG
+except ImportError:
+    from config import PROPERTY_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Parámetros de la URL de detalle que se conservan; el resto son de sesión o tracking
+KEEP_PARAMS = {
+    "lang", "selected_currency", "checkin", "checkout", "group_adults", "group_children",
+    "no_rooms", "req_adults", "req_children", "dest_id", "dest_type",
+}
+
+
+def normalize_hotel_name(name: str) -> str:
+    """Minúsculas, sin acentos ni signos y con espacios simples"""
+    name = unicodedata.normalize("NFKD", name or "")
+    name = "".join(c for c in name if not unicodedata.combining(c)).lower()
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", name)).strip()
+
+
+def clean_property_url(url: str, currency: str = "") -> str:
+    """Quita de la URL los parámetros de sesión y tracking y fija la moneda"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k in KEEP_PARAMS]
+    if currency and not any(k == "selected_currency" for k, _ in query):
+        query.append(("selected_currency", currency.upper()))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def with_dates(url: str, checkin: str, checkout: str) -> str:
+    """Devuelve la URL con las fechas indicadas (añadiéndolas si no están)"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in ("checkin", "checkout")]
+    query += [("checkin", checkin), ("checkout", checkout)]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+class PropertyUrlCache:
+    """Caché en archivo JSON con TTL; segura entre hilos del mismo proceso"""
+
+    def __init__(self, path: str = None, ttl_seconds: int = None):
+        self.path = path or PROPERTY_CACHE_CONFIG["path"]
+        self.ttl_seconds = ttl_seconds or PROPERTY_CACHE_CONFIG["ttl_seconds"]
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+
+    @staticmethod
+    def key(hotel_name: str, city: str = "", locale: str = "", currency: str = "") -> str:
+        return "|".join([normalize_hotel_name(hotel_name), normalize_hotel_name(city), locale.lower(), currency.upper()])
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, hotel_name: str, city: str = "", locale: str = "", currency: str = "") -> Optional[str]:
+        """URL cacheada o None si no existe o venció"""
+        key = self.key(hotel_name, city, locale, currency)
+        with self._lock:
+            entry = self._load().get(key)
+        if not entry:
+            return None
+        if time.time() - entry.get("resolved_at", 0) > self.ttl_seconds:
+            logger.info(f"[CACHE] URL de '{hotel_name}' vencida, se resolverá de nuevo")
+            return None
+        return entry["url"]
+
+    def put(self, hotel_name: str, url: str, city: str = "", locale: str = "", currency: str = ""):
+        key = self.key(hotel_name, city, locale, currency)
+        with self._lock:
+            self._load()[key] = {"url": clean_property_url(url, currency), "hotel_name": hotel_name, "resolved_at": time.time()}
+            self._save()
+
+    def invalidate(self, hotel_name: str, city: str = "", locale: str = "", currency: str = ""):
+        key = self.key(hotel_name, city, locale, currency)
+        with self._lock:
+            if self._load().pop(key, None) is not None:
+                self._save()
+
+
+_cache: Optional[PropertyUrlCache] = None
+
+
+def get_property_cache() -> PropertyUrlCache:
+    """Caché compartida del proceso"""
+    global _cache
+    if _cache is None:
+        _cache = PropertyUrlCache()
+    return _cache
@@ -0,0 +1,126 @@
+"""
+Bloqueo de recursos de red para los contextos de scraping.
+
+Se instala con context.route en cada BrowserContext del pool y aborta
+imágenes, fuentes, medios, publicidad/analítica y scripts de terceros según
+RESOURCE_BLOCKING_CONFIG. Lleva contadores de peticiones bloqueadas y de
+peticiones/bytes permitidos (los bytes de lo bloqueado no se conocen porque
+nunca se descargan).
+"""
+import logging
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+try:
+    from .config import RESOURCE_BLOCKING_CONFIG
+except ImportError:
+    from config import RESOURCE_BLOCKING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def _host(url: str) -> str:
+    try:
+        return (urlsplit(url).hostname or "").lower()
+    except ValueError:
+        return ""
+
+
+def _site(host: str) -> str:
+    """Dominio registrable aproximado (últimas dos etiquetas)"""
+    return ".".join(host.split(".")[-2:])
+
+
+def _matches(host: str, domains: Iterable[str]) -> bool:
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+class BlockingStats:
+    """Contadores de un contexto (o acumulados del pool)"""
+
+    def __init__(self):
+        self.blocked = Counter()        # motivo -> peticiones
+        self.allowed_requests = 0
+        self.allowed_bytes = 0
+
+    def merge(self, other: "BlockingStats"):
+        self.blocked.update(other.blocked)
+        self.allowed_requests += other.allowed_requests
+        self.allowed_bytes += other.allowed_bytes
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "blocked_requests": sum(self.blocked.values()),
+            "blocked_by_reason": dict(self.blocked),
+            "allowed_requests": self.allowed_requests,
+            "allowed_bytes": self.allowed_bytes,
+        }
+
+
+class ResourceBlocker:
+    """Reglas de bloqueo por tipo de recurso y dominio"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = {**RESOURCE_BLOCKING_CONFIG, **(config or {})}
+        self.block_types = set(self.config["block_resource_types"])
+        self.allow_domains = list(self.config["allow_domains"])
+        self.deny_domains = list(self.config["deny_domains"])
+        self.totals = BlockingStats()
+
+    @property
+    def enabled(self) -> bool:
+        return self.config["enabled"]
+
+    def reason_to_block(self, url: str, resource_type: str, page_url: str = "") -> Optional[str]:
+        """Devuelve el motivo de bloqueo de la petición o None si se permite"""
+        host = _host(url)
+        if not host:
+            return None  # data:, blob:, about:
+        if _matches(host, self.deny_domains):
+            return "domain"
+        if resource_type in self.block_types:
+            return resource_type
+        if resource_type == "script" and self.config["block_third_party_scripts"]:
+            page_host = _host(page_url)
+            if page_host and _site(host) != _site(page_host) and not _matches(host, self.allow_domains):
+                return "third_party_script"
+        return None
+
+    async def attach(self, context) -> BlockingStats:
+        """Instala las reglas en el contexto y devuelve sus contadores"""
+        stats = BlockingStats()
+        if not self.enabled:
+            return stats
+
+        async def handle(route, request):
+            try:
+                page_url = request.frame.page.url
+            except Exception:
+                page_url = ""
+            reason = self.reason_to_block(request.url, request.resource_type, page_url)
+            if reason:
+                stats.blocked[reason] += 1
+                await route.abort("blockedbyclient")
+            else:
+                await route.continue_()
+
+        def on_response(response):
+            stats.allowed_requests += 1
+            try:
+                stats.allowed_bytes += int(response.headers.get("content-length", 0))
+            except (TypeError, ValueError):
+                pass
+
+        await context.route("**/*", handle)
+        context.on("response", on_response)
+        return stats
+
+    def record(self, stats: BlockingStats):
+        """Acumula los contadores de un contexto cerrado y los registra"""
+        self.totals.merge(stats)
+        summary = stats.as_dict()
+        logger.info(
+            f"[BLOCK] {summary['blocked_requests']} peticiones bloqueadas {summary['blocked_by_reason']}, "
+            f"{summary['allowed_requests']} permitidas ({summary['allowed_bytes'] / 1024:.0f} KB)"
+        )
@@ -0,0 +1,124 @@
+"""
+Caché en memoria de las respuestas del dashboard por usuario.
+
+Cada entrada se guarda bajo (espacio, usuario, parámetros), p. ej.
+("hotels", user_id, ()), y caduca a los RESPONSE_CACHE_CONFIG["ttl_seconds"].
+La caché admite como mucho max_entries entradas y al llenarse expulsa la
+usada hace más tiempo (LRU). Las rutas que escriben datos de un usuario
+(crear hotel o evento, terminar un scraping) invalidan sus entradas; una
+carga que empezó antes de la invalidación no guarda su resultado. Los
+contadores de aciertos y fallos por espacio se exponen con stats().
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+try:
+    from .config import RESPONSE_CACHE_CONFIG
+except ImportError:
+    from config import RESPONSE_CACHE_CONFIG
+
+CacheKey = Tuple[str, str, Hashable]
+
+
+class ResponseCache:
+    """Caché TTL + LRU de respuestas por (espacio, usuario, parámetros)"""
+
+    def __init__(self, ttl_seconds: float = None, max_entries: int = None, enabled: bool = None):
+        self.ttl_seconds = RESPONSE_CACHE_CONFIG["ttl_seconds"] if ttl_seconds is None else ttl_seconds
+        self.max_entries = max_entries or RESPONSE_CACHE_CONFIG["max_entries"]
+        self.enabled = RESPONSE_CACHE_CONFIG["enabled"] if enabled is None else enabled
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+        # Generaciones: suben con invalidate (por usuario) y clear (todas)
+        self._generation = 0
+        self._user_generations: Dict[str, int] = {}
+
+    def _count(self, namespace: str, counter: str):
+        counters = self._counters.setdefault(namespace, {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0})
+        counters[counter] += 1
+
+    def get(self, namespace: str, user_id: str, params: Hashable = ()) -> Tuple[bool, Any]:
+        """(encontrado, valor) de la entrada si no ha caducado"""
+        key = (namespace, user_id, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._count(namespace, "hits")
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self._count(namespace, "misses")
+            return False, None
+
+    def set(self, namespace: str, user_id: str, value: Any, params: Hashable = ()):
+        with self._lock:
+            self._store((namespace, user_id, params), value)
+
+    def _store(self, key: CacheKey, value: Any):
+        """Guarda la entrada y expulsa las más antiguas (llamar con el lock)"""
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._count(evicted[0], "evictions")
+
+    def _generation_of(self, user_id: str) -> Tuple[int, int]:
+        return self._generation, self._user_generations.get(user_id, 0)
+
+    def get_or_load(self, namespace: str, user_id: str, loader: Callable[[], Any], params: Hashable = ()) -> Any:
+        """
+        Valor cacheado o el resultado de loader(), que se guarda salvo que el
+        usuario se haya invalidado mientras cargaba (el dato ya estaría
+        viejo). Si loader lanza una excepción no se guarda nada.
+        """
+        if not self.enabled:
+            return loader()
+        found, value = self.get(namespace, user_id, params)
+        if found:
+            return value
+        with self._lock:
+            generation = self._generation_of(user_id)
+        value = loader()
+        with self._lock:
+            if self._generation_of(user_id) == generation:
+                self._store((namespace, user_id, params), value)
+        return value
+
+    def invalidate(self, user_id: str, namespaces: Optional[Iterable[str]] = None) -> int:
+        """Borra las entradas del usuario (de los espacios dados, o de todos); devuelve cuántas"""
+        namespaces = set(namespaces) if namespaces is not None else None
+        with self._lock:
+            self._user_generations[user_id] = self._user_generations.get(user_id, 0) + 1
+            keys = [key for key in self._entries
+                    if key[1] == user_id and (namespaces is None or key[0] in namespaces)]
+            for key in keys:
+                del self._entries[key]
+                self._count(key[0], "invalidations")
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._user_generations.clear()
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {namespace: dict(values) for namespace, values in self._counters.items()}
+            entries = len(self._entries)
+        hits = sum(c["hits"] for c in counters.values())
+        misses = sum(c["misses"] for c in counters.values())
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else None,
+            "by_namespace": counters,
+        }
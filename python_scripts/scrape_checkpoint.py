@@ -0,0 +1,83 @@
+"""
+Checkpoint local de fechas ya guardadas por usuario y hotel.
+
+Cada ejecución del día escribe en un archivo JSONL (una línea por fecha
+confirmada en Supabase). Si la ejecución se corta por timeout o cancelación,
+la siguiente del mismo día lee el archivo y solo scrapea las fechas que
+faltan. El archivo se borra cuando se completa todo el horizonte.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, Set
+
+try:
+    from .config import CHECKPOINT_CONFIG
+    from .property_cache import normalize_hotel_name
+except ImportError:
+    from config import CHECKPOINT_CONFIG
+    from property_cache import normalize_hotel_name
+
+logger = logging.getLogger(__name__)
+
+
+class ScrapeCheckpoint:
+    """Fechas completadas de un (usuario, hotel) en el día de scrape"""
+
+    def __init__(self, user_id: str, hotel_name: str, scrape_date: str = None, directory: str = None):
+        self.directory = directory or CHECKPOINT_CONFIG["directory"]
+        scrape_date = scrape_date or datetime.today().strftime("%Y-%m-%d")
+        digest = hashlib.sha1(f"{user_id}|{normalize_hotel_name(hotel_name)}".encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(self.directory, f"{scrape_date}_{digest}.jsonl")
+        self._lock = threading.Lock()
+        prune_checkpoints(self.directory)
+
+    def completed_dates(self) -> Set[str]:
+        dates = set()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        dates.add(json.loads(line)["date"])
+                    except (ValueError, KeyError):
+                        continue  # línea cortada por una terminación abrupta
+        except OSError:
+            pass
+        return dates
+
+    def mark(self, dates: Iterable[str]):
+        """Registra fechas confirmadas (append + flush para sobrevivir a un kill)"""
+        dates = list(dates)
+        if not dates:
+            return
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                for date in dates:
+                    f.write(json.dumps({"date": date, "at": time.time()}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def clear(self):
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def prune_checkpoints(directory: str, keep_days: int = None):
+    """Borra checkpoints de días anteriores que ya no se van a reanudar"""
+    keep_days = CHECKPOINT_CONFIG["keep_days"] if keep_days is None else keep_days
+    cutoff = time.time() - keep_days * 86400
+    try:
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(".jsonl") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+    except OSError:
+        pass
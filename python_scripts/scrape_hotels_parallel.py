@@ -1,19 +1,40 @@
 import asyncio
 import os
 import re
-import sys
-import json
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from supabase import create_client
-from playwright.async_api import async_playwright
 import uuid
-import requests
 import random
 import logging
 from typing import List, Dict, Any, Optional
 from tenacity import retry, stop_after_attempt, wait_fixed
 
+try:
+    from .booking_extract import extract_room_table
+    from .booking_payloads import PayloadCapture
+    from .browser_pool import browser_context, shutdown_browser_pools
+    from .supabase_rest import get_supabase_rest
+    from .config import HTTP_FASTPATH_CONFIG, PAYLOAD_CONFIG, RECYCLE_CONFIG, SEARCH_RESULTS_CONFIG
+    from .http_fastpath import fetch_rooms_over_http
+    from .page_recycler import MemoryReport, PageRecycler
+    from .property_cache import clean_property_url
+    from .search_results import card_rooms, discover_hotels, walk_search_results
+    from .work_queue import PageWorkerQueue, RetryItem, run_page_workers
+    from .page_ready import goto, politeness_delay, wait_for_any, wait_for_room_table
+except ImportError:
+    from booking_extract import extract_room_table
+    from booking_payloads import PayloadCapture
+    from browser_pool import browser_context, shutdown_browser_pools
+    from supabase_rest import get_supabase_rest
+    from config import HTTP_FASTPATH_CONFIG, PAYLOAD_CONFIG, RECYCLE_CONFIG, SEARCH_RESULTS_CONFIG
+    from http_fastpath import fetch_rooms_over_http
+    from page_recycler import MemoryReport, PageRecycler
+    from property_cache import clean_property_url
+    from search_results import card_rooms, discover_hotels, walk_search_results
+    from work_queue import PageWorkerQueue, RetryItem, run_page_workers
+    from page_ready import goto, politeness_delay, wait_for_any, wait_for_room_table
+
 load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
@@ -66,31 +87,10 @@ def get_random_user_agent():
 # =============================
 @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
 async def safe_goto(page, url: str):
-    await page.goto(url)
+    await goto(page, url)
 
-async def scrape_hotel_details(page, hotel_url: str, dias: int = 15) -> Dict[str, Any]:
-    """
-    Extrae la información de un hotel:
-    - Nombre: h2[data-testid="title"] o h2
-    - Estrellas: button[data-testid="quality-rating"] (aria-label, ej: "4 estrellas de 5")
-    - Ubicación: [data-testid="address"]
-    - Tipos de cuarto y precios: tabla #hprt-table, para los próximos 'dias' días
-    """
-    await safe_goto(page, hotel_url)
-    await page.wait_for_timeout(1000)
-    # --- Nombre del hotel ---
-    nombre = ""
-    try:
-        # Selector principal de nombre
-        nombre = await page.inner_text('h2[data-testid="title"]')
-    except Exception:
-        try:
-            # Fallback: cualquier h2
-            nombre = await page.inner_text('h2')
-        except Exception:
-            nombre = ""
-    # --- Estrellas del hotel ---
-    estrellas = None  # IMPORTANTE: Solo se asigna aquí, no se debe reasignar después
+async def _stars_from_dom(page, hotel_url: str) -> Optional[int]:
+    """Estrellas desde el botón quality-rating (aria-label, ej: "4 de 5 estrellas")"""
     try:
         # Espera a que el botón de estrellas esté visible
         await page.wait_for_selector('button[data-testid="quality-rating"]', timeout=5000, state='visible')
@@ -102,20 +102,19 @@ async def scrape_hotel_details(page, hotel_url: str, dias: int = 15) -> Dict[str
                 logger.info(f"[Estrellas] aria-label encontrado: {estrellas_label} en {hotel_url}")
                 match = re.search(r"(\d+) de 5 estrellas", estrellas_label or "")
                 if match:
-                    estrellas = int(match.group(1))
-                else:
-                    estrellas = None
+                    return int(match.group(1))
             else:
                 logger.warning(f"No se encontró el span de estrellas dentro del botón en {hotel_url}")
         else:
             logger.warning(f"No se encontró el botón de estrellas en {hotel_url}")
     except Exception as e:
         logger.warning(f"No se pudieron extraer las estrellas: {e} en {hotel_url}")
-        estrellas = None
-    # --- Ubicación del hotel ---
-    ubicacion = ""
+    return None
+
+async def _address_from_dom(page) -> str:
+    """Ubicación desde [data-testid="address"] o el primer div de button.de576f5064"""
     try:
-        ubicacion = await page.inner_text('[data-testid="address"]')
+        return await page.inner_text('[data-testid="address"]')
     except Exception:
         # Fallback: buscar el primer div hijo de button.de576f5064
         try:
@@ -123,199 +122,367 @@ async def scrape_hotel_details(page, hotel_url: str, dias: int = 15) -> Dict[str
             if button:
                 divs = await button.query_selector_all('div')
                 if divs:
-                    ubicacion = (await divs[0].inner_text()).strip()
+                    return (await divs[0].inner_text()).strip()
         except Exception:
-            ubicacion = ""
-    # --- Tipos de cuarto y precios por día ---
-    today = datetime.today()
-    rooms_by_date = {}
-    # NOTA: No reasignar 'estrellas' dentro de este bucle ni después
-    for offset in range(dias):
-        checkin = (today + timedelta(days=offset)).strftime("%Y-%m-%d")
-        checkout = (today + timedelta(days=offset+1)).strftime("%Y-%m-%d")
-        # Modifica la URL con las nuevas fechas
-        new_url = re.sub(r"checkin=\d{4}-\d{2}-\d{2}", f"checkin={checkin}", hotel_url)
-        new_url = re.sub(r"checkout=\d{4}-\d{2}-\d{2}", f"checkout={checkout}", new_url)
-        await safe_goto(page, new_url)
-        await asyncio.sleep(1.5)
+            pass
+    return ""
+
+async def scrape_hotel_metadata(page, hotel_url: str, capture: Optional[PayloadCapture] = None) -> Dict[str, Any]:
+    """
+    Carga la página del hotel y extrae sus datos fijos:
+    - Nombre: h2[data-testid="title"] o h2
+    - Estrellas: button[data-testid="quality-rating"] (aria-label, ej: "4 estrellas de 5")
+    - Ubicación: [data-testid="address"]
+
+    Con capture, primero se leen los JSON que descarga la página (JSON-LD y
+    XHR); el DOM solo se consulta para lo que falte.
+    """
+    await safe_goto(page, hotel_url)
+    payload = {"nombre": None, "estrellas": None, "ubicacion": None}
+    if capture:
+        await capture.settle()
+        payload = capture.hotel_details()
+        logger.info(f"[PAYLOAD] Datos desde JSON en {hotel_url}: {payload}")
+    # --- Nombre del hotel ---
+    nombre = payload["nombre"] or ""
+    if not nombre:
+        await wait_for_any(page, ['h2[data-testid="title"]', "h2"])
         try:
-            # Espera a que la tabla de habitaciones esté visible
-            await page.wait_for_selector("#hprt-table", timeout=50000, state='visible')
+            # Selector principal de nombre
+            nombre = await page.inner_text('h2[data-testid="title"]')
         except Exception:
-            continue
-        rows = await page.query_selector_all("#hprt-table tr")
-        day_rooms = []
-        for row in rows:
             try:
-                # Tipo de cuarto: th span.hprt-roomtype-icon-link
-                room_type_el = await row.query_selector("th span.hprt-roomtype-icon-link")
-                price_el = None
-                tds = await row.query_selector_all("td")
-                for td in tds:
-                    # Precio: span.js-average-per-night-price o span.prc-no-css
-                    price_candidate = await td.query_selector("span.js-average-per-night-price")
-                    if not price_candidate:
-                        price_candidate = await td.query_selector("span.prc-no-css")
-                    if not price_candidate:
-                        price_candidate = await td.query_selector("div.bui-price-display__value span.prco-valign-middle-helper")
-                    if price_candidate:
-                        price_el = price_candidate
-                        break
-                if room_type_el and price_el:
-                    room_text = (await room_type_el.inner_text()).strip()
-                    price_text = (await price_el.inner_text()).strip()
-                    # Guarda el tipo de cuarto y el precio como texto
-                    day_rooms.append({"room_type": room_text, "price": price_text})
+                # Fallback: cualquier h2
+                nombre = await page.inner_text('h2')
             except Exception:
-                continue
-        if day_rooms:
-            rooms_by_date[checkin] = day_rooms
-        else:
-            logger.warning(f"No se encontraron cuartos para {checkin} en {hotel_url}")
-            table = await page.query_selector("#hprt-table")
-            if table:
-                table_html = await table.inner_html()
-                with open(f"debug_table_{checkin}.html", "w", encoding="utf-8") as f:
-                    f.write(table_html)
-                logger.info(f"HTML de la tabla guardado en debug_table_{checkin}.html")
-            else:
-                page_html = await page.content()
-                with open(f"debug_page_{checkin}.html", "w", encoding="utf-8") as f:
-                    f.write(page_html)
-                logger.info(f"HTML de la página guardado en debug_page_{checkin}.html")
-    # Devuelve toda la info estructurada
+                nombre = ""
+    # --- Estrellas del hotel ---
+    estrellas = payload["estrellas"]  # IMPORTANTE: Solo se asigna aquí, no se debe reasignar después
+    if estrellas is None:
+        estrellas = await _stars_from_dom(page, hotel_url)
+    # --- Ubicación del hotel ---
+    ubicacion = payload["ubicacion"] or ""
+    if not ubicacion:
+        ubicacion = await _address_from_dom(page)
     return {
         "nombre": nombre,           # Nombre del hotel
         "estrellas": estrellas,     # Número de estrellas (int)
         "url": hotel_url,           # URL del hotel
         "ubicacion": ubicacion,     # Dirección/ubicación
-        "fecha_scrape": today.strftime("%Y-%m-%d"),
-        "rooms_jsonb": rooms_by_date # Diccionario: fecha -> lista de cuartos/precios
+        "fecha_scrape": datetime.today().strftime("%Y-%m-%d"),
     }
 
+def hotel_date_tasks(hotel_url: str, dias: int) -> List[Dict[str, Any]]:
+    """Una tarea (hotel, fecha) por cada uno de los próximos 'dias' días"""
+    today = datetime.today()
+    tasks = []
+    for offset in range(dias):
+        checkin = (today + timedelta(days=offset)).strftime("%Y-%m-%d")
+        checkout = (today + timedelta(days=offset+1)).strftime("%Y-%m-%d")
+        # Modifica la URL con las nuevas fechas
+        new_url = re.sub(r"checkin=\d{4}-\d{2}-\d{2}", f"checkin={checkin}", hotel_url)
+        new_url = re.sub(r"checkout=\d{4}-\d{2}-\d{2}", f"checkout={checkout}", new_url)
+        tasks.append({"key": f"{hotel_url}|{checkin}", "hotel_url": hotel_url, "date": checkin, "url": new_url})
+    return tasks
+
+async def scrape_hotel_date(page, task: Dict[str, Any], capture: Optional[PayloadCapture] = None) -> List[Dict[str, Any]]:
+    """
+    Tipos de cuarto y precios de una fecha (tabla #hprt-table o bloques JSON).
+    Lanza RetryItem si la tabla no llega a mostrar precios.
+    """
+    checkin, hotel_url = task["date"], task["hotel_url"]
+    if capture:
+        capture.reset()
+    await safe_goto(page, task["url"])
+    # Los bloques de habitación del JSON evitan esperar a que se renderice la tabla
+    if capture:
+        await capture.settle()
+        json_rooms = capture.rooms()
+        if json_rooms:
+            return json_rooms
+    # Espera a que la tabla de habitaciones tenga filas con precio
+    if not await wait_for_room_table(page, ["#hprt-table"], timeout=50000):
+        raise RetryItem(f"La tabla de {checkin} no apareció en {hotel_url}")
+    # Toda la tabla (tipo, precio, moneda, ocupación y condiciones) en un solo evaluate
+    try:
+        extracted = await extract_room_table(page, table_selectors=["#hprt-table"])
+        day_rooms = extracted["rooms"]
+    except Exception as e:
+        logger.warning(f"Error extrayendo la tabla de {checkin} en {hotel_url}: {e}")
+        day_rooms = []
+    if not day_rooms:
+        logger.warning(f"No se encontraron cuartos para {checkin} en {hotel_url}")
+        table = await page.query_selector("#hprt-table")
+        if table:
+            table_html = await table.inner_html()
+            with open(f"debug_table_{checkin}.html", "w", encoding="utf-8") as f:
+                f.write(table_html)
+            logger.info(f"HTML de la tabla guardado en debug_table_{checkin}.html")
+        else:
+            page_html = await page.content()
+            with open(f"debug_page_{checkin}.html", "w", encoding="utf-8") as f:
+                f.write(page_html)
+            logger.info(f"HTML de la página guardado en debug_page_{checkin}.html")
+    return day_rooms
+
 # =============================
 # Scraping de la lista de hoteles y procesamiento paralelo
 # =============================
-async def scrape_hotels_parallel(ciudad: str, dias: int = 15, headless: bool = False, concurrencia: int = 10) -> List[Dict[str, Any]]:
+async def scrape_hotels_parallel(ciudad: str, dias: int = 15, headless: bool = False,
+                                 concurrencia: Optional[int] = None,
+                                 metadata_workers: int = 3) -> List[Dict[str, Any]]:
     """
-    Busca hoteles en la ciudad dada, abre cada uno en paralelo y extrae su información.
+    Busca hoteles en la ciudad dada (todas las páginas de resultados) y extrae
+    su información con una cola global de tareas (hotel, fecha):
+    - los datos fijos de cada hotel se leen una sola vez ('metadata_workers' a la vez)
+    - sus fechas entran a una cola compartida que atienden 'concurrencia' páginas
+    Las páginas de resultados, las de metadata y las de fechas corren a la vez y
+    comparten el tope de renderers (RECYCLE_CONFIG["max_renderers"]): el tope se
+    reparte entre las tres y 'concurrencia' es como máximo lo que queda para fechas.
+    - rooms_jsonb se arma por hotel cuando terminan todas sus fechas
     - ciudad: ciudad a buscar (ej: Tijuana)
     - dias: días a scrapear (default 15)
     - headless: modo headless o visible
     """
-    async with async_playwright() as p:
-        launch_args = {
-            "headless": headless,
-            "args": [
-                "--disable-blink-features=AutomationControlled",
-                "--disable-infobars",
-                "--window-size=1920,1080"
-            ]
-        }
-        browser = await p.chromium.launch(**launch_args)
-        # Contexto con user-agent y viewport para camuflaje
-        context = await browser.new_context(
-            viewport={"width": 1920, "height": 1080},
-            user_agent=get_random_user_agent()
-        )
-        page = await context.new_page()
-        # Inyectar script para ocultar webdriver
-        await page.add_init_script("""
-Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-""")
-        # Construir URL de búsqueda de hoteles para la ciudad
+    max_renderers = RECYCLE_CONFIG["max_renderers"]
+    discovery_workers = max(1, min(SEARCH_RESULTS_CONFIG["discovery_concurrency"], max_renderers // 3))
+    metadata_workers = max(1, min(metadata_workers, (max_renderers - discovery_workers) // 2))
+    date_slots = max(1, max_renderers - discovery_workers - metadata_workers)
+    date_workers = min(concurrencia, date_slots) if concurrencia else date_slots
+    if concurrencia and concurrencia > date_slots:
+        logger.warning(f"concurrencia={concurrencia} supera los renderers libres para fechas ({date_slots} de {max_renderers})")
+    logger.info(f"Renderers: {discovery_workers} de resultados, {metadata_workers} de metadata y "
+                f"{date_workers} de fechas (tope {max_renderers})")
+    # Contexto del pool compartido, con user-agent y viewport para camuflaje
+    async with browser_context(
+        headless=headless,
+        viewport={"width": 1920, "height": 1080},
+        user_agent=get_random_user_agent()
+    ) as context:
         today = datetime.today()
         tomorrow = today + timedelta(days=1)
         checkin = today.strftime("%Y-%m-%d")
         checkout = tomorrow.strftime("%Y-%m-%d")
-        url = f"https://www.booking.com/searchresults.html?ss={ciudad}&checkin={checkin}&checkout={checkout}&group_adults=1&no_rooms=1&group_children=0"
-        await page.goto(url)
-        await page.wait_for_timeout(5000)
-        # --- Obtener enlaces de hoteles de la primera página ---
-        hotel_links = []
-        cards = await page.query_selector_all("a[data-testid='property-card-desktop-single-image']")
-        for card in cards:
-            try:
-                href = await card.get_attribute("href")
-                if href:
-                    # Booking links pueden ser relativos
-                    if href.startswith("/"):
-                        href = "https://www.booking.com" + href
-                    # Añadir fechas a la url si no están
-                    if "checkin=" not in href:
-                        href += f"?checkin={checkin}&checkout={checkout}"
-                    hotel_links.append(href)
-            except Exception:
-                continue
-        logger.info(f"Encontrados {len(hotel_links)} hoteles en la primera página de {ciudad}.")
-        # --- Abrir cada hotel en una nueva pestaña y scrapear en paralelo ---
         results = []
-        sem = asyncio.Semaphore(concurrencia)  # Limitar concurrencia configurable USAR 9
         processed_count = 0
-        async def process_hotel(hotel_url: str):
-            hotel_page = None
+        discovered_count = 0
+        memory_report = MemoryReport(f"hoteles {ciudad}")
+        # Hoteles con fechas en curso: url -> {"data", "rooms", "pending"}
+        in_progress: Dict[str, Dict[str, Any]] = {}
+        # Las URLs descubiertas entran a la cola mientras se siguen recorriendo
+        # las páginas de resultados; None indica a un consumidor que termine
+        url_queue: asyncio.Queue = asyncio.Queue()
+
+        async def on_hotel(card: Dict[str, Any]):
+            href = card["url"]
+            # Añadir fechas a la url si no están
+            if "checkin=" not in href:
+                href += ("&" if "?" in href else "?") + f"checkin={checkin}&checkout={checkout}"
+            nonlocal discovered_count
+            discovered_count += 1
+            url_queue.put_nowait(href)
+
+        async def discover():
             try:
-                async with sem:
-                    hotel_page = await context.new_page()
-                    await hotel_page.set_extra_http_headers({"user-agent": get_random_user_agent()})
-                    await hotel_page.add_init_script("""
-Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-""")
-                    data = await scrape_hotel_details(hotel_page, hotel_url, dias=dias)
-                    results.append(data)
-                    nonlocal processed_count
-                    processed_count += 1
-                    logger.info(f"Hoteles procesados: {processed_count}/{len(hotel_links)}")
+                await discover_hotels(context, ciudad, checkin, checkout, on_hotel, concurrency=discovery_workers)
             except Exception as e:
-                logger.error(f"Error en hotel {hotel_url}: {e}")
+                logger.error(f"Error recorriendo los resultados de {ciudad}: {e}")
+            finally:
+                for _ in range(metadata_workers):
+                    url_queue.put_nowait(None)
+
+        async def set_user_agent(hotel_page):
+            await hotel_page.set_extra_http_headers({"user-agent": get_random_user_agent()})
+
+        def finish_hotel(hotel_url: str):
+            state = in_progress.pop(hotel_url)
+            state["data"]["rooms_jsonb"] = dict(sorted(state["rooms"].items()))  # fecha -> lista de cuartos/precios
+            results.append(state["data"])
+            nonlocal processed_count
+            processed_count += 1
+            logger.info(f"Hoteles procesados: {processed_count}/{discovered_count} descubiertos")
+
+        # --- Cola global (hotel, fecha) ---
+        async def process_date(date_page, task: Dict[str, Any]) -> List[Dict[str, Any]]:
+            capture = PayloadCapture(date_page).attach() if PAYLOAD_CONFIG["enabled"] else None
+            try:
+                return await scrape_hotel_date(date_page, task, capture)
+            finally:
+                if capture:
+                    capture.detach()
+
+        async def date_done(task: Dict[str, Any], day_rooms: List[Dict[str, Any]]):
+            state = in_progress[task["hotel_url"]]
+            if day_rooms:
+                state["rooms"][task["date"]] = day_rooms
+            state["pending"] -= 1
+            if state["pending"] == 0:
+                finish_hotel(task["hotel_url"])
+
+        def date_failed(task: Dict[str, Any], error: BaseException) -> List[Dict[str, Any]]:
+            logger.warning(f"Sin cuartos para {task['date']} en {task['hotel_url']}: {error}")
+            return []
+
+        date_queue = PageWorkerQueue(
+            context, process_date,
+            workers=date_workers,
+            on_failure=date_failed,
+            on_result=date_done,
+            between_items=politeness_delay,
+            report=memory_report,
+        )
+
+        # --- Datos fijos de cada hotel (una vez) y camino rápido HTTP de sus fechas ---
+        async def prepare_hotel(hotel_url: str):
+            async with PageRecycler(context, report=memory_report, setup=set_user_agent) as recycler:
+                page = await recycler.get()
+                capture = PayloadCapture(page).attach() if PAYLOAD_CONFIG["enabled"] else None
+                try:
+                    data = await scrape_hotel_metadata(page, hotel_url, capture)
+                finally:
+                    if capture:
+                        capture.detach()
+                date_tasks = hotel_date_tasks(hotel_url, dias)
+                http_rooms = {}
+                if HTTP_FASTPATH_CONFIG["enabled"]:
+                    http_rooms, date_tasks = await fetch_rooms_over_http(page.context, page, date_tasks, ["#hprt-table"])
+            in_progress[hotel_url] = {"data": data, "rooms": dict(http_rooms), "pending": len(date_tasks)}
+            if not date_tasks:
+                finish_hotel(hotel_url)
+            for task in date_tasks:
+                date_queue.put(task)
+
+        async def metadata_consumer():
+            while True:
+                hotel_url = await url_queue.get()
+                if hotel_url is None:
+                    return
+                try:
+                    await prepare_hotel(hotel_url)
+                except Exception as e:
+                    logger.error(f"Error en hotel {hotel_url}: {e}")
+
+        async def feed_date_queue():
+            try:
+                await asyncio.gather(discover(), *(metadata_consumer() for _ in range(metadata_workers)))
             finally:
-                if hotel_page:
-                    try:
-                        await hotel_page.close()
-                    except Exception as close_err:
-                        logger.warning(f"No se pudo cerrar la página de {hotel_url}: {close_err}")
-        # Ejecuta el scraping en paralelo para los primeros 3 hoteles
-        await asyncio.gather(*(process_hotel(url) for url in hotel_links))
-        await browser.close()
+                date_queue.close()
+
+        # Las fechas empiezan a procesarse en cuanto el primer hotel tiene sus datos fijos
+        await asyncio.gather(feed_date_queue(), date_queue.run())
+        logger.info(f"Encontrados {discovered_count} hoteles en {ciudad}.")
+        memory_report.log()
         return results
 
 # =============================
-# Inserción en Supabase
+# Modo "market snapshot": precios de las tarjetas de resultados por fecha
 # =============================
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-def post_hotel(session: requests.Session, url: str, headers: dict, data: dict):
-    r = session.post(url, headers=headers, json=data)
-    return r
+async def scrape_market_snapshot(ciudad: str, dias: int = 15, headless: bool = False, workers: int = None) -> List[Dict[str, Any]]:
+    """
+    Para cada fecha de check-in recorre las páginas de resultados de la ciudad
+    y toma el precio de cada tarjeta: una carga por página de resultados y
+    fecha en lugar de una por hotel y fecha. Devuelve la misma estructura que
+    scrape_hotels_parallel (un registro por hotel con rooms_jsonb por fecha).
+    """
+    today = datetime.today()
+    tasks = [
+        {
+            "key": f"{ciudad}|{(today + timedelta(days=offset)).strftime('%Y-%m-%d')}",
+            "date": (today + timedelta(days=offset)).strftime("%Y-%m-%d"),
+            "checkout": (today + timedelta(days=offset + 1)).strftime("%Y-%m-%d"),
+        }
+        for offset in range(dias)
+    ]
+    async with browser_context(
+        headless=headless,
+        viewport={"width": 1920, "height": 1080},
+        user_agent=get_random_user_agent()
+    ) as context:
+        async def process_date(page, task: dict) -> dict:
+            cards = await walk_search_results(page, ciudad, task["date"], task["checkout"])
+            return {"date": task["date"], "cards": cards}
+
+        def date_failed(task: dict, error: BaseException) -> dict:
+            logger.warning(f"Error leyendo resultados de {task['date']} en {ciudad}: {error}")
+            return {"date": task["date"], "cards": []}
+
+        memory_report = MemoryReport(f"snapshot {ciudad}")
+        per_date = await run_page_workers(
+            context, tasks, process_date,
+            workers=workers or SEARCH_RESULTS_CONFIG["snapshot_workers"],
+            on_failure=date_failed,
+            between_items=politeness_delay,
+            report=memory_report,
+        )
+        memory_report.log()
+
+    # Un registro por hotel con sus precios por fecha (fechas en orden)
+    hotels: Dict[str, Dict[str, Any]] = {}
+    for day in per_date:
+        for card in day["cards"]:
+            hotel = hotels.setdefault(card["hotel_id"], {
+                "nombre": card["nombre"],
+                "estrellas": card["estrellas"],
+                "url": clean_property_url(card["url"]),
+                "ubicacion": card["ubicacion"],
+                "fecha_scrape": today.strftime("%Y-%m-%d"),
+                "rooms_jsonb": {},
+            })
+            rooms = card_rooms(card)
+            if rooms:
+                hotel["rooms_jsonb"][day["date"]] = rooms
+    logger.info(f"[SNAPSHOT] {len(hotels)} hoteles en {ciudad} con {len(tasks)} fechas")
+    return list(hotels.values())
+
+async def run_scrape_hotels_parallel(ciudad: str, **kwargs) -> List[Dict[str, Any]]:
+    """Ejecución por CLI: scrapea y cierra el pool de navegadores al terminar."""
+    try:
+        return await scrape_hotels_parallel(ciudad, **kwargs)
+    finally:
+        await shutdown_browser_pools()
 
-def insert_hotels_supabase(hotels: List[Dict[str, Any]], ciudad: str):
+async def run_scrape_market_snapshot(ciudad: str, **kwargs) -> List[Dict[str, Any]]:
+    """Ejecución por CLI del modo snapshot."""
+    try:
+        return await scrape_market_snapshot(ciudad, **kwargs)
+    finally:
+        await shutdown_browser_pools()
+
+# =============================
+# Inserción en Supabase
+# =============================
+async def insert_hotels_supabase(hotels: List[Dict[str, Any]], ciudad: str) -> Dict[str, Any]:
     """
-    Inserta cada hotel (un registro por hotel) en la tabla hoteles_parallel de Supabase.
+    Upsert de los hoteles (un registro por hotel) en hoteles_parallel con
+    arrays por bloques de tamaño acotado en bytes (BulkWriter). Los bloques se
+    envían en paralelo sobre la misma sesión y uno rechazado se divide hasta
+    aislar los hoteles que fallan.
     """
-    url = f"{SUPABASE_URL}/rest/v1/hoteles_parallel?on_conflict=nombre,ciudad"
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json",
-        "Prefer": "resolution=merge-duplicates"
-    }
-    with requests.Session() as session:
-        for hotel in hotels:
-            data = {
-                "nombre": hotel["nombre"],
-                "estrellas": hotel["estrellas"],
-                "url": hotel["url"],
-                "ubicacion": hotel["ubicacion"],
-                "fecha_scrape": hotel["fecha_scrape"],
-                "rooms_jsonb": hotel["rooms_jsonb"],
-                "ciudad": ciudad
-            }
-            logger.info(f"[INSERT] Se va a guardar hotel: {hotel['nombre']} con estrellas: {hotel['estrellas']} y url: {hotel['url']} en ciudad: {ciudad}")
-            try:
-                r = post_hotel(session, url, headers, data)
-                logger.info(f"Status: {r.status_code}, Response: {r.text}")
-            except Exception as e:
-                logger.error(f"Error upserting: {data}")
-                logger.error(f"Exception: {e}")
+    # Un mismo (nombre, ciudad) dos veces en un bloque haría fallar el upsert: se queda el último
+    rows = {}
+    for hotel in hotels:
+        rows[(hotel["nombre"], ciudad)] = {
+            "nombre": hotel["nombre"],
+            "estrellas": hotel["estrellas"],
+            "url": hotel["url"],
+            "ubicacion": hotel["ubicacion"],
+            "fecha_scrape": hotel["fecha_scrape"],
+            "rooms_jsonb": hotel["rooms_jsonb"],
+            "ciudad": ciudad
+        }
+    logger.info(f"[INSERT] Se van a guardar {len(rows)} hoteles en ciudad: {ciudad}")
+    writer = get_supabase_rest().bulk_writer("hoteles_parallel", on_conflict="nombre,ciudad",
+                                             prefer="resolution=merge-duplicates",
+                                             row_key=lambda row: (row["nombre"], row["ciudad"]))
+    try:
+        summary = await writer.write(list(rows.values()))
+    finally:
+        writer.close()
+    logger.info(f"[INSERT] {summary['inserted']}/{summary['rows']} hoteles guardados en "
+                f"{len(summary['chunks'])} peticiones, {summary['elapsed_ms']} ms")
+    if summary.get("rejected_rows"):
+        logger.error(f"[INSERT] Hoteles rechazados: {summary['rejected_rows']}")
+    return summary
 
 # =============================
 # CLI principal
@@ -325,16 +492,22 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('ciudad', help='Ciudad a buscar (ej. Tijuana)')
     parser.add_argument('--headless', help='Ejecutar en modo headless (true/false)', default='false')
-    parser.add_argument('--concurrencia', help='Número de hoteles a scrapear en paralelo', type=int, default=10)
+    parser.add_argument('--concurrencia', type=int, default=None,
+                        help='Páginas que procesan fechas en paralelo (por defecto, las que permite SCRAPE_MAX_RENDERERS)')
+    parser.add_argument('--modo', help='detalle: página de cada hotel; snapshot: precios de las páginas de resultados',
+                        choices=['detalle', 'snapshot'], default='detalle')
     args = parser.parse_args()
     ciudad = args.ciudad
     headless = args.headless.lower() == 'true'
     concurrencia = args.concurrencia
-    logger.info(f"Scrapeando hoteles en {ciudad} ...")
+    logger.info(f"Scrapeando hoteles en {ciudad} (modo {args.modo}) ...")
     try:
-        hotels = asyncio.run(scrape_hotels_parallel(ciudad, dias=7, headless=headless, concurrencia=concurrencia))
+        if args.modo == 'snapshot':
+            hotels = asyncio.run(run_scrape_market_snapshot(ciudad, dias=7, headless=headless))
+        else:
+            hotels = asyncio.run(run_scrape_hotels_parallel(ciudad, dias=7, headless=headless, concurrencia=concurrencia))
         logger.info(f"Total hoteles scrapeados: {len(hotels)}")
-        insert_hotels_supabase(hotels, ciudad)
+        asyncio.run(insert_hotels_supabase(hotels, ciudad))
         logger.info("¡Listo!")
     except Exception as e:
         logger.error(f"Error general en el scraping: {e}")
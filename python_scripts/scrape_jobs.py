@@ -0,0 +1,307 @@
+"""
+Gestor de trabajos de scraping en segundo plano.
+
+Los endpoints encolan un trabajo y devuelven su ID de inmediato; los pasos
+se ejecutan en un pool acotado de hilos y el estado se consulta por polling.
+Cada paso es una corrutina de los scrapers que se ejecuta en el event loop
+de trabajo compartido; el trabajo solo termina como completado si todos sus
+pasos terminan bien.
+"""
+import sys
+import uuid
+import threading
+import logging
+import contextvars
+import concurrent.futures
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from .config import JOBS_CONFIG
+    from .worker_loop import submit_coroutine
+except ImportError:
+    from config import JOBS_CONFIG
+    from worker_loop import submit_coroutine
+
+logger = logging.getLogger(__name__)
+
+# Estados posibles de un trabajo y de cada script
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMEOUT = "timeout"
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    """Se lanza cuando hay demasiados trabajos pendientes en la cola"""
+
+
+# ─── Captura de salida de los pasos en proceso ────────────────────────────
+# Los scrapers escriben con print(); el paso activo se identifica por contexto
+# (se hereda en las tareas de asyncio y en asyncio.to_thread).
+_current_log: contextvars.ContextVar = contextvars.ContextVar("scrape_job_log", default=None)
+
+
+class _StepOutputRouter:
+    """Envuelve stdout/stderr y copia cada línea al log del paso en curso"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        log = _current_log.get()
+        if log is not None:
+            for line in text.splitlines():
+                if line.strip():
+                    log.append(line)
+        return self._stream.write(text)
+
+    def flush(self):
+        return self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def _install_output_router():
+    if not isinstance(sys.stdout, _StepOutputRouter):
+        sys.stdout = _StepOutputRouter(sys.stdout)
+    if not isinstance(sys.stderr, _StepOutputRouter):
+        sys.stderr = _StepOutputRouter(sys.stderr)
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def _elapsed(start: Optional[str], end: Optional[str]) -> Optional[float]:
+    if not start:
+        return None
+    end_dt = datetime.fromisoformat(end) if end else datetime.utcnow()
+    return round((end_dt - datetime.fromisoformat(start)).total_seconds(), 2)
+
+
+class ScrapeJobManager:
+    """
+    Mantiene los trabajos de scraping en memoria y los ejecuta en un
+    ThreadPoolExecutor de tamaño fijo. Cada trabajo lanza sus pasos en
+    paralelo (como hacía /run-all-scrapings) y guarda la cola de sus logs.
+    """
+
+    def __init__(self, max_workers: int = None, max_queued: int = None,
+                 max_jobs_kept: int = None, log_tail_lines: int = None):
+        self.max_workers = max_workers or JOBS_CONFIG["max_workers"]
+        self.max_queued = max_queued or JOBS_CONFIG["max_queued"]
+        self.max_jobs_kept = max_jobs_kept or JOBS_CONFIG["max_jobs_kept"]
+        self.log_tail_lines = log_tail_lines or JOBS_CONFIG["log_tail_lines"]
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scrape-job")
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._on_complete: List[Callable[[Dict[str, Any]], None]] = []
+        _install_output_router()
+
+    # ─── API pública ──────────────────────────────────────────────────────
+    def on_complete(self, callback: Callable[[Dict[str, Any]], None]):
+        """Registra un callback que recibe el snapshot del trabajo al terminar"""
+        self._on_complete.append(callback)
+        return callback
+
+    def submit(self, user_id: str, scripts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Encola un trabajo para el usuario. Si ya tiene uno pendiente o en
+        ejecución se devuelve ese mismo en lugar de lanzar otro.
+
+        Cada paso es un dict con 'name', 'timeout' (segundos) y 'run'
+        (función sin argumentos que devuelve la corrutina a ejecutar).
+        """
+        with self._lock:
+            for job in reversed(self._jobs.values()):
+                if job["user_id"] == user_id and job["state"] in (QUEUED, RUNNING):
+                    return self._snapshot(job)
+            queued = sum(1 for job in self._jobs.values() if job["state"] == QUEUED)
+            if queued >= self.max_queued:
+                raise JobQueueFull(f"Hay {queued} trabajos en cola, intenta más tarde")
+            job = {
+                "job_id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "state": QUEUED,
+                "created_at": _now(),
+                "started_at": None,
+                "finished_at": None,
+                "scripts": [self._new_step(s) for s in scripts],
+                "_cancel": threading.Event(),
+                "_future": None,
+            }
+            self._jobs[job["job_id"]] = job
+            self._prune()
+            job["_future"] = self._executor.submit(self._run_job, job)
+            return self._snapshot(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancela un trabajo en cola o detiene los pasos de uno en ejecución"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return None
+            if job["state"] in FINISHED_STATES:
+                return self._snapshot(job)
+            job["_cancel"].set()
+            if job["state"] == QUEUED and job["_future"].cancel():
+                job["state"] = CANCELLED
+                job["finished_at"] = _now()
+                for step in job["scripts"]:
+                    step["state"] = CANCELLED
+                callbacks_job = job
+            else:
+                callbacks_job = None
+                for step in job["scripts"]:
+                    if step["_future"] is not None:
+                        step["_future"].cancel()
+            snapshot = self._snapshot(job)
+        if callbacks_job:
+            self._notify(snapshot)
+        return snapshot
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {state: 0 for state in (QUEUED, RUNNING) + FINISHED_STATES}
+            for job in self._jobs.values():
+                counts[job["state"]] += 1
+            return counts
+
+    # ─── Ejecución ────────────────────────────────────────────────────────
+    def _new_step(self, script: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "name": script["name"],
+            "run": script["run"],
+            "timeout": script.get("timeout", JOBS_CONFIG["default_timeout"]),
+            "state": QUEUED,
+            "returncode": None,
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "result": None,
+            "_log": deque(maxlen=self.log_tail_lines),
+            "_future": None,
+        }
+
+    def _run_job(self, job: Dict[str, Any]):
+        with self._lock:
+            if job["_cancel"].is_set():
+                return
+            job["state"] = RUNNING
+            job["started_at"] = _now()
+        logger.info(f"[JOB {job['job_id']}] Iniciando {len(job['scripts'])} scripts para {job['user_id']}")
+
+        threads = []
+        for step in job["scripts"]:
+            t = threading.Thread(target=self._run_coroutine_step, args=(job, step), daemon=True)
+            t.start()
+            threads.append(t)
+        for t in threads:
+            t.join()
+
+        with self._lock:
+            if job["_cancel"].is_set():
+                job["state"] = CANCELLED
+            elif all(step["returncode"] == 0 for step in job["scripts"]):
+                job["state"] = COMPLETED
+            else:
+                job["state"] = FAILED
+            job["finished_at"] = _now()
+            snapshot = self._snapshot(job)
+        logger.info(f"[JOB {job['job_id']}] Terminado con estado {snapshot['state']} en {snapshot['duration_seconds']}s")
+        self._notify(snapshot)
+
+    def _run_coroutine_step(self, job: Dict[str, Any], step: Dict[str, Any]):
+        step["started_at"] = _now()
+        step["state"] = RUNNING
+        token = _current_log.set(step["_log"])
+        try:
+            future = submit_coroutine(step["run"]())
+        finally:
+            _current_log.reset(token)
+        step["_future"] = future
+        if job["_cancel"].is_set():
+            future.cancel()
+        try:
+            step["result"] = future.result(timeout=step["timeout"])
+            step["returncode"] = 0
+            step["state"] = COMPLETED
+        except concurrent.futures.TimeoutError as e:
+            if future.done():
+                # El TimeoutError lo lanzó el propio scraper
+                step["returncode"] = 1
+                step["error"] = f"{type(e).__name__}: {e}"
+                step["state"] = FAILED
+            else:
+                future.cancel()
+                step["returncode"] = -1
+                step["error"] = f"Script timed out after {step['timeout']} seconds"
+                step["state"] = TIMEOUT
+        except concurrent.futures.CancelledError:
+            step["returncode"] = -1
+            step["state"] = CANCELLED
+        except Exception as e:
+            step["returncode"] = 1
+            step["error"] = f"{type(e).__name__}: {e}"
+            step["state"] = FAILED
+        step["finished_at"] = _now()
+
+    def _notify(self, snapshot: Dict[str, Any]):
+        for callback in self._on_complete:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error(f"Error en callback de trabajo {snapshot['job_id']}: {e}")
+
+    # ─── Utilidades ───────────────────────────────────────────────────────
+    def _prune(self):
+        """Descarta los trabajos terminados más antiguos (llamar con el lock)"""
+        excess = len(self._jobs) - self.max_jobs_kept
+        if excess <= 0:
+            return
+        for job_id in [jid for jid, job in self._jobs.items() if job["state"] in FINISHED_STATES][:excess]:
+            del self._jobs[job_id]
+
+    def _snapshot(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "job_id": job["job_id"],
+            "user_id": job["user_id"],
+            "state": job["state"],
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "duration_seconds": _elapsed(job["started_at"], job["finished_at"]),
+            # Resumen de los pasos que no terminaron bien (lo muestran los clientes que hacen polling)
+            "error": "; ".join(
+                f"{step['name']}: {step['error'] or step['state']}"
+                for step in job["scripts"] if step["state"] in (FAILED, TIMEOUT)
+            ) or None,
+            "scripts": [
+                {
+                    "name": step["name"],
+                    "script": step["name"],
+                    "state": step["state"],
+                    "returncode": step["returncode"],
+                    "started_at": step["started_at"],
+                    "finished_at": step["finished_at"],
+                    "duration_seconds": _elapsed(step["started_at"], step["finished_at"]),
+                    "error": step["error"],
+                    "result": step["result"],
+                    "log_tail": list(step["_log"]),
+                }
+                for step in job["scripts"]
+            ],
+        }
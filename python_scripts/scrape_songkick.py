@@ -4,14 +4,17 @@ import json
 import re
 from bs4 import BeautifulSoup
 from geopy.distance import geodesic
-from playwright.async_api import async_playwright
 import subprocess
 import os
 import time
 
+try:
+    from .browser_pool import browser_context, shutdown_browser_pools
+except ImportError:
+    from browser_pool import browser_context, shutdown_browser_pools
+
 # Configuración de timeouts y reintentos
 MAX_RETRIES = 3
-BROWSER_LAUNCH_TIMEOUT = 60  # segundos (aumentado de 30)
 PAGE_LOAD_TIMEOUT = 60  # segundos (aumentado de 30)
 SELECTOR_TIMEOUT = 30  # segundos (aumentado de 20)
 
@@ -47,68 +50,20 @@ def ensure_playwright_browsers():
         print(f"Error en ensure_playwright_browsers: {e}", file=sys.stderr)
         # Continuar de todas formas
 
-# Configurar encoding de stdout
-try:
-    sys.stdout.reconfigure(encoding='utf-8')
-except AttributeError:
-    import io
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-
-async def scrape_songkick_events():
-    """Función principal de scraping con mejor manejo de errores"""
-    # Argumentos: latitud, longitud, radio_km
-    if len(sys.argv) < 4:
-        print(json.dumps([]))
-        return
-
-    try:
-        hotel_lat = float(sys.argv[1])
-        hotel_lon = float(sys.argv[2])
-        radius_km = float(sys.argv[3])
-    except (ValueError, IndexError) as e:
-        print(f"Error en argumentos: {e}", file=sys.stderr)
-        print(json.dumps([]))
-        return
-
+async def fetch_songkick_events(hotel_lat: float, hotel_lon: float, radius_km: float) -> list:
+    """
+    Scrapea los eventos de Songkick dentro del radio del hotel y los devuelve
+    como lista de dicts. Ante cualquier error devuelve una lista vacía.
+    """
     BASE_URL = "https://www.songkick.com"
     URL = "https://www.songkick.com/es/metro-areas/31097-mexico-tijuana"
 
     # Asegurar browsers antes de empezar
     ensure_playwright_browsers()
 
-    browser = None
     try:
-        async with async_playwright() as p:
-            # Configuraciones de lanzamiento con mejor manejo de errores
-            launch_options = [
-                {"headless": True, "timeout": BROWSER_LAUNCH_TIMEOUT * 1000},
-                {"headless": True, "args": ["--no-sandbox", "--disable-setuid-sandbox"], "timeout": BROWSER_LAUNCH_TIMEOUT * 1000},
-                {"headless": True, "args": ["--no-sandbox", "--disable-setuid-sandbox", "--disable-dev-shm-usage"], "timeout": BROWSER_LAUNCH_TIMEOUT * 1000}
-            ]
-            
-            # Intentar lanzar browser con timeout
-            for i, options in enumerate(launch_options):
-                try:
-                    print(f"Intento {i+1} de lanzar browser para Songkick", file=sys.stderr)
-                    browser = await asyncio.wait_for(
-                        p.chromium.launch(**options),
-                        timeout=BROWSER_LAUNCH_TIMEOUT
-                    )
-                    print("Browser lanzado exitosamente para Songkick", file=sys.stderr)
-                    break
-                except asyncio.TimeoutError:
-                    print(f"Timeout en intento {i+1} de lanzar browser", file=sys.stderr)
-                    continue
-                except Exception as e:
-                    print(f"Error en intento {i+1} de lanzar browser: {e}", file=sys.stderr)
-                    if i == len(launch_options) - 1:
-                        raise Exception(f"Todos los intentos de lanzar browser fallaron. Último error: {e}")
-                    continue
-            
-            if not browser:
-                raise Exception("No se pudo lanzar el browser con ninguna configuración")
-
-            page = await browser.new_page()
+        async with browser_context(headless=True) as context:
+            page = await context.new_page()
             
             # Configurar timeouts y headers
             page.set_default_timeout(PAGE_LOAD_TIMEOUT * 1000)
@@ -126,14 +81,10 @@ async def scrape_songkick_events():
                 )
             except asyncio.TimeoutError:
                 print("Timeout navegando a Songkick", file=sys.stderr)
-                await browser.close()
-                print(json.dumps([]))
-                return
+                return []
             except Exception as e:
                 print(f"Error navegando a Songkick: {e}", file=sys.stderr)
-                await browser.close()
-                print(json.dumps([]))
-                return
+                return []
             
             # Esperar eventos con timeout
             try:
@@ -149,48 +100,31 @@ async def scrape_songkick_events():
                 print(f"Longitud del contenido: {len(html)}", file=sys.stderr)
                 if len(html) < 1000:
                     print("Página parece estar vacía o bloqueada", file=sys.stderr)
-                    await browser.close()
-                    print(json.dumps([]))
-                    return
+                    return []
             except Exception as e:
                 print(f"Error esperando eventos en Songkick: {e}", file=sys.stderr)
-                await browser.close()
-                print(json.dumps([]))
-                return
+                return []
 
             # Obtener contenido HTML
             try:
                 html = await asyncio.wait_for(page.content(), timeout=10)
             except asyncio.TimeoutError:
                 print("Timeout obteniendo contenido HTML", file=sys.stderr)
-                await browser.close()
-                print(json.dumps([]))
-                return
+                return []
             except Exception as e:
                 print(f"Error obteniendo contenido HTML: {e}", file=sys.stderr)
-                await browser.close()
-                print(json.dumps([]))
-                return
-            finally:
-                await browser.close()
+                return []
 
     except Exception as e:
         print(f"Error en Playwright scraping para Songkick: {e}", file=sys.stderr)
-        if browser:
-            try:
-                await browser.close()
-            except:
-                pass
-        print(json.dumps([]))
-        return
+        return []
 
     # Procesar HTML con BeautifulSoup
     try:
         soup = BeautifulSoup(html, "html.parser")
     except Exception as e:
         print(f"Error parseando HTML con BeautifulSoup: {e}", file=sys.stderr)
-        print(json.dumps([]))
-        return
+        return []
 
     # Buscar todos los eventos
     li_events = soup.find_all("li", class_="event-listings-element")
@@ -255,21 +189,46 @@ async def scrape_songkick_events():
             continue
 
     print(f"Total de eventos finales: {len(eventos)}", file=sys.stderr)
+    return eventos
+
+async def scrape_songkick_events():
+    """Punto de entrada por CLI: lee lat, lon y radio de argv e imprime el JSON en stdout"""
+    # Argumentos: latitud, longitud, radio_km
+    if len(sys.argv) < 4:
+        print(json.dumps([]))
+        return
+
+    try:
+        hotel_lat = float(sys.argv[1])
+        hotel_lon = float(sys.argv[2])
+        radius_km = float(sys.argv[3])
+    except (ValueError, IndexError) as e:
+        print(f"Error en argumentos: {e}", file=sys.stderr)
+        print(json.dumps([]))
+        return
+
+    eventos = await fetch_songkick_events(hotel_lat, hotel_lon, radius_km)
     # Solo imprimir el JSON en stdout, sin debug
+    print(json.dumps(eventos, ensure_ascii=False))
+
+async def run_scrape_songkick_events():
+    """Ejecución por CLI con timeout global; cierra el pool de navegadores al terminar"""
     try:
-        json_output = json.dumps(eventos, ensure_ascii=False)
-        # Verificar que el JSON sea válido antes de imprimirlo
-        json.loads(json_output)  # Test de validación
-        print(json_output)
-    except Exception as e:
-        print("[]")
-        print(f"Error generando JSON válido: {e}", file=sys.stderr)
+        await asyncio.wait_for(scrape_songkick_events(), timeout=120)  # 2 minutos máximo
+    finally:
+        await shutdown_browser_pools()
 
 # Ejecutar la función async
 if __name__ == "__main__":
+    # Configurar encoding de stdout
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+    except AttributeError:
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     try:
         # Configurar timeout global para toda la ejecución
-        asyncio.run(asyncio.wait_for(scrape_songkick_events(), timeout=120))  # 2 minutos máximo
+        asyncio.run(run_scrape_songkick_events())
     except asyncio.TimeoutError:
         print("[]")
         print("Timeout en scraping de Songkick", file=sys.stderr)
@@ -0,0 +1,185 @@
+"""
+Lectura de las páginas de resultados de búsqueda de Booking.
+
+Cada tarjeta de propiedad ya muestra nombre, estrellas, dirección, la
+habitación recomendada y el precio para las fechas buscadas. CARDS_JS lee
+todas las tarjetas de una página en un solo page.evaluate y
+walk_search_results recorre las páginas de resultados con el parámetro
+offset hasta cubrir el total anunciado por Booking; discover_hotels hace lo
+mismo con varias páginas en paralelo y entrega cada hotel nuevo en cuanto
+aparece, para que el scraping de detalle empiece sin esperar al recorrido.
+"""
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import quote_plus, urlsplit
+
+try:
+    from .config import SEARCH_RESULTS_CONFIG
+    from .page_ready import goto, politeness_delay, wait_for_any
+    from .page_recycler import PageRecycler
+    from .work_queue import RetryItem, run_page_workers
+except ImportError:
+    from config import SEARCH_RESULTS_CONFIG
+    from page_ready import goto, politeness_delay, wait_for_any
+    from page_recycler import PageRecycler
+    from work_queue import RetryItem, run_page_workers
+
+logger = logging.getLogger(__name__)
+
+CARD_SELECTOR = "div[data-testid='property-card']"
+
+# Tipo de habitación cuando la tarjeta no muestra la unidad recomendada
+SEARCH_ROOM_TYPE = "Precio en resultados"
+_CURRENCY_RE = re.compile(r"[A-Z]{3}|[$€£]")
+
+# Todas las tarjetas de la página y el total de resultados anunciado en el encabezado
+CARDS_JS = r"""
+(cardSelector) => {
+    const text = (el) => (el && (el.innerText || el.textContent) || '').trim();
+    const cards = Array.from(document.querySelectorAll(cardSelector)).map(card => {
+        const link = card.querySelector("a[data-testid='title-link'], a[data-testid='property-card-desktop-single-image']");
+        const stars = card.querySelector("[data-testid='rating-stars'], [data-testid='rating-squares']");
+        const starsLabel = stars ? (stars.getAttribute('aria-label') || '') : '';
+        const starsMatch = starsLabel.match(/(\d+)/);
+        return {
+            nombre: text(card.querySelector("[data-testid='title']")),
+            url: link ? link.href : null,
+            estrellas: starsMatch ? parseInt(starsMatch[1], 10) : (stars ? stars.children.length || null : null),
+            ubicacion: text(card.querySelector("[data-testid='address']")),
+            room_type: text(card.querySelector("[data-testid='recommended-units'] h4, [data-testid='recommended-units'] [role='link']")),
+            price: text(card.querySelector("[data-testid='price-and-discounted-price']")),
+        };
+    });
+    const heading = text(document.querySelector('h1'));
+    const total = heading.replace(/[.,](?=\d{3})/g, '').match(/(\d+)\s+(propert|alojamiento|hotel)/i);
+    return {total: total ? parseInt(total[1], 10) : null, cards: cards};
+}
+"""
+
+
+def search_url(ciudad: str, checkin: str, checkout: str, offset: int = 0) -> str:
+    url = (
+        f"https://www.booking.com/searchresults.html?ss={quote_plus(ciudad)}&checkin={checkin}&checkout={checkout}"
+        f"&group_adults=1&no_rooms=1&group_children=0"
+    )
+    return f"{url}&offset={offset}" if offset else url
+
+
+def hotel_id_from_url(url: str) -> Optional[str]:
+    """Identificador estable de la propiedad: /hotel/<país>/<slug>"""
+    match = re.search(r"/hotel/([a-z]{2})/([^/.?]+)", urlsplit(url or "").path)
+    return f"{match.group(1)}/{match.group(2)}" if match else None
+
+
+async def read_result_cards(page) -> Dict[str, Any]:
+    """{"total", "cards"} de la página de resultados ya cargada"""
+    await wait_for_any(page, [CARD_SELECTOR])
+    return await page.evaluate(CARDS_JS, CARD_SELECTOR)
+
+
+async def walk_search_results(page, ciudad: str, checkin: str, checkout: str,
+                              max_pages: int = None) -> List[Dict[str, Any]]:
+    """
+    Tarjetas de todas las páginas de resultados para las fechas dadas
+    (deduplicadas por hotel), recorriendo offset de page_size en page_size.
+    """
+    max_pages = max_pages or SEARCH_RESULTS_CONFIG["max_pages"]
+    page_size = SEARCH_RESULTS_CONFIG["page_size"]
+    cards: Dict[str, Dict[str, Any]] = {}
+    total = None
+    for page_number in range(max_pages):
+        offset = page_number * page_size
+        if total is not None and offset >= total:
+            break
+        if page_number:
+            await politeness_delay()
+        await goto(page, search_url(ciudad, checkin, checkout, offset))
+        result = await read_result_cards(page)
+        total = result["total"] if total is None else total
+        new = 0
+        for card in result["cards"]:
+            hotel_id = hotel_id_from_url(card["url"])
+            if hotel_id and hotel_id not in cards:
+                cards[hotel_id] = {**card, "hotel_id": hotel_id}
+                new += 1
+        if not new:
+            break
+    logger.info(f"[SEARCH] {ciudad} {checkin}: {len(cards)} propiedades (total anunciado: {total})")
+    return list(cards.values())
+
+
+async def discover_hotels(context, ciudad: str, checkin: str, checkout: str,
+                          on_hotel: Callable[[Dict[str, Any]], Awaitable[None]],
+                          concurrency: int = None, max_pages: int = None) -> int:
+    """
+    Recorre todas las páginas de resultados y espera on_hotel(card) con cada
+    hotel nuevo (deduplicado por hotel_id). La primera página da el total; el
+    resto de offsets se piden con `concurrency` páginas a la vez. Si Booking no
+    anuncia el total, se avanza página a página hasta que una no aporte nada.
+    Devuelve el número de hoteles encontrados.
+    """
+    max_pages = max_pages or SEARCH_RESULTS_CONFIG["max_pages"]
+    page_size = SEARCH_RESULTS_CONFIG["page_size"]
+    seen = set()
+
+    async def emit(cards: List[Dict[str, Any]]) -> int:
+        new = 0
+        for card in cards:
+            hotel_id = hotel_id_from_url(card["url"])
+            if hotel_id and hotel_id not in seen:
+                seen.add(hotel_id)
+                new += 1
+                await on_hotel({**card, "hotel_id": hotel_id})
+        return new
+
+    # La primera página ocupa un hueco de renderer como las de los workers
+    async with PageRecycler(context) as recycler:
+        page = await recycler.get()
+        await goto(page, search_url(ciudad, checkin, checkout))
+        first = await read_result_cards(page)
+        await emit(first["cards"])
+        total = first["total"]
+        if total is None:
+            # Sin total anunciado: avanzar en secuencia mientras haya hoteles nuevos
+            for page_number in range(1, max_pages):
+                await politeness_delay()
+                page = await recycler.get()
+                await goto(page, search_url(ciudad, checkin, checkout, page_number * page_size))
+                if not await emit((await read_result_cards(page))["cards"]):
+                    break
+
+    if total is not None:
+        offsets = [
+            {"key": f"{ciudad}|offset={offset}", "offset": offset}
+            for offset in range(page_size, min(total, max_pages * page_size), page_size)
+        ]
+
+        async def fetch_offset(offset_page, item: Dict[str, Any]):
+            await goto(offset_page, search_url(ciudad, checkin, checkout, item["offset"]))
+            result = await read_result_cards(offset_page)
+            if not result["cards"]:
+                raise RetryItem(f"Página de resultados vacía (offset={item['offset']})")
+            await emit(result["cards"])
+
+        await run_page_workers(
+            context, offsets, fetch_offset,
+            workers=concurrency or SEARCH_RESULTS_CONFIG["discovery_concurrency"],
+            between_items=politeness_delay,
+        )
+    logger.info(f"[SEARCH] {ciudad}: {len(seen)} hoteles descubiertos (total anunciado: {total})")
+    return len(seen)
+
+
+def card_rooms(card: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Precio de la tarjeta con la estructura de rooms_jsonb (vacío si no muestra precio)"""
+    price = re.sub(r"\s+", " ", card.get("price") or "").strip()
+    if not re.search(r"\d", price):
+        return []
+    currency = _CURRENCY_RE.search(price)
+    return [{
+        "room_type": card.get("room_type") or SEARCH_ROOM_TYPE,
+        "price": price,
+        "currency": currency.group(0) if currency else None,
+        "source": "search",
+    }]
@@ -0,0 +1,153 @@
+"""
+Registro persistente de qué selector funcionó para cada objetivo y tipo de
+página (p. ej. "hotel/table", "search/suggestion").
+
+Cada acierto suma 1 al selector ganador y decae la puntuación del resto, de
+modo que cuando Booking cambia el marcado el nuevo ganador pasa al frente en
+pocas ejecuciones. Las listas de candidatos se ordenan por puntuación antes
+de pasarlas a los extractores, y race() prueba primero el ganador histórico
+con un timeout corto y después espera a todos los candidatos en paralelo.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+try:
+    from .config import READINESS_CONFIG, SELECTOR_REGISTRY_CONFIG
+except ImportError:
+    from config import READINESS_CONFIG, SELECTOR_REGISTRY_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Campos de extract_room_table / parse_room_table -> objetivo en el registro
+EXTRACTION_TARGETS = {
+    "table_selector": "table",
+    "row_selector": "row",
+    "room_type_selector": "room_type",
+    "price_selector": "price",
+}
+
+
+class SelectorRegistry:
+    """Puntuaciones por (tipo de página, objetivo, selector) en un archivo JSON"""
+
+    def __init__(self, path: str = None, decay: float = None):
+        self.path = path or SELECTOR_REGISTRY_CONFIG["path"]
+        self.decay = SELECTOR_REGISTRY_CONFIG["decay"] if decay is None else decay
+        self._lock = threading.Lock()
+        self._stats: Optional[Dict[str, Dict[str, Dict[str, float]]]] = None
+        self._dirty = False
+        self._saved_at = 0.0
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        if self._stats is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._stats = json.load(f)
+            except (OSError, ValueError):
+                self._stats = {}
+        return self._stats
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._stats, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+        self._saved_at = time.time()
+
+    def order(self, page_type: str, target: str, candidates: Iterable[str]) -> List[str]:
+        """Candidatos por puntuación (los que nunca ganaron conservan su orden)"""
+        candidates = list(candidates)
+        with self._lock:
+            stats = self._load().get(f"{page_type}/{target}", {})
+        return sorted(candidates, key=lambda sel: -stats.get(sel, {}).get("score", 0.0))
+
+    def winner(self, page_type: str, target: str) -> Optional[str]:
+        with self._lock:
+            stats = self._load().get(f"{page_type}/{target}", {})
+        return max(stats, key=lambda sel: stats[sel]["score"]) if stats else None
+
+    def record(self, page_type: str, target: str, selector: Optional[str], count: int = 1):
+        """Suma `count` aciertos a selector y decae al resto del mismo objetivo"""
+        if not selector or count <= 0:
+            return
+        with self._lock:
+            stats = self._load().setdefault(f"{page_type}/{target}", {})
+            for other, entry in stats.items():
+                if other != selector:
+                    entry["score"] = round(entry["score"] * self.decay ** count, 4)
+            entry = stats.setdefault(selector, {"score": 0.0, "wins": 0})
+            entry["score"] += count
+            entry["wins"] += count
+            entry["last_win"] = time.time()
+            self._dirty = True
+            if time.time() - self._saved_at >= SELECTOR_REGISTRY_CONFIG["save_interval"]:
+                self._save()
+
+    def record_extraction(self, page_type: str, extracted: Dict[str, Optional[str]]):
+        """Registra los selectores ganadores devueltos por extract_room_table"""
+        for field, target in EXTRACTION_TARGETS.items():
+            self.record(page_type, target, extracted.get(field))
+
+    def flush(self):
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    async def race(self, page, page_type: str, target: str, candidates: Iterable[str],
+                   timeout: int = None, state: str = "visible") -> Optional[str]:
+        """
+        Selector que aparece primero en la página, o None si vence el timeout.
+        El ganador histórico se prueba solo con SELECTOR_REGISTRY_CONFIG["fast_timeout"];
+        si no aparece, todos los candidatos se esperan a la vez.
+        """
+        ordered = self.order(page_type, target, candidates)
+        timeout = timeout or READINESS_CONFIG["element_timeout"]
+        started = time.perf_counter()
+
+        async def wait(selector: str, ms: float) -> str:
+            await page.wait_for_selector(selector, state=state, timeout=ms)
+            return selector
+
+        best = self.winner(page_type, target)
+        if best in ordered:
+            try:
+                found = await wait(best, min(SELECTOR_REGISTRY_CONFIG["fast_timeout"], timeout))
+                self.record(page_type, target, found)
+                return found
+            except Exception:
+                logger.info(f"[SELECTOR] {page_type}/{target}: el ganador '{best}' no apareció, probando todos")
+
+        remaining = max(timeout - (time.perf_counter() - started) * 1000, 1)
+        tasks = [asyncio.ensure_future(wait(sel, remaining)) for sel in ordered]
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.cancelled() and task.exception() is None:
+                        found = task.result()
+                        self.record(page_type, target, found)
+                        return found
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+_registry: Optional[SelectorRegistry] = None
+
+
+def get_selector_registry() -> SelectorRegistry:
+    """Registro compartido del proceso"""
+    global _registry
+    if _registry is None:
+        _registry = SelectorRegistry()
+    return _registry
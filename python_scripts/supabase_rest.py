@@ -0,0 +1,269 @@
+"""
+Acceso a Supabase (PostgREST y la API de administración de Auth) sobre una
+sesión HTTP keep-alive compartida por todo el proceso.
+
+Todas las instancias de SupabaseRest usan el mismo requests.Session, con un
+pool de como mucho SUPABASE_REST_CONFIG["pool_maxsize"] conexiones por host
+(las peticiones de más esperan una conexión libre), así que el backend y los
+scripts dejan de abrir una conexión TLS nueva por llamada. Las peticiones
+idempotentes se reintentan con backoff ante errores de red y códigos
+transitorios; el resto de errores se lanzan como SupabaseError con el código
+y el cuerpo de la respuesta.
+
+select_page pagina por keyset: cada página se pide con el
+encabezado Range de PostgREST y un filtro "después de la última fila" sobre
+las columnas del orden, así que el coste por página no crece con el historial.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from .bulk_writer import RETRY_STATUS, BulkWriter
+    from .config import SUPABASE_REST_CONFIG
+except ImportError:
+    from bulk_writer import RETRY_STATUS, BulkWriter
+    from config import SUPABASE_REST_CONFIG
+
+logger = logging.getLogger(__name__)
+
+Row = Dict[str, Any]
+Filters = Dict[str, Union[str, List[str]]]  # una lista repite el parámetro (rango gte/lte)
+Keyset = Sequence[Tuple[str, bool]]  # (columna, descendente) del orden de paginación
+
+# Métodos que se pueden repetir sin efectos duplicados
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "PATCH", "DELETE")
+
+
+class SupabaseError(Exception):
+    """Respuesta de error de Supabase (status None si no hubo respuesta)"""
+
+    def __init__(self, status: Optional[int], details: str, method: str = "", path: str = ""):
+        super().__init__(f"{method} {path}: {status} {details[:200]}".strip())
+        self.status = status
+        self.details = details
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def shared_session() -> requests.Session:
+    """Sesión keep-alive del proceso, con pool limitado por host"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=SUPABASE_REST_CONFIG["pool_connections"],
+                pool_maxsize=SUPABASE_REST_CONFIG["pool_maxsize"],
+                pool_block=True,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _quote(value: Any) -> str:
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _keyset_tie(column: str, value: Any) -> str:
+    return f"{column}.is.null" if value is None else f"{column}.eq.{_quote(value)}"
+
+
+def _keyset_next(column: str, desc: bool, value: Any) -> Optional[str]:
+    """
+    Valores de column que van después de value. Sin nullsfirst/nullslast,
+    PostgreSQL pone los nulos al final en asc y al principio en desc; None si
+    no queda ninguno.
+    """
+    if value is None:
+        return f"{column}.not.is.null" if desc else None
+    if desc:
+        return f"{column}.lt.{_quote(value)}"
+    return f"or({column}.gt.{_quote(value)},{column}.is.null)"
+
+
+def keyset_filter(keyset: Keyset, after: Sequence[Any]) -> Optional[str]:
+    """
+    Filtro "fila posterior a after" para el orden keyset, p. ej. con
+    (checkin_date asc, id asc): (or(or(checkin_date.gt.X,checkin_date.is.null),
+    and(checkin_date.eq.X,id.gt.Y))). Los valores nulos se comparan con
+    is.null; devuelve None si ninguna fila puede ir después.
+    """
+    clauses = []
+    for i, (column, desc) in enumerate(keyset):
+        following = _keyset_next(column, desc, after[i])
+        if following is None:
+            continue
+        parts = [_keyset_tie(prev, value) for (prev, _), value in zip(keyset[:i], after[:i])] + [following]
+        clauses.append(parts[0] if len(parts) == 1 else f"and({','.join(parts)})")
+    return f"(or({','.join(clauses)}))" if clauses else None
+
+
+class SupabaseRest:
+    """Cliente de una instancia de Supabase con una clave (anon o service)"""
+
+    def __init__(self, url: str, key: str, session: Optional[requests.Session] = None):
+        self.url = url.rstrip("/")
+        self.key = key
+        self.session = session or shared_session()
+
+    @classmethod
+    def from_env(cls, key_var: str = "SUPABASE_ANON_KEY") -> "SupabaseRest":
+        url = os.getenv("SUPABASE_URL")
+        key = os.getenv(key_var)
+        if not url or not key:
+            raise ValueError(f"Faltan variables SUPABASE_URL o {key_var}")
+        return cls(url, key)
+
+    def headers(self, jwt: Optional[str] = None, prefer: Optional[str] = None) -> Dict[str, str]:
+        """Cabeceras con el JWT del usuario (o la clave del cliente)"""
+        headers = {"apikey": self.key, "Authorization": f"Bearer {jwt or self.key}"}
+        if prefer:
+            headers["Prefer"] = prefer
+        return headers
+
+    def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None, json: Any = None,
+                jwt: Optional[str] = None, prefer: Optional[str] = None, retry: Optional[bool] = None,
+                timeout: Optional[float] = None, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """
+        Petición a `path` (p. ej. "/rest/v1/events"). Se reintenta si el método
+        es idempotente o retry=True; lanza SupabaseError si no termina en 2xx.
+        """
+        method = method.upper()
+        retry = method in IDEMPOTENT_METHODS if retry is None else retry
+        attempts = SUPABASE_REST_CONFIG["max_retries"] + 1 if retry else 1
+        timeout = (SUPABASE_REST_CONFIG["connect_timeout"], timeout or SUPABASE_REST_CONFIG["read_timeout"])
+        for attempt in range(1, attempts + 1):
+            try:
+                r = self.session.request(method, f"{self.url}{path}", params=params, json=json,
+                                         headers={**self.headers(jwt, prefer), **(headers or {})}, timeout=timeout)
+                if r.ok:
+                    return r
+                error = SupabaseError(r.status_code, r.text, method, path)
+                if r.status_code not in RETRY_STATUS:
+                    raise error
+            except requests.RequestException as e:
+                error = SupabaseError(None, str(e), method, path)
+            if attempt < attempts:
+                delay = SUPABASE_REST_CONFIG["backoff_seconds"] * (2 ** (attempt - 1))
+                logger.info(f"[SUPABASE] {method} {path} falló ({error.status}), reintento {attempt} en {delay}s")
+                time.sleep(delay)
+        raise error
+
+    @staticmethod
+    def _json(r: requests.Response) -> Any:
+        return r.json() if r.content else []
+
+    # ─── PostgREST ────────────────────────────────────────────────────────
+    def select(self, table: str, filters: Optional[Filters] = None, columns: str = "*",
+               order: Optional[str] = None, limit: Optional[int] = None, jwt: Optional[str] = None,
+               range_: Optional[Tuple[int, int]] = None) -> List[Row]:
+        """
+        Filas de la tabla; filters usa la sintaxis de PostgREST
+        ({"user_id": "eq.<uuid>"}). range_=(desde, hasta) pide esas filas
+        (inclusivas) con el encabezado Range.
+        """
+        params: Dict[str, Any] = {"select": columns, **(filters or {})}
+        if order:
+            params["order"] = order
+        if limit is not None:
+            params["limit"] = limit
+        headers = {"Range-Unit": "items", "Range": f"{range_[0]}-{range_[1]}"} if range_ else None
+        return self._json(self.request("GET", f"/rest/v1/{table}", params=params, jwt=jwt, headers=headers))
+
+    def select_page(self, table: str, filters: Optional[Filters] = None, keyset: Keyset = (("id", False),),
+                    after: Optional[Sequence[Any]] = None, limit: int = 1000, columns: str = "*",
+                    jwt: Optional[str] = None) -> Tuple[List[Row], Optional[List[Any]]]:
+        """
+        Hasta `limit` filas ordenadas por keyset que van después de `after`
+        (los valores de esas columnas en la última fila de la página anterior).
+        Devuelve (filas, after de la página siguiente o None si no hay más);
+        columns debe incluir las columnas del keyset.
+        """
+        params: Filters = dict(filters or {})
+        if after is not None:
+            if "and" in params:
+                raise ValueError("select_page usa el parámetro 'and' para el keyset")
+            params["and"] = keyset_filter(keyset, after)
+            if params["and"] is None:
+                return [], None
+        order = ",".join(f"{column}.{'desc' if desc else 'asc'}" for column, desc in keyset)
+        rows = self.select(table, params, columns, order=order, jwt=jwt, range_=(0, limit - 1))
+        next_after = [rows[-1].get(column) for column, _ in keyset] if len(rows) == limit else None
+        return rows, next_after
+
+    def insert(self, table: str, rows: Union[Row, List[Row]], jwt: Optional[str] = None,
+               returning: bool = True) -> List[Row]:
+        """Inserta una fila o una lista; devuelve las filas creadas si returning"""
+        prefer = "return=representation" if returning else "return=minimal"
+        return self._json(self.request("POST", f"/rest/v1/{table}", json=rows, jwt=jwt, prefer=prefer))
+
+    def upsert(self, table: str, rows: Union[Row, List[Row]], on_conflict: str, jwt: Optional[str] = None,
+               returning: bool = False, timeout: Optional[float] = None) -> List[Row]:
+        """Inserta o actualiza por on_conflict (idempotente, así que se reintenta)"""
+        prefer = "resolution=merge-duplicates," + ("return=representation" if returning else "return=minimal")
+        return self._json(self.request("POST", f"/rest/v1/{table}", params={"on_conflict": on_conflict},
+                                       json=rows, jwt=jwt, prefer=prefer, retry=True, timeout=timeout))
+
+    def delete(self, table: str, filters: Dict[str, str], jwt: Optional[str] = None,
+               timeout: Optional[float] = None) -> None:
+        """Borra las filas que cumplen filters (obligatorio: nunca la tabla entera)"""
+        if not filters:
+            raise ValueError("delete necesita al menos un filtro")
+        self.request("DELETE", f"/rest/v1/{table}", params=filters, jwt=jwt, timeout=timeout)
+
+    def bulk_writer(self, table: str, jwt: Optional[str] = None, on_conflict: Optional[str] = None,
+                    prefer: Optional[str] = None, **kwargs) -> BulkWriter:
+        """BulkWriter de la tabla sobre la sesión compartida"""
+        return BulkWriter(self.url, table, self.headers(jwt, prefer), on_conflict=on_conflict,
+                          session=self.session, **kwargs)
+
+    # ─── Administración de usuarios (requiere la service key) ─────────────
+    def get_user(self, user_id: str) -> Row:
+        return self.request("GET", f"/auth/v1/admin/users/{user_id}").json()
+
+    def list_users(self, per_page: int = 1000) -> List[Row]:
+        """Todos los usuarios, recorriendo las páginas de la API de administración"""
+        users: List[Row] = []
+        page = 1
+        while True:
+            batch = self.request("GET", "/auth/v1/admin/users",
+                                 params={"page": page, "per_page": per_page}).json().get("users", [])
+            users.extend(batch)
+            if len(batch) < per_page:
+                return users
+            page += 1
+
+    def create_user(self, payload: Row) -> Row:
+        return self.request("POST", "/auth/v1/admin/users", json=payload).json()
+
+    def update_user_metadata(self, user_id: str, updates: Row) -> Row:
+        """Mezcla updates en user_metadata del usuario y devuelve la metadata resultante"""
+        user_meta = self.get_user(user_id).get("user_metadata") or {}
+        user_meta.update(updates)
+        self.request("PUT", f"/auth/v1/admin/users/{user_id}", json={"user_metadata": user_meta})
+        return user_meta
+
+    def sign_in(self, email: str, password: str) -> Row:
+        """Sesión (tokens) del usuario con email y contraseña"""
+        return self.request("POST", "/auth/v1/token", params={"grant_type": "password"},
+                            json={"email": email, "password": password}).json()
+
+
+_clients: Dict[str, SupabaseRest] = {}
+
+
+def get_supabase_rest(key_var: str = "SUPABASE_ANON_KEY") -> SupabaseRest:
+    """Cliente compartido del proceso para la clave de la variable key_var"""
+    if key_var not in _clients:
+        _clients[key_var] = SupabaseRest.from_env(key_var)
+    return _clients[key_var]
@@ -0,0 +1,168 @@
+"""
+Cola de trabajo compartida por N páginas de un BrowserContext.
+
+Cada elemento (por ejemplo un par hotel/fecha) se encola una vez; cada
+worker tiene su propia página y va tomando el siguiente elemento libre, de
+modo que una fecha lenta solo ocupa a un worker mientras los demás siguen
+avanzando. Los elementos que fallan se reencolan hasta max_retries veces.
+Las páginas de los workers se reciclan por navegaciones o memoria y cuentan
+contra el límite de renderers del proceso (ver page_recycler).
+
+run_page_workers procesa una lista fija y devuelve los resultados en el
+mismo orden; PageWorkerQueue admite elementos nuevos mientras los workers
+trabajan (hasta close()) y entrega cada resultado con on_result.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+try:
+    from .config import DATE_QUEUE_CONFIG
+    from .page_recycler import MemoryReport, PageRecycler
+except ImportError:
+    from config import DATE_QUEUE_CONFIG
+    from page_recycler import MemoryReport, PageRecycler
+
+logger = logging.getLogger(__name__)
+
+
+class RetryItem(Exception):
+    """Lanzada por el handler para pedir que el elemento se reintente"""
+
+
+class PageWorkerQueue:
+    """
+    Cola abierta procesada por `workers` páginas del contexto.
+
+    handle(page, item) devuelve el resultado del elemento; si lanza una
+    excepción el elemento se reencola (hasta max_retries reintentos) y al
+    agotarlos se usa on_failure(item, error) como resultado (None por defecto).
+    on_result(item, result) se espera con cada elemento terminado.
+    between_items se espera entre dos elementos del mismo worker (cortesía).
+    report acumula las lecturas de memoria de las páginas de los workers.
+    """
+
+    def __init__(
+        self,
+        context,
+        handle: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        workers: int = None,
+        max_retries: int = None,
+        on_failure: Optional[Callable[[Dict[str, Any], BaseException], Any]] = None,
+        on_result: Optional[Callable[[Dict[str, Any], Any], Awaitable[None]]] = None,
+        between_items: Optional[Callable[[], Awaitable[None]]] = None,
+        report: Optional[MemoryReport] = None,
+    ):
+        self.context = context
+        self.handle = handle
+        self.workers = max(1, workers or DATE_QUEUE_CONFIG["workers"])
+        self.max_retries = DATE_QUEUE_CONFIG["max_retries"] if max_retries is None else max_retries
+        self.on_failure = on_failure
+        self.on_result = on_result
+        self.between_items = between_items
+        self.report = report
+        self.stats = {"done": 0, "retries": 0, "failed": 0}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._outstanding = 0   # elementos encolados sin resultado final
+        self._closed = False
+        self._count = 0
+
+    def put(self, item: Dict[str, Any]):
+        self._outstanding += 1
+        self._count += 1
+        self._queue.put_nowait((item, 0))
+
+    def close(self):
+        """No habrá más elementos: los workers terminan al vaciar la cola"""
+        self._closed = True
+        self._stop_if_drained()
+
+    def _stop_if_drained(self):
+        if self._closed and self._outstanding == 0:
+            for _ in range(self.workers):
+                self._queue.put_nowait(None)
+
+    async def _finish(self, item: Dict[str, Any], result: Any):
+        try:
+            if self.on_result:
+                await self.on_result(item, result)
+        finally:
+            self._outstanding -= 1
+            self._stop_if_drained()
+
+    async def _worker(self):
+        first = True
+        async with PageRecycler(self.context, report=self.report) as recycler:
+            while True:
+                if self._queue.empty():
+                    # Sin trabajo a la vista: liberar el renderer mientras se espera
+                    await recycler.release()
+                entry = await self._queue.get()
+                if entry is None:
+                    return
+                item, attempt = entry
+                try:
+                    if self.between_items and not first:
+                        await self.between_items()
+                    first = False
+                    result = await self.handle(await recycler.get(), item)
+                    self.stats["done"] += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if attempt < self.max_retries:
+                        self.stats["retries"] += 1
+                        logger.info(f"[QUEUE] Reintentando {item.get('key')} ({attempt + 1}/{self.max_retries}): {e}")
+                        self._queue.put_nowait((item, attempt + 1))
+                        continue
+                    self.stats["failed"] += 1
+                    logger.warning(f"[QUEUE] {item.get('key')} falló tras {attempt + 1} intento(s): {e}")
+                    result = self.on_failure(item, e) if self.on_failure else None
+                await self._finish(item, result)
+
+    async def run(self) -> Dict[str, int]:
+        """Procesa elementos hasta que la cola esté cerrada y vacía"""
+        started = time.perf_counter()
+        await asyncio.gather(*(self._worker() for _ in range(self.workers)))
+        logger.info(
+            f"[QUEUE] {self._count} elementos con {self.workers} páginas en {time.perf_counter() - started:.1f}s "
+            f"({self.stats['done']} ok, {self.stats['retries']} reintentos, {self.stats['failed']} fallidos)"
+        )
+        return self.stats
+
+
+async def run_page_workers(
+    context,
+    items: List[Dict[str, Any]],
+    handle: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+    workers: int = None,
+    max_retries: int = None,
+    on_failure: Optional[Callable[[Dict[str, Any], BaseException], Any]] = None,
+    between_items: Optional[Callable[[], Awaitable[None]]] = None,
+    report: Optional[MemoryReport] = None,
+) -> List[Any]:
+    """
+    Procesa la lista items con `workers` páginas del contexto (ver
+    PageWorkerQueue) y devuelve los resultados en el orden de entrada.
+    """
+    results: List[Any] = [None] * len(items)
+
+    async def store(entry: Dict[str, Any], result: Any):
+        results[entry["index"]] = result
+
+    queue = PageWorkerQueue(
+        context,
+        lambda page, entry: handle(page, entry["item"]),
+        workers=min(workers or DATE_QUEUE_CONFIG["workers"], len(items) or 1),
+        max_retries=max_retries,
+        on_failure=(lambda entry, error: on_failure(entry["item"], error)) if on_failure else None,
+        on_result=store,
+        between_items=between_items,
+        report=report,
+    )
+    for index, item in enumerate(items):
+        queue.put({"index": index, "item": item, "key": item.get("key", index)})
+    queue.close()
+    await queue.run()
+    return results
@@ -0,0 +1,42 @@
+"""
+Event loop de trabajo compartido por el backend.
+
+Los scrapers se ejecutan como corrutinas en un único event loop que vive en
+un hilo dedicado, de modo que el pool de navegadores y los módulos ya
+importados se reutilizan entre peticiones en lugar de lanzar un proceso
+Python nuevo por cada una.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """Devuelve el event loop de trabajo, arrancando su hilo la primera vez"""
+    global _loop
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="scrape-worker-loop", daemon=True)
+            thread.start()
+            _loop = loop
+        return _loop
+
+
+def submit_coroutine(coro: Coroutine) -> Future:
+    """Programa la corrutina en el loop de trabajo y devuelve un Future de hilos"""
+    return asyncio.run_coroutine_threadsafe(coro, get_worker_loop())
+
+
+def run_coroutine(coro: Coroutine, timeout: float = None) -> Any:
+    """Ejecuta la corrutina en el loop de trabajo y espera su resultado (bloqueante)"""
+    future = submit_coroutine(coro)
+    try:
+        return future.result(timeout=timeout)
+    except BaseException:
+        future.cancel()
+        raise
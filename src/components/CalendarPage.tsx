@@ -296,16 +296,25 @@ const CalendarPage: React.FC = () => {
     if (!user?.id) return;
 
     try {
-      const response = await fetch(`/api/hotel-prices?user_id=${user.id}`);
-      const data = await response.json();
-
-      if (!response.ok) {
-        console.error('Error fetching prices:', data.error);
-        return;
-      }
+      // El endpoint pagina por cursor: pedir páginas hasta que no haya next_cursor
+      const prices: any[] = [];
+      let cursor: string | null = null;
+      do {
+        const cursorParam: string = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+        const response = await fetch(`/api/hotel-prices?user_id=${user.id}${cursorParam}`);
+        const data = await response.json();
+
+        if (!response.ok) {
+          console.error('Error fetching prices:', data.error);
+          return;
+        }
+        prices.push(...(data.prices || []));
+        cursor = data.next_cursor || null;
+      } while (cursor);
 
-      const prices = data.prices || [];
-      const avgPrice = data.average_price || 0;
+      const avgPrice = prices.length
+        ? prices.reduce((sum: number, price: any) => sum + price.price, 0) / prices.length
+        : 0;
       setAveragePrice(avgPrice);
       
       console.log('[DEBUG] Precios recibidos:', prices.length);
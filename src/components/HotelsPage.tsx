@@ -30,10 +30,19 @@ const HotelsPage = () => {
         setLoading(false);
         return;
       }
-      const res = await fetch(`${import.meta.env.VITE_BACKEND_URL}/api/hotels?user_id=${userId}`);
-      const data = await res.json();
-      setHotels(data || []);
-      setFilteredHotels(data || []);
+      // El endpoint pagina por cursor (encabezado X-Next-Cursor)
+      const data: Hotel[] = [];
+      let cursor: string | null = null;
+      do {
+        const cursorParam: string = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+        const res = await fetch(`${import.meta.env.VITE_BACKEND_URL}/api/hotels?user_id=${userId}${cursorParam}`);
+        const page = await res.json();
+        if (!res.ok || !Array.isArray(page)) break;
+        data.push(...page);
+        cursor = res.headers.get('X-Next-Cursor');
+      } while (cursor);
+      setHotels(data);
+      setFilteredHotels(data);
       setLoading(false);
     }
     fetchHotels();
@@ -49,9 +49,26 @@ const WelcomeScreen: React.FC<WelcomeScreenProps> = ({ onComplete }) => {
         })
       });
 
+      if (!response.ok) {
+        clearInterval(progressInterval);
+        const errorData = await response.json();
+        setErrorMessage(errorData.error || 'Error al ejecutar el scraping');
+        setScrapingStatus('error');
+        return;
+      }
+
+      // El backend responde de inmediato con el ID del trabajo; consultar su estado
+      const { job_id } = await response.json();
+      let job: any = null;
+      do {
+        await new Promise(resolve => setTimeout(resolve, WELCOME_CONFIG.JOB_POLL_INTERVAL));
+        const jobResponse = await fetch(`${WELCOME_CONFIG.JOBS_ENDPOINT}/${job_id}`);
+        job = await jobResponse.json();
+      } while (job.state === 'queued' || job.state === 'running');
+
       clearInterval(progressInterval);
 
-      if (response.ok) {
+      if (job.state === 'completed') {
         // Simular progreso hasta 100% después de completar (más lento)
         const finalProgressInterval = setInterval(() => {
           setProgress(prev => {
@@ -70,8 +87,7 @@ const WelcomeScreen: React.FC<WelcomeScreenProps> = ({ onComplete }) => {
           }, WELCOME_CONFIG.REDIRECT_DELAY);
         }, 3000); // Más tiempo para mostrar el 100%
       } else {
-        const errorData = await response.json();
-        setErrorMessage(errorData.error || 'Error al ejecutar el scraping');
+        setErrorMessage(job.error || 'Error al ejecutar el scraping');
         setScrapingStatus('error');
       }
     } catch (error) {
@@ -92,7 +92,13 @@ const SettingsPanel = () => {
       console.log('Response data:', data);
       
       if (response.ok) {
-        alert('Scraping ejecutado:\n' + data.results.map((r: any) => `${r.script}: ${r.returncode === 0 ? 'OK' : 'Error'}\n${r.stdout || r.stderr}`).join('\n\n'));
+        // El scraping corre en segundo plano; consultar el trabajo hasta que termine
+        let job = data;
+        while (job.state === 'queued' || job.state === 'running') {
+          await new Promise(resolve => setTimeout(resolve, 5000));
+          job = await (await fetch(`${backendUrl}/jobs/${data.job_id}`)).json();
+        }
+        alert('Scraping ejecutado:\n' + job.scripts.map((r: any) => `${r.name}: ${r.returncode === 0 ? 'OK' : 'Error'}\n${r.error || r.log_tail.slice(-5).join('\n')}`).join('\n\n'));
       } else {
         alert('Error: ' + data.error);
       }
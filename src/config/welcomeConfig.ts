@@ -5,6 +5,12 @@ export const WELCOME_CONFIG = {
   
   // Endpoint del backend para ejecutar scraping
   SCRAPING_ENDPOINT: '/run-all-scrapings',
+
+  // Endpoint para consultar el estado del trabajo de scraping
+  JOBS_ENDPOINT: '/jobs',
+
+  // Intervalo de consulta del estado del trabajo (en ms)
+  JOB_POLL_INTERVAL: 5000,
   
   // Tiempo de espera antes de redirigir al dashboard (en ms)
   REDIRECT_DELAY: 2000,
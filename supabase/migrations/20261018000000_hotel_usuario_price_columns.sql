@@ -0,0 +1,14 @@
+-- Importe y moneda normalizados de cada precio de hotel_usuario (ver python_scripts/price_utils.py).
+-- Las filas anteriores se completan después con:
+--   python -m python_scripts.price_utils backfill [--user USER_ID]
+alter table hotel_usuario
+    add column if not exists price_amount numeric,
+    add column if not exists price_currency text;
+
+-- Para encontrar rápido las filas pendientes del backfill
+create index if not exists hotel_usuario_price_amount_null_idx
+    on hotel_usuario (id)
+    where price_amount is null;
+
+-- Que PostgREST vea las columnas nuevas sin reiniciar
+notify pgrst, 'reload schema';
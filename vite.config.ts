@@ -14,6 +14,10 @@ export default defineConfig({
         target: 'http://localhost:5000',
         changeOrigin: true,
       },
+      '/jobs': {
+        target: 'http://localhost:5000',
+        changeOrigin: true,
+      },
       '/run-scrape-hotels': {
         target: 'http://localhost:5000',
         changeOrigin: true,